@@ -0,0 +1,30 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The NetFlowMeter package -> the flow features of the pcap files (see
+main_driver.py, the netflowmeter command), of the directories of
+rotated captures (watch.py, netflowmeter-watch), of a corpus on many
+nodes (distributed.py, netflowmeter-distributed), of the live traffic
+of an interface (live.py, netflowmeter-live) and their benchmark
+(benchmark.py, netflowmeter-benchmark).
+
+>Nothing is imported here, so that a run only imports the modules (and
+the dependencies, numpy, pandas, pyarrow) its backend and its output
+format need. The modules are imported by name, e.g.
+
+	from netflowmeter import flow_engine as fe
+	feature_table = fe.get_feature_table('capture.pcap', 'native')
+
+>The modules import each other relatively (from . import ...), so the
+statistics.py file of the package never hides the statistics module of
+the standard library.
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+
+__version__ = '0.1.0'
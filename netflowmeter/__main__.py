@@ -0,0 +1,19 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>python -m netflowmeter, the same as the netflowmeter command (see
+main_driver.py)
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+from .main_driver import main
+#=========================================
+#=========================================
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,101 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The online statistics accumulator, which gives the (min, max, mean,
+std) of a series of values without keeping the values in a list.
+
+>Every value updates the count, min, max, mean and M2 (the sum of the
+squared differences from the mean) in O(1), with Welford's method, and
+two accumulators of the parts of a series can be merged into the one of
+the whole series (Chan et al.), e.g. for the chunks processed in
+parallel.
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import math
+#=========================================
+#=========================================
+
+class RunningStats(object):
+	"""
+	The running count, min, max, mean and M2 of a series of values
+	"""
+
+	__slots__ = ('count', 'minimum', 'maximum', 'mean', 'm2')
+
+	def __init__(self):
+		self.count = 0
+		self.minimum = 0
+		self.maximum = 0
+		self.mean = 0.0
+		self.m2 = 0.0
+
+	def add(self, value):
+		"""
+		Adds a value to the series
+		"""
+
+		if self.count == 0:
+			self.minimum = value
+			self.maximum = value
+		elif value < self.minimum:
+			self.minimum = value
+		elif value > self.maximum:
+			self.maximum = value
+
+		self.count += 1
+		delta = value - self.mean
+		self.mean += delta / self.count
+		self.m2 += delta * (value - self.mean)
+
+	def merge(self, other):
+		"""
+		Adds all the values of the other accumulator to this one, as if
+		they had been added one by one after the values of this one
+		"""
+
+		if other.count == 0:
+			return
+		if self.count == 0:
+			self.count = other.count
+			self.minimum = other.minimum
+			self.maximum = other.maximum
+			self.mean = other.mean
+			self.m2 = other.m2
+			return
+
+		count = self.count + other.count
+		delta = other.mean - self.mean
+
+		self.minimum = min(self.minimum, other.minimum)
+		self.maximum = max(self.maximum, other.maximum)
+		self.mean += delta * other.count / count
+		self.m2 += other.m2 + delta * delta * self.count * other.count / count
+		self.count = count
+
+	def copy(self):
+		"""
+		Returns a copy of the accumulator
+		"""
+
+		copy = RunningStats()
+		copy.merge(self)
+
+		return copy
+
+	def result(self, empty=(0, 0, 0, 0)):
+		"""
+		Returns the (min, max, mean, std) of the series (std of the whole
+		population, like np.std), or empty when there are no values
+		"""
+
+		if self.count == 0:
+			return empty
+
+		return (self.minimum, self.maximum, self.mean, math.sqrt(self.m2 / self.count))
+#=========================================
@@ -0,0 +1,225 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The asyncio runner of tshark, for many pcap files at once. Every file
+gets a tshark process started with asyncio.create_subprocess_exec (a
+list of arguments, no shell, so any file name is safe) and its stdout
+is read in chunks while tshark is still decoding.
+
+>The rows of every chunk are parsed right away into the streaming flow
+table (streaming.py), so the feature math of the finished flows runs
+while tshark decodes the next packets, and the memory is bounded by
+the open flows instead of the size of the text output. The parsing
+runs on a thread of its own (run_in_executor), so the event loop keeps
+reading the pipes of the other tshark processes meanwhile.
+
+>A semaphore bounds the number of tshark processes running at the
+same time, across all the files.
+
+>iter_files runs the event loop in a thread and yields the feature
+tables in the order of the files, each as soon as it and the ones
+before it are done, so that they are written out (and checkpointed,
+see manifest.py) while the other files run.
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import os
+import queue
+import asyncio
+import tempfile
+import threading
+import subprocess as sp
+from concurrent.futures import ThreadPoolExecutor
+
+from . import statistics as st
+from . import pcap_reader as pr
+from . import streaming as sm
+from . import sketches as qs
+from . import instrument as im
+#=========================================
+#=========================================
+
+##========================================
+#=============--CONSTANTS--===============
+# bytes read from the stdout of tshark at once
+CHUNK_SIZE = 256 * 1024
+##========================================
+
+async def run_file(file, semaphore, flow_timeout=sm.FLOW_TIMEOUT, close_linger=sm.CLOSE_LINGER,
+		clump_timeout=st.CLUMP_TIMEOUT, active_timeout=st.ACTIVE_TIMEOUT, columns=None, protocols=('tcp',),
+		quantile_error=qs.ERROR, executor=None):
+	"""
+	Computes the features of all the flows of a capture from the output
+	of tshark, parsed chunk by chunk while tshark runs
+
+	param: the capture file, the asyncio.Semaphore bounding the tshark
+	processes, the timeouts, the feature columns, the protocols and
+	the error of the quantile sketches of streaming.get_feature_table,
+	and the executor which parses the chunks (None -> the default one
+	of the loop)
+
+	return: the feature table (see streaming.get_feature_table)
+	"""
+
+	flow_table = sm.StreamingFlowTable(flow_timeout, close_linger, clump_timeout, active_timeout,
+		sketch_size=sm.get_sketch_size(columns, quantile_error))
+	flow_tracker = pr.FlowTracker(flow_timeout)
+	rows = []
+	origin = None
+	pending = b''
+
+	def add_lines(lines, origin):
+		# the time of the tasks which run between the chunks is not in it
+		with im.timed('stream'):
+			lines = [line.decode() for line in lines]
+			if origin is None:
+				# frame 1 gives the time origin (like frame.time_relative)
+				origin = sm.parse_epoch(lines[0].split(',')[5])
+
+			for packet in sm.parse_tshark_lines(lines, origin, protocols, flow_tracker):
+				im.count('packets')
+				for stream, flow in flow_table.add_packet(*packet):
+					rows.append(((flow.protocol, stream), flow.get_features()))
+
+		return origin
+
+	loop = asyncio.get_running_loop()
+	command = sm.get_tshark_command(file, protocols)
+
+	# a pipe of the stderr could fill up and block tshark, a file cannot
+	async with semaphore:
+		with tempfile.TemporaryFile() as stderr:
+			proc = await asyncio.create_subprocess_exec(*command, stdout=sp.PIPE, stderr=stderr)
+
+			try:
+				while True:
+					chunk = await proc.stdout.read(CHUNK_SIZE)
+					if not chunk:
+						break
+
+					# the last line of the chunk may be cut, it waits for the next chunk
+					lines = (pending + chunk).split(b'\n')
+					pending = lines.pop()
+					if not lines:
+						continue
+
+					origin = await loop.run_in_executor(executor, add_lines, lines, origin)
+
+				if pending:
+					origin = await loop.run_in_executor(executor, add_lines, [pending], origin)
+
+				await proc.wait()
+			finally:
+				# killed on an error or a cancel, not checked
+				if proc.returncode is None:
+					proc.kill()
+					await proc.wait()
+
+			sm.check_tshark(proc.returncode, command, stderr)
+
+	def finish():
+		for stream, flow in flow_table.flush():
+			rows.append(((flow.protocol, stream), flow.get_features()))
+		return sm.make_feature_table(rows, columns)
+
+	return await loop.run_in_executor(executor, finish)
+#=========================================
+
+async def run_files_async(files_list, max_procs=None, on_done=None, **options):
+	"""
+	Computes the features of many files, with at most max_procs tshark
+	processes at the same time
+
+	>the chunks of all the files are parsed on one thread (the parsing
+	holds the GIL, more threads would not run it any faster)
+
+	param: list of the capture files, the number of tshark processes
+	(default -> all the cpus), the function called with the index of
+	every file and its table (or exception) as soon as it is done, and
+	the keyword arguments of run_file
+
+	return: list of the feature tables, in the order of the files (the
+	exception of a file which failed in place of its table, so that the
+	other files go on)
+	"""
+
+	semaphore = asyncio.Semaphore(max_procs or os.cpu_count() or 1)
+
+	with ThreadPoolExecutor(1) as executor:
+		async def run(index, file):
+			try:
+				result = await run_file(file, semaphore, executor=executor, **options)
+			except Exception as error:
+				result = error
+			if on_done is not None:
+				on_done(index, result)
+			return result
+
+		return await asyncio.gather(*[run(index, file) for index, file in enumerate(files_list)])
+#=========================================
+
+def iter_files(files_list, max_procs=None, **options):
+	"""
+	Runs run_files_async in an event loop of its own thread, see
+	run_files_async
+
+	return: iterator of the feature tables (or exceptions) in the order
+	of the files, each yielded as soon as it and the files before it are
+	done (the files left are cancelled when the iterator is closed)
+	"""
+
+	done = queue.Queue()
+	state = {}
+	started = threading.Event()
+
+	async def main():
+		state['loop'] = asyncio.get_running_loop()
+		state['task'] = asyncio.current_task()
+		started.set()
+		await run_files_async(files_list, max_procs, lambda index, result: done.put((index, result)), **options)
+
+	def run():
+		try:
+			asyncio.run(main())
+		except BaseException as error:
+			state['error'] = error
+		finally:
+			started.set()
+			# None marks the end of the loop
+			done.put(None)
+
+	thread = threading.Thread(target=run, daemon=True)
+	thread.start()
+	started.wait()
+
+	# the files done out of order wait for the ones before them
+	results = {}
+	position = 0
+	try:
+		while position < len(files_list):
+			item = done.get()
+			if item is None:
+				raise state.get('error') or RuntimeError('the event loop ended before all the files were done')
+			index, result = item
+			results[index] = result
+			while position in results:
+				yield results.pop(position)
+				position += 1
+	finally:
+		if thread.is_alive() and 'task' in state:
+			state['loop'].call_soon_threadsafe(state['task'].cancel)
+		thread.join()
+#=========================================
+
+def run_files(files_list, max_procs=None, **options):
+	"""
+	Runs run_files_async in a new event loop, see run_files_async
+	"""
+
+	return asyncio.run(run_files_async(files_list, max_procs, **options))
+#=========================================
@@ -0,0 +1,387 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The batch mode, which extracts the features of whole directories of
+pcap files on a pool of worker processes.
+
+>Every file is a task of its own. With the tshark backend the large
+files are also split into ranges of tcp streams, so that the text
+output of tshark and its parsing are spread over the workers too (the
+stream counts of the ranges come from the stream indexes of the files,
+built on the workers). With
+the native backend they are cut into byte ranges instead, decoded by
+the workers and stitched back together (see sharding.py).
+
+>The results are collected in the order of the files and the streams,
+so the output is the same for any number of workers. They are yielded
+task by task (iter_batch), so that they are written out while the other
+tasks run (see manifest.py), and a task which fails is reported with its
+error instead of stopping the batch.
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import os
+import sys
+import struct
+import traceback
+import multiprocessing as mp
+
+import numpy as np
+
+from . import flow_engine as fe
+from . import pcap_reader as pr
+from . import streaming as sm
+from . import sharding as sh
+from . import packet_cache as pc
+from . import get_files_streamcount as gfs
+from . import instrument as im
+#=========================================
+#=========================================
+
+##========================================
+#=============--CONSTANTS--===============
+# files larger than this (in bytes) are split into ranges of streams
+# (tshark) or byte ranges (native)
+SPLIT_SIZE = 256 * 1024 * 1024
+DEFAULT_LABEL = 'VPN'
+##========================================
+
+def get_label(file, labels, default_label=DEFAULT_LABEL):
+	"""
+	Returns the class label of a file from the label mapping, where the
+	keys are files, file names or directories. The file itself wins over
+	its directories and the innermost directory wins over the outer ones.
+
+	param: the file, the dict of path -> label and the label for the
+	files which are not in the mapping
+
+	return: (str) the label of the file
+	"""
+
+	path = os.path.abspath(file)
+	if path in labels:
+		return labels[path]
+	if os.path.basename(file) in labels:
+		return labels[os.path.basename(file)]
+
+	directory = os.path.dirname(path)
+	while True:
+		if directory in labels:
+			return labels[directory]
+		parent = os.path.dirname(directory)
+		if parent == directory:
+			return default_label
+		directory = parent
+#=========================================
+
+def get_stream_count(file):
+	"""
+	Returns the number of tcp streams of a file from its stream index
+	(built and saved the first time, see stream_index.py), in a worker
+	process
+
+	>the index numbers the streams like the native reader, which only
+	balances the ranges of streams of tshark -> the last range is left
+	open, so a stream tshark numbers differently is never missed
+
+	return: (int) the count, None if the file cannot be read (it then
+	fails in its own task, like the other bad files)
+	"""
+
+	try:
+		return gfs.get_stream_count([file])[0]
+	except (OSError, ValueError, struct.error):
+		return None
+#=========================================
+
+def get_tasks(files_list, backend='tshark', workers=1, split_size=SPLIT_SIZE, cache_dir=None, cache_key='stat',
+		protocols=('tcp',)):
+	"""
+	Makes the list of tasks for the worker pool -> one per file, or for
+	the large files one per range of streams (tshark backend) or one per
+	byte range (native backend, unless the file is in the cache)
+
+	>the ranges of streams and the shards only hold tcp streams, so the
+	files are not split when the udp or icmp flows are extracted too
+
+	param: list of pcap files, the backend, the number of workers, the
+	size above which the files are split, the cache directory and the
+	kind of cache key, and the protocols of the flows
+
+	return: list of (file, streams, shard) tuples, streams being None or
+	the (first, last) range of flow_engine.get_packet_table and shard
+	None or the (start, end) byte range of sharding.read_shard
+	"""
+
+	tasks = []
+
+	split = [file for file in files_list
+		if workers > 1 and os.path.getsize(file) > split_size and set(protocols) == {'tcp'}]
+	stream_counts = {}
+	if backend == 'tshark' and split:
+		# the stream indexes are built on the pool, not one by one here
+		with mp.Pool(min(workers, len(split))) as pool:
+			stream_counts = dict(zip(split, pool.map(get_stream_count, split, chunksize=1)))
+
+	split = set(split)
+	for file in files_list:
+		if file not in split:
+			tasks.append((file, None, None))
+			continue
+
+		if backend != 'tshark':
+			# a compressed file can only be read from its start
+			if cache_dir is not None and pc.has_table(cache_dir, pc.get_cache_key(file, backend, cache_key)) \
+					or pr.get_compression(file) is not None:
+				tasks.append((file, None, None))
+				continue
+			for shard in sh.get_shard_ranges(file, workers):
+				tasks.append((file, None, shard))
+			continue
+
+		stream_count = stream_counts[file]
+		if stream_count is None:
+			tasks.append((file, None, None))
+			continue
+		step = max(1, -(-stream_count // workers))
+		bounds = list(range(0, stream_count, step))
+		for index, first in enumerate(bounds):
+			# the last range is left open, so that no stream is ever missed
+			last = bounds[index + 1] if index + 1 < len(bounds) else None
+			tasks.append((file, (first, last), None))
+
+	return tasks
+#=========================================
+
+def run_task(task):
+	"""
+	Computes the feature table of one task, in a worker process
+
+	param: tuple of (file, streams, shard, backend, options, streaming)
+
+	return: the feature table of flow_engine.get_feature_table (or of
+	streaming.get_feature_table in the streaming mode), or the partial
+	table of sharding.read_shard for a shard
+	"""
+
+	file, streams, shard, backend, options, streaming = task
+
+	if shard is not None:
+		return sh.read_shard(file, shard[0], shard[1])
+	if streaming:
+		return sm.get_feature_table(file, backend, **options)
+
+	return fe.get_feature_table(file, backend, streams, **options)
+#=========================================
+
+class TaskError(object):
+	"""
+	The error of a failed task, returned by the worker instead of raised
+	so that the other tasks of the batch go on
+	"""
+
+	def __init__(self, error):
+		self.error = error
+#=========================================
+
+def run_job(task):
+	"""
+	Runs a task (see run_task) and catches its error
+
+	return: tuple of (the result of run_task, or a TaskError with the
+	traceback, and the timers and counters of the task, see
+	instrument.take_stats)
+	"""
+
+	# the timers of the process so far are sent back with this task
+	try:
+		result = run_task(task)
+	except Exception:
+		result = TaskError(traceback.format_exc())
+		im.count('failed_tasks')
+	im.count('tasks')
+
+	return (result, im.take_stats())
+#=========================================
+
+def get_pending_tasks(tasks, manifest):
+	"""
+	Leaves out of the tasks the streams which are done or quarantined in
+	the manifest of the run
+
+	param: list of (file, streams, shard) tuples (see get_tasks) and the
+	manifest.RunManifest
+
+	return: list of the tasks left
+	"""
+
+	pending = []
+	for file, streams, shard in tasks:
+		left = manifest.get_pending(file, streams)
+		if shard is None:
+			pending += [(file, part, None) for part in left]
+		elif left == [None]:
+			pending.append((file, streams, shard))
+		elif left and shard[0] == 0:
+			# a file partly done is read for the ranges of streams left
+			pending += [(file, part, None) for part in left]
+
+	return pending
+#=========================================
+
+def iter_results(jobs, workers):
+	"""
+	Runs the jobs on a pool of processes
+
+	param: list of the (file, streams, shard, backend, options, streaming)
+	tuples of run_task and the number of worker processes
+
+	return: iterator of the results of run_task (or TaskError), in the
+	order of the jobs, whose timers and counters are added to the ones
+	of this process
+	"""
+
+	if workers > 1 and len(jobs) > 1:
+		with mp.Pool(min(workers, len(jobs))) as pool:
+			for result, stats in pool.imap(run_job, jobs, chunksize=1):
+				im.merge_stats(stats)
+				yield result
+	else:
+		for job in jobs:
+			result, stats = run_job(job)
+			im.merge_stats(stats)
+			yield result
+#=========================================
+
+def iter_async_results(files_list, workers, options):
+	"""
+	Runs the streaming mode of the files with tshark from one asyncio
+	event loop (see async_runner.iter_files)
+
+	param: list of the files, the number of tshark processes and the
+	keyword arguments of streaming.get_feature_table
+
+	return: iterator of the feature tables (or TaskError), in the order
+	of the files, each as soon as it and the files before it are done
+	"""
+
+	# asyncio is only imported by the runs which use it
+	from . import async_runner as ar
+
+	for result in ar.iter_files(files_list, workers, **options):
+		if isinstance(result, BaseException):
+			result = TaskError(''.join(traceback.format_exception(type(result), result, result.__traceback__)))
+			im.count('failed_tasks')
+		im.count('tasks')
+		yield result
+#=========================================
+
+def iter_batch(files_list, backend='tshark', workers=None, split_size=SPLIT_SIZE, labels=None, default_label=DEFAULT_LABEL,
+		options=None, streaming=False, use_async=False, manifest=None):
+	"""
+	Extracts the features of all the files on a pool of processes, task
+	by task
+
+	param: list of pcap files, the backend, the number of worker
+	processes (default -> all the cpus), the size above which the files
+	are split into ranges of streams, the dict of path -> class label
+	(see get_label), the label of the files which are not in it and the
+	dict of the other keyword arguments of flow_engine.get_feature_table
+	(cache and timeouts), whether to use the streaming mode instead
+	(streaming.get_feature_table, one task per file), whether to run
+	the tshark processes of the streaming mode from one asyncio event
+	loop (async_runner.py, workers of them at a time) instead of the
+	pool of processes, and the manifest.RunManifest of the streams to
+	skip (None -> all the streams)
+
+	return: iterator of (file, streams, feature table, error) in the order
+	of the files and the streams, streams being None or the range of the
+	task, the feature table having the extra columns 'file' and 'class'
+	(None if the task failed) and error the traceback of a failed task
+	(None if it did not fail)
+	"""
+
+	if workers is None:
+		workers = os.cpu_count() or 1
+	if labels is None:
+		labels = {}
+	if options is None:
+		options = {}
+
+	if streaming:
+		tasks = [(file, None, None) for file in files_list]
+	else:
+		tasks = get_tasks(files_list, backend, workers, split_size, options.get('cache_dir'), options.get('cache_key', 'stat'),
+			options.get('protocols', ('tcp',)))
+	if manifest is not None:
+		tasks = get_pending_tasks(tasks, manifest)
+	jobs = [(file, streams, shard, backend, options, streaming) for file, streams, shard in tasks]
+
+	if streaming and use_async and backend == 'tshark':
+		# the tasks of the event loop run in this process, no stats to merge
+		results = iter_async_results([task[0] for task in tasks], workers, options)
+	else:
+		results = iter_results(jobs, workers)
+
+	shards = []
+	partials = []
+	for (file, streams, shard), result in zip(tasks, results):
+		if shard is not None:
+			# the shards of a file are stitched once all of them are read
+			# (the last one is open ended)
+			shards.append(shard)
+			partials.append(result)
+			if shard[1] is not None:
+				continue
+			errors = [partial for partial in partials if isinstance(partial, TaskError)]
+			if errors:
+				result = errors[0]
+			else:
+				try:
+					result = sh.get_feature_table(file, shards, partials, **options)
+				except Exception:
+					result = TaskError(traceback.format_exc())
+			shards = []
+			partials = []
+			streams = None
+
+		if isinstance(result, TaskError):
+			yield (file, streams, None, result.error)
+			continue
+
+		count = len(result['stream'])
+		result['file'] = np.full(count, file, dtype=object)
+		result['class'] = np.full(count, get_label(file, labels, default_label), dtype=object)
+		yield (file, streams, result, None)
+#=========================================
+
+def run_batch(files_list, backend='tshark', workers=None, split_size=SPLIT_SIZE, labels=None, default_label=DEFAULT_LABEL,
+		options=None, streaming=False, use_async=False):
+	"""
+	Extracts the features of all the files on a pool of processes, see
+	iter_batch for the parameters
+
+	return: one feature table for all the files, in the order of the
+	files and the streams, with the extra columns 'file' and 'class'
+	(the failed tasks are reported on stderr and left out)
+	"""
+
+	feature_table = {}
+	for file, streams, result, error in iter_batch(files_list, backend, workers, split_size, labels, default_label,
+			options, streaming, use_async):
+		if error is not None:
+			print('failed {} {}: {}'.format(file, streams, error.strip().splitlines()[-1]), file=sys.stderr)
+			continue
+		for column in result:
+			feature_table.setdefault(column, []).append(result[column])
+
+	for column in feature_table:
+		feature_table[column] = np.concatenate(feature_table[column])
+
+	return feature_table
+#=========================================
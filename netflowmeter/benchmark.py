@@ -0,0 +1,402 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The benchmark of the extraction, on synthetic pcap files written
+locally from a seed, so that the runs of two versions of the code can
+be compared.
+
+>The generator varies the number of flows, the packets per flow, the
+share of the reverse packets and the idle gaps. It also returns the
+features every stream must have, computed from the generated packet
+times with the functions of the statistics.py file, so the files are
+fixtures with known feature values too (see check_features).
+
+>Every backend (and the legacy per stream getters of statistics.py on
+a few streams) runs in a fresh process, which reports the time of each
+stage, the packets and flows per second, its peak RSS and the number
+of tshark processes it started. The results are written to a JSON file.
+
+	netflowmeter-benchmark --flows 1000 --packets 100 --backend native streaming-native --output bench.json
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import os
+import json
+import time
+import random
+import socket
+import struct
+import shutil
+import argparse
+import platform
+import resource
+import multiprocessing as mp
+
+import numpy as np
+
+from . import statistics as st
+from . import flow_engine as fe
+from . import features as fs
+from . import streaming as sm
+from . import sharding as sh
+from . import instrument as im
+#=========================================
+#=========================================
+
+##========================================
+#=============--CONSTANTS--===============
+# the ways of extracting the features which can be timed
+BENCH_BACKENDS = ('native', 'tshark', 'sharded', 'streaming-native', 'streaming-tshark', 'legacy')
+# the legacy getters start several tshark processes per stream, so they
+# are only timed on the first streams of the file
+LEGACY_STREAMS = 5
+# the relative tolerance of check_features
+CHECK_TOLERANCE = 1e-9
+
+SERVER_PORT = 443
+# the generated times start at this epoch (in ns) and are in whole us
+START_TIME = 1600000000 * 10**9
+##========================================
+
+def make_packet(src, dst, sport, dport, seq, flags, payload):
+	"""
+	Builds an Ethernet/IPv4/TCP frame
+
+	param: the src and dst ip addresses and ports, the sequence number,
+	the tcp flags and the payload size
+
+	return: (bytes) the frame
+	"""
+
+	tcp = struct.pack('!HHIIBBHHH', sport, dport, seq, 0, 5 << 4, flags, 65535, 0, 0) + b'\0' * payload
+	ip = struct.pack('!BBHHHBBH4s4s', 0x45, 0, 20 + len(tcp), 0, 0, 64, 6, 0,
+		socket.inet_aton(src), socket.inet_aton(dst))
+
+	return b'\0' * 12 + struct.pack('!H', 0x0800) + ip + tcp
+#=========================================
+
+def generate_capture(file, flows=100, packets=50, reverse_ratio=0.5, idle_ratio=0.05, idle_gap=2.0, seed=0):
+	"""
+	Writes a synthetic pcap file of tcp flows, the same for the same
+	arguments
+
+	>every flow starts with a SYN from the client and goes on with
+	packets from the server (reverse_ratio of them) or the client, with
+	gaps of about a millisecond and, for idle_ratio of the gaps, an idle
+	gap of about idle_gap seconds
+
+	param: the file to write, the number of flows, the packets per flow,
+	the share of the reverse packets, the share of the idle gaps, the
+	mean idle gap in seconds and the seed of the generator
+
+	return: the expected features of every stream (see expected_features)
+	"""
+
+	rand = random.Random(seed)
+	records = []
+
+	for flow in range(flows):
+		client = '10.{}.{}.{}'.format(flow >> 16 & 255, flow >> 8 & 255, flow & 255)
+		server = '192.168.{}.{}'.format(flow >> 8 & 255, flow & 255)
+		sport = 1024 + flow % 60000
+		seq = rand.randrange(1 << 32)
+
+		# the times are whole microseconds, the resolution of the pcap file
+		now = START_TIME + rand.randrange(10**6) * 1000
+		for index in range(packets):
+			if index > 0:
+				if rand.random() < idle_ratio:
+					now += int(rand.uniform(0.5, 1.5) * idle_gap * 10**6) * 1000
+				else:
+					now += int(rand.expovariate(1000.0) * 10**6 + 1) * 1000
+
+			payload = rand.randrange(1400) if index > 0 else 0
+			if index > 0 and rand.random() < reverse_ratio:
+				frame = make_packet(server, client, SERVER_PORT, sport, 0, 0x10, payload)
+			else:
+				frame = make_packet(client, server, sport, SERVER_PORT, seq + index, 0x02 if index == 0 else 0x10, payload)
+			records.append((now, flow, index, frame))
+
+	records.sort()
+
+	with open(file, 'wb') as f:
+		f.write(struct.pack('<IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, 65535, 1))
+		for now, flow, index, frame in records:
+			seconds, ns = divmod(now, 10**9)
+			f.write(struct.pack('<IIII', seconds, ns // 1000, len(frame), len(frame)))
+			f.write(frame)
+
+	return expected_features(records)
+#=========================================
+
+def expected_features(records):
+	"""
+	Computes the features of the generated flows from their packets,
+	with the functions of the statistics.py file
+
+	param: list of the (time in ns, flow, index, frame) of the packets,
+	in the capture order
+
+	return: dict of 'stream', 'packets' and the features.FEATURE_COLUMNS
+	-> array with one entry per stream, the streams numbered in the
+	order of their first packet like tcp.stream
+	"""
+
+	first_ts = records[0][0] if records else 0
+	flows = {}
+
+	for now, flow, index, frame in records:
+		time_rel = (now - first_ts) / 1e9
+		# the first packet of a flow is always from the client
+		packets = flows.setdefault(flow, [frame[26:30], [], [], 0, 0])
+		packets[1 if frame[26:30] == packets[0] else 2].append(time_rel)
+		packets[3] += 1
+		packets[4] += len(frame)
+
+	table = {column: [] for column in ['stream', 'packets'] + fs.FEATURE_COLUMNS}
+
+	for stream, (client, fwd_times, rev_times, count, size) in enumerate(flows.values()):
+		flow_times = sorted(fwd_times + rev_times)
+		duration = flow_times[-1] - flow_times[0]
+
+		values = [duration]
+		for info in st.get_iat_info_from_times(fwd_times, rev_times):
+			values += info
+		values += st.get_active_info_from_times(flow_times)
+		values += st.get_idle_info_from_times(flow_times)
+		with np.errstate(divide='ignore', invalid='ignore'):
+			values.append(np.float64(size) / duration)
+			values.append(np.float64(count) / duration)
+
+		table['stream'].append(stream)
+		table['packets'].append(count)
+		for column, value in zip(fs.FEATURE_COLUMNS, values):
+			table[column].append(value)
+
+	return {column: np.array(values, dtype=np.float64 if column in fs.FEATURE_COLUMNS else np.int64) for column, values in table.items()}
+#=========================================
+
+def check_features(feature_table, expected):
+	"""
+	Compares a feature table with the expected features of a generated
+	file
+
+	param: the feature table and the expected table (see generate_capture)
+
+	return: list of the columns which differ (empty if all match)
+	"""
+
+	if not np.array_equal(feature_table['stream'], expected['stream']):
+		return ['stream']
+
+	return [column for column in fs.FEATURE_COLUMNS
+		if not np.allclose(feature_table[column], expected[column], rtol=CHECK_TOLERANCE, atol=0, equal_nan=True)]
+#=========================================
+
+def run_backend(file, backend, workers=1):
+	"""
+	Extracts the features of a file with one backend and times its stages
+
+	param: the pcap file, the backend (see BENCH_BACKENDS) and the number
+	of worker processes of the sharded backend
+
+	return: tuple of the feature table and the dict of stage -> seconds
+	"""
+
+	stages = {}
+
+	def timed(stage, function, *args):
+		started = time.perf_counter()
+		result = function(*args)
+		stages[stage] = time.perf_counter() - started
+		return result
+
+	if backend in ('native', 'tshark', 'sharded'):
+		if backend == 'sharded':
+			table = timed('read', sh.read_packet_table, file, workers, workers)
+		else:
+			table = timed('read', fe.get_packet_table, file, backend)
+		flow_table = timed('group', fe.make_flow_table, table)
+		feature_table = timed('features', fe.compute_feature_table, flow_table)
+
+	elif backend.startswith('streaming-'):
+		feature_table = timed('stream', sm.get_feature_table, file, backend.split('-', 1)[1], None)
+
+	elif backend == 'legacy':
+		feature_table = timed('getters', get_legacy_features, file, LEGACY_STREAMS)
+
+	else:
+		raise ValueError('unknown benchmark backend {}'.format(backend))
+
+	return feature_table, stages
+#=========================================
+
+def get_legacy_features(file, streams):
+	"""
+	Computes the features of the first streams of a file with the per
+	stream getters of the statistics.py file (several tshark runs each)
+
+	param: the pcap file and the number of streams
+
+	return: dict of 'stream' and the features.FEATURE_COLUMNS -> array
+	"""
+
+	table = {column: [] for column in ['stream'] + fs.FEATURE_COLUMNS}
+
+	for stream in range(min(streams, st.get_total_flows(file))):
+		values = [st.get_flow_duration(file, stream)]
+		for info in st.get_fwd_rev_flow_iat(file, stream):
+			values += info
+		values += st.get_active_info(file, stream)
+		values += st.get_idle_info(file, stream)
+		values.append(st.get_flow_bytes_psec(file, stream))
+		values.append(st.get_flow_packets_psec(file, stream))
+
+		table['stream'].append(stream)
+		for column, value in zip(fs.FEATURE_COLUMNS, values):
+			table[column].append(value)
+
+	return {column: np.array(values, dtype=np.int64 if column == 'stream' else np.float64) for column, values in table.items()}
+#=========================================
+
+def run_case(case):
+	"""
+	Runs one benchmark case, in a fresh process (see run_benchmark)
+
+	param: tuple of (file, backend, workers, expected)
+
+	return: dict of the results of the case
+	"""
+
+	file, backend, workers, expected = case
+
+	im.reset()
+
+	started = time.perf_counter()
+	feature_table, stages = run_backend(file, backend, workers)
+	elapsed = time.perf_counter() - started
+
+	flows = len(feature_table['stream'])
+	if backend == 'legacy':
+		expected = {column: values[:flows] for column, values in expected.items()}
+	packets = int(expected['packets'].sum())
+
+	return {
+		'backend': backend,
+		'seconds': elapsed,
+		'stages': stages,
+		'flows': flows,
+		'packets': packets,
+		'packets_per_sec': packets / elapsed if elapsed else None,
+		'flows_per_sec': flows / elapsed if elapsed else None,
+		'peak_rss_kb': im.get_peak_rss(),
+		'peak_child_rss_kb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+		'tshark_processes': im.get_stats()['counters'].get('spawns', 0),
+		'mismatched_columns': check_features(feature_table, expected),
+	}
+#=========================================
+
+def _run_case_process(case, queue):
+	"""
+	Runs a benchmark case in the child process and sends back its results
+	"""
+
+	try:
+		result = run_case(case)
+	except Exception as error:
+		result = {'backend': case[1], 'skipped': 'failed: {!r}'.format(error)}
+
+	queue.put(result)
+#=========================================
+
+def run_benchmark(directory, backends, flows=100, packets=50, reverse_ratio=0.5, idle_ratio=0.05, idle_gap=2.0, seed=0, workers=1):
+	"""
+	Generates a capture and runs every backend on it, each in a fresh
+	process so that the peak RSS is the one of the backend alone
+
+	param: the directory of the generated file, the backends (see
+	BENCH_BACKENDS), the arguments of generate_capture and the number of
+	worker processes of the sharded backend
+
+	return: dict of the parameters and the list of the results
+	"""
+
+	os.makedirs(directory, exist_ok=True)
+	file = os.path.join(directory, 'bench-{}-{}-{}.pcap'.format(flows, packets, seed))
+	expected = generate_capture(file, flows, packets, reverse_ratio, idle_ratio, idle_gap, seed)
+
+	results = []
+	context = mp.get_context('spawn')
+	for backend in backends:
+		if 'tshark' in backend or backend == 'legacy':
+			if shutil.which('tshark') is None:
+				results.append({'backend': backend, 'skipped': 'tshark not found'})
+				continue
+
+		# a plain process (not a pool, whose workers can not start the
+		# workers of the sharded backend)
+		queue = context.Queue()
+		process = context.Process(target=_run_case_process, args=((file, backend, workers, expected), queue))
+		process.start()
+		results.append(queue.get())
+		process.join()
+
+	return {
+		'parameters': {
+			'flows': flows, 'packets': packets, 'reverse_ratio': reverse_ratio,
+			'idle_ratio': idle_ratio, 'idle_gap': idle_gap, 'seed': seed, 'workers': workers,
+			'file_size': os.path.getsize(file), 'packets_in_file': flows * packets,
+		},
+		'results': results,
+	}
+#=========================================
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark the feature extraction on synthetic pcap files.')
+	parser.add_argument('--flows', type=int, nargs='+', default=[100], help='the numbers of flows to benchmark')
+	parser.add_argument('--packets', type=int, nargs='+', default=[50], help='the numbers of packets per flow to benchmark')
+	parser.add_argument('--reverse-ratio', type=float, default=0.5, help='the share of the packets from the server')
+	parser.add_argument('--idle-ratio', type=float, default=0.05, help='the share of the gaps which are idle gaps')
+	parser.add_argument('--idle-gap', type=float, default=2.0, help='the mean idle gap in seconds')
+	parser.add_argument('--seed', type=int, default=0, help='the seed of the generator')
+	parser.add_argument('--backend', nargs='+', default=['native', 'tshark', 'streaming-native'], choices=BENCH_BACKENDS,
+		help='the backends to benchmark')
+	parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='the worker processes of the sharded backend')
+	parser.add_argument('--directory', default='bench', help='the directory of the generated pcap files')
+	parser.add_argument('--tag', default=None, help='the name of this run in the JSON file (e.g. the version)')
+	parser.add_argument('--output', default='benchmark.json', help='the JSON file of the results')
+	args = parser.parse_args()
+
+	report = {
+		'tag': args.tag,
+		'python': platform.python_version(),
+		'platform': platform.platform(),
+		'runs': [],
+	}
+
+	for flows in args.flows:
+		for packets in args.packets:
+			run = run_benchmark(args.directory, args.backend, flows, packets, args.reverse_ratio,
+				args.idle_ratio, args.idle_gap, args.seed, args.workers)
+			report['runs'].append(run)
+
+			for result in run['results']:
+				if 'skipped' in result:
+					print('{:>6} flows {:>5} pkts  {:<17} skipped ({})'.format(flows, packets, result['backend'], result['skipped']))
+					continue
+				print('{:>6} flows {:>5} pkts  {:<17} {:8.3f} s {:>12.0f} pkts/s {:>10.0f} flows/s {:>8} KB {:>5} tshark {}'.format(
+					flows, packets, result['backend'], result['seconds'], result['packets_per_sec'] or 0,
+					result['flows_per_sec'] or 0, result['peak_rss_kb'], result['tshark_processes'],
+					'ok' if not result['mismatched_columns'] else 'MISMATCH ' + ','.join(result['mismatched_columns'])))
+
+	with open(args.output, 'w') as f:
+		json.dump(report, f, indent=2)
+#=========================================
+
+if __name__ == '__main__':
+	main()
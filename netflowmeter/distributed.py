@@ -0,0 +1,651 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The distributed mode, for the corpora which are too large for one
+host. A run is a directory on a storage which all the nodes mount at
+the same path (NFS or the like):
+
+	run/manifest.json          the units of work and the settings
+	run/queue/todo/<unit>      the units waiting for a worker
+	run/queue/running/<unit>@<worker>
+	run/queue/done/<unit>
+	run/queue/failed/<unit>    the units which failed MAX_ATTEMPTS times
+	run/queue/clock/<worker>   touched by a worker to read the time of the storage
+	run/parts/<unit>.npz       the feature table of every unit done
+
+>plan lists the capture files and cuts them into units -> a whole file,
+or for the files larger than the unit size, ranges of tcp streams of
+about the unit size each, from the bytes of the streams in the stream
+index of the file (see stream_index.py, saved next to the file so the
+workers reuse it). The index numbers the streams like the native
+reader. With the tshark backend it only sizes the ranges, which are
+ranges of tcp.stream -> they follow each other and the last one is
+left open, so a stream tshark numbers differently is still in exactly
+one unit.
+
+>work runs a worker (or several local processes standing in for the
+nodes) -> a unit is claimed by renaming its file from todo to running,
+which only one worker can do. The worker touches its running file while
+it works, and a unit whose running file was not touched for the lease
+time (its node died) is put back in todo by the other workers, the
+times being the ones of the storage and not of the nodes (whose clocks
+may differ). The
+feature table of a unit is written to its part file (a temporary file
+renamed) before the unit is moved to done, and a unit which fails goes
+back to todo until it failed MAX_ATTEMPTS times.
+
+>merge writes the parts to one output (csv, parquet, arrow or memmap,
+see sinks.py) in the order of the manifest -> the files in the order of
+the listing and their ranges of streams in order, whatever the nodes
+and the order the units were done in, so the dataset is the same as
+the one of main_driver.py.
+
+	netflowmeter-distributed plan /shared/run /data/VPN/ /data/NonVPN/ --label /data/VPN/=VPN --label /data/NonVPN/=NonVPN
+	netflowmeter-distributed work /shared/run --processes 32         (on every node)
+	netflowmeter-distributed status /shared/run
+	netflowmeter-distributed merge /shared/run --output features.csv
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import os
+import sys
+import json
+import time
+import socket
+import struct
+import argparse
+import threading
+import traceback
+import multiprocessing as mp
+
+import numpy as np
+
+from . import statistics as st
+from . import flow_engine as fe
+from . import features as fs
+from . import pcap_reader as pr
+from . import stream_index as si
+from . import packet_cache as pc
+from . import batch
+from . import sinks as sk
+from . import get_files_streamcount as gfs
+from . import instrument as im
+from . import main_driver as md
+#=========================================
+#=========================================
+
+##========================================
+#=============--CONSTANTS--===============
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+QUEUE_STATES = ('todo', 'running', 'done', 'failed')
+# the bytes of packets of a unit (the files larger than this are split)
+UNIT_SIZE = 256 * 1024 * 1024
+# a unit whose worker did not touch it for this many seconds is redone
+LEASE_TIME = 300.0
+MAX_ATTEMPTS = 3
+# seconds a worker waits for the units of the other workers to be done
+POLL_INTERVAL = 5.0
+##========================================
+
+def get_unit_ranges(file, unit_size=UNIT_SIZE, protocols=('tcp',)):
+	"""
+	Cuts a capture file into ranges of tcp streams of about unit_size
+	bytes of packets, from its stream index
+
+	>the ranges only hold tcp streams, so the files are not split when
+	the udp or icmp flows are extracted too (like batch.get_tasks)
+
+	param: the capture file, the unit size in bytes and the protocols of
+	the flows
+
+	return: list of ((first, last) range of streams, or None for the
+	whole file, and the bytes of packets of the range)
+	"""
+
+	if os.path.getsize(file) <= unit_size or set(protocols) != {'tcp'}:
+		return [(None, os.path.getsize(file))]
+
+	try:
+		index = si.get_stream_index(file)
+	except (OSError, ValueError, struct.error):
+		# a file which cannot be read fails in its worker, like the others
+		return [(None, os.path.getsize(file))]
+
+	sizes = np.cumsum(index['bytes'])
+	if len(sizes) == 0 or sizes[-1] <= unit_size:
+		return [(None, int(sizes[-1]) if len(sizes) else 0)]
+
+	# the first stream of every unit, at each multiple of the unit size
+	cuts = np.unique(np.searchsorted(sizes, np.arange(1, -(-sizes[-1] // unit_size)) * unit_size, side='left') + 1)
+	bounds = [0] + [int(cut) for cut in cuts if 0 < cut < len(sizes)]
+
+	ranges = []
+	for position, start in enumerate(bounds):
+		end = bounds[position + 1] if position + 1 < len(bounds) else len(sizes)
+		size = int(sizes[end - 1] - (sizes[start - 1] if start else 0))
+		# the last range is left open, so that no stream is ever missed
+		last = int(index['stream'][end]) if end < len(sizes) else None
+		ranges.append(((int(index['stream'][start]) if start else 0, last), size))
+
+	return ranges
+#=========================================
+
+def plan_run(run_dir, files_list, backend='tshark', options=None, labels=None, default_label=batch.DEFAULT_LABEL,
+		unit_size=UNIT_SIZE):
+	"""
+	Writes the manifest of a run and puts all its units in the queue
+
+	param: the run directory, the list of capture files, the backend,
+	the dict of the other keyword arguments of
+	flow_engine.get_feature_table (timeouts, columns and protocols, the
+	cache is set by every worker), the dict of path -> class label and
+	the label of the other files (see batch.get_label), and the unit size
+	in bytes
+
+	return: the list of the units, see the module docstring
+	"""
+
+	if os.path.exists(os.path.join(run_dir, MANIFEST_NAME)):
+		raise ValueError('{} is planned already, use another run directory'.format(run_dir))
+	if options is None:
+		options = {}
+
+	units = []
+	for file in files_list:
+		path = os.path.abspath(file)
+		for streams, size in get_unit_ranges(path, unit_size, options.get('protocols', ('tcp',))):
+			units.append({
+				'unit': '{:06d}'.format(len(units)),
+				'file': path,
+				'streams': streams,
+				'bytes': size,
+				'label': batch.get_label(path, labels or {}, default_label),
+			})
+
+	for state in QUEUE_STATES:
+		os.makedirs(os.path.join(run_dir, 'queue', state), exist_ok=True)
+	os.makedirs(os.path.join(run_dir, 'parts'), exist_ok=True)
+
+	for unit in units:
+		write_json(os.path.join(run_dir, 'queue', 'todo', unit['unit']), {'attempts': 0, 'errors': []})
+
+	# the manifest last, a run without it is not planned
+	write_json(os.path.join(run_dir, MANIFEST_NAME), {
+		'version': MANIFEST_VERSION,
+		'time': time.time(),
+		'backend': backend,
+		'options': options,
+		'units': units,
+	})
+
+	return units
+#=========================================
+
+def write_json(path, data):
+	"""
+	Writes a json file at once (written to a temporary file and renamed)
+	"""
+
+	temp_file = '{}.{}.{}.tmp'.format(path, socket.gethostname(), os.getpid())
+	with open(temp_file, 'w') as f:
+		json.dump(data, f, indent=1)
+		f.flush()
+		os.fsync(f.fileno())
+	os.replace(temp_file, path)
+#=========================================
+
+def load_manifest(run_dir):
+	"""
+	Reads the manifest of a run
+
+	param: the run directory
+
+	return: dict of the manifest, see plan_run
+	"""
+
+	with open(os.path.join(run_dir, MANIFEST_NAME)) as f:
+		manifest = json.load(f)
+
+	if manifest.get('version') != MANIFEST_VERSION:
+		raise ValueError('{} is of version {}, expected {}'.format(run_dir, manifest.get('version'), MANIFEST_VERSION))
+
+	return manifest
+#=========================================
+
+class UnitQueue(object):
+	"""
+	The queue of the units of a run, on the shared storage -> a unit is
+	a file whose directory is its state, moved by renames only (which
+	are atomic, so a unit has one state and one worker at a time)
+	"""
+
+	def __init__(self, run_dir, worker=None, lease_time=LEASE_TIME, max_attempts=MAX_ATTEMPTS):
+		"""
+		param: the run directory, the name of this worker (None ->
+		<host>-<pid>), the lease time and the attempts of a unit
+		"""
+
+		self.run_dir = run_dir
+		self.worker = worker or '{}-{}'.format(socket.gethostname(), os.getpid())
+		self.lease_time = lease_time
+		self.max_attempts = max_attempts
+
+	def get_path(self, state, name=''):
+		return os.path.join(self.run_dir, 'queue', state, name)
+
+	def list(self, state):
+		"""
+		Returns the unit files of a state, sorted (without the temporary
+		files)
+		"""
+
+		return sorted(name for name in os.listdir(self.get_path(state)) if not name.endswith('.tmp'))
+
+	def claim(self):
+		"""
+		Takes the first unit of todo
+
+		return: the name of the unit, None if todo is empty
+		"""
+
+		for unit in self.list('todo'):
+			try:
+				os.rename(self.get_path('todo', unit), self.get_path('running', '{}@{}'.format(unit, self.worker)))
+			except FileNotFoundError:
+				# taken by another worker
+				continue
+			self.touch(unit)
+			return unit
+
+		return None
+
+	def touch(self, unit):
+		"""
+		Renews the lease of a unit this worker runs
+		"""
+
+		try:
+			os.utime(self.get_path('running', '{}@{}'.format(unit, self.worker)))
+		except FileNotFoundError:
+			pass
+
+	def get_time(self):
+		"""
+		Returns the current time of the shared storage -> the mtime of a
+		file this worker touches there, to compare with the mtimes of the
+		running units whatever the clock of this node
+		"""
+
+		path = self.get_path('clock', self.worker)
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		with open(path, 'a'):
+			pass
+		os.utime(path)
+
+		return os.stat(path).st_mtime
+
+	def read_attempts(self, path):
+		with open(path) as f:
+			return json.load(f)
+
+	def complete(self, unit):
+		"""
+		Moves a unit of this worker to done (once its part is written)
+
+		return: (bool) False if the unit was taken back from this worker
+		(its lease ran out), its part being the same anyway
+		"""
+
+		try:
+			os.rename(self.get_path('running', '{}@{}'.format(unit, self.worker)), self.get_path('done', unit))
+		except FileNotFoundError:
+			return False
+
+		return True
+
+	def fail(self, unit, error):
+		"""
+		Puts a failed unit of this worker back in todo, or in failed once
+		it failed max_attempts times
+
+		param: the unit and the error (traceback)
+		"""
+
+		path = self.get_path('running', '{}@{}'.format(unit, self.worker))
+		try:
+			attempts = self.read_attempts(path)
+		except FileNotFoundError:
+			return
+		attempts['attempts'] += 1
+		attempts['errors'].append({'worker': self.worker, 'time': time.time(), 'error': error})
+		write_json(path, attempts)
+
+		state = 'failed' if attempts['attempts'] >= self.max_attempts else 'todo'
+		print('unit {} failed ({} of {} attempts): {}'.format(unit, attempts['attempts'], self.max_attempts,
+			error.strip().splitlines()[-1]), file=sys.stderr)
+		try:
+			os.rename(path, self.get_path(state, unit))
+		except FileNotFoundError:
+			pass
+
+	def requeue_expired(self):
+		"""
+		Puts back in todo the running units whose lease ran out (their
+		worker is gone), as a failed attempt
+
+		return: (int) the number of units put back
+		"""
+
+		now = self.get_time()
+		count = 0
+
+		for name in self.list('running'):
+			unit, worker = name.split('@', 1)
+			path = self.get_path('running', name)
+			try:
+				if now - os.stat(path).st_mtime < self.lease_time:
+					continue
+				# taken over by a rename first, so that only one worker
+				# counts the attempt
+				os.rename(path, self.get_path('running', '{}@{}'.format(unit, self.worker)))
+			except FileNotFoundError:
+				continue
+
+			self.fail(unit, 'the lease of {} ran out'.format(worker))
+			count += 1
+
+		return count
+
+	def retry_failed(self):
+		"""
+		Puts the failed units back in todo, with their attempts reset
+
+		return: (int) the number of units put back
+		"""
+
+		count = 0
+		for unit in self.list('failed'):
+			path = self.get_path('failed', unit)
+			attempts = self.read_attempts(path)
+			attempts['attempts'] = 0
+			write_json(path, attempts)
+			try:
+				os.rename(path, self.get_path('todo', unit))
+			except FileNotFoundError:
+				continue
+			count += 1
+
+		return count
+
+	def get_status(self):
+		"""
+		Returns the number of units in every state
+
+		return: dict of state -> count
+		"""
+
+		return {state: len(self.list(state)) for state in QUEUE_STATES}
+#=========================================
+
+def get_part_file(run_dir, unit):
+	return os.path.join(run_dir, 'parts', unit + '.npz')
+#=========================================
+
+def write_part(run_dir, unit, feature_table):
+	"""
+	Writes the feature table of a unit to its part file (written to a
+	temporary file and renamed)
+	"""
+
+	path = get_part_file(run_dir, unit)
+	temp_file = '{}.{}.{}.tmp'.format(path, socket.gethostname(), os.getpid())
+	with open(temp_file, 'wb') as f:
+		np.savez(f, **feature_table)
+		f.flush()
+		os.fsync(f.fileno())
+	os.replace(temp_file, path)
+#=========================================
+
+def read_part(run_dir, unit):
+	"""
+	Reads the feature table of a unit from its part file
+
+	return: dict of column -> array
+	"""
+
+	with np.load(get_part_file(run_dir, unit)) as part:
+		return {column: part[column] for column in part.files}
+#=========================================
+
+def run_worker(run_dir, worker=None, cache_dir=None, cache_key='stat', cache_size=pc.CACHE_SIZE, lease_time=LEASE_TIME,
+		poll_interval=POLL_INTERVAL):
+	"""
+	Runs the units of a run until none is left (todo and running empty)
+
+	param: the run directory, the name of the worker (None ->
+	<host>-<pid>), the cache options of this node (see
+	flow_engine.get_flow_table), the lease time of the units and the
+	seconds between two looks at the queue while the other workers finish
+
+	return: (int) the number of units done by this worker
+	"""
+
+	manifest = load_manifest(run_dir)
+	units = {unit['unit']: unit for unit in manifest['units']}
+	options = dict(manifest['options'], cache_dir=cache_dir, cache_key=cache_key, cache_size=cache_size)
+	if options.get('protocols') is not None:
+		options['protocols'] = tuple(options['protocols'])
+	queue = UnitQueue(run_dir, worker, lease_time)
+	done = 0
+
+	while True:
+		unit = queue.claim()
+		if unit is None:
+			# the units of the workers which died come back to todo
+			if queue.requeue_expired():
+				continue
+			if not queue.list('running'):
+				return done
+			time.sleep(poll_interval)
+			continue
+
+		entry = units[unit]
+		streams = tuple(entry['streams']) if entry['streams'] is not None else None
+
+		# the lease is renewed while the unit runs
+		stop = threading.Event()
+		def renew():
+			while not stop.wait(lease_time / 4):
+				queue.touch(unit)
+		thread = threading.Thread(target=renew, daemon=True)
+		thread.start()
+
+		try:
+			feature_table = fe.get_feature_table(entry['file'], manifest['backend'], streams, **options)
+			write_part(run_dir, unit, feature_table)
+		except Exception:
+			queue.fail(unit, traceback.format_exc())
+			im.count('failed_tasks')
+		else:
+			if queue.complete(unit):
+				done += 1
+		finally:
+			stop.set()
+			thread.join()
+		im.count('tasks')
+#=========================================
+
+def _run_worker_process(run_dir, worker, cache_dir, cache_key, cache_size, lease_time, poll_interval):
+	"""
+	Runs a worker in a child process (see run_workers)
+	"""
+
+	done = run_worker(run_dir, worker, cache_dir, cache_key, cache_size, lease_time, poll_interval)
+	print('{} done, {} units'.format(worker, done), file=sys.stderr)
+#=========================================
+
+def run_workers(run_dir, processes=1, cache_dir=None, cache_key='stat', cache_size=pc.CACHE_SIZE, lease_time=LEASE_TIME,
+		poll_interval=POLL_INTERVAL):
+	"""
+	Runs several workers on this node, one process each (the same as
+	several nodes), see run_worker for the parameters
+	"""
+
+	if processes < 2:
+		return run_worker(run_dir, None, cache_dir, cache_key, cache_size, lease_time, poll_interval)
+
+	workers = [mp.Process(target=_run_worker_process, args=(run_dir, '{}-{}-{}'.format(socket.gethostname(), os.getpid(), index),
+		cache_dir, cache_key, cache_size, lease_time, poll_interval)) for index in range(processes)]
+	for worker in workers:
+		worker.start()
+	for worker in workers:
+		worker.join()
+#=========================================
+
+def merge_run(run_dir, output, format='csv', dtype=None, batch_rows=sk.BATCH_ROWS):
+	"""
+	Writes the parts of a run to one output, in the order of its manifest
+
+	param: the run directory, the output and its format and dtype (see
+	sinks.get_sink) and the rows written at once
+
+	return: (int) the number of rows written
+	"""
+
+	if os.path.exists(output):
+		raise ValueError('{} exists, the parts are merged into a new output'.format(output))
+
+	manifest = load_manifest(run_dir)
+	queue = UnitQueue(run_dir)
+
+	done = set(queue.list('done'))
+	missing = [unit['unit'] for unit in manifest['units'] if unit['unit'] not in done]
+	if missing:
+		raise ValueError('{} of the {} units of {} are not done ({}), see the status'.format(len(missing), len(manifest['units']),
+			run_dir, ', '.join(missing[:10]) + (', ...' if len(missing) > 10 else '')))
+
+	columns = manifest['options'].get('columns') or fs.select_columns()
+	sink = sk.get_sink(output, format, columns, dtype, batch_rows)
+	rows = 0
+
+	with im.timed('output'):
+		for unit in manifest['units']:
+			feature_table = read_part(run_dir, unit['unit'])
+			count = len(feature_table['stream'])
+			feature_table['file'] = np.full(count, unit['file'], dtype=object)
+			feature_table['class'] = np.full(count, unit['label'], dtype=object)
+			sink.write(feature_table)
+			rows += count
+
+		sink.sync()
+		sink.close()
+	im.count('rows', rows)
+
+	return rows
+#=========================================
+
+def print_status(run_dir):
+	"""
+	Prints the units of a run in every state, and the errors of the
+	failed ones
+	"""
+
+	manifest = load_manifest(run_dir)
+	queue = UnitQueue(run_dir)
+	status = queue.get_status()
+
+	print('{} units ({:.1f} MB): {}'.format(len(manifest['units']), sum(unit['bytes'] for unit in manifest['units']) / 1e6,
+		', '.join('{} {}'.format(count, state) for state, count in status.items())))
+	for name in queue.list('running'):
+		print('  running {}'.format(name))
+	for unit in queue.list('failed'):
+		attempts = queue.read_attempts(queue.get_path('failed', unit))
+		print('  failed {} ({} attempts): {}'.format(unit, attempts['attempts'], attempts['errors'][-1]['error'].strip().splitlines()[-1]))
+#=========================================
+
+def main():
+	parser = argparse.ArgumentParser(description='Extract the flow features of a corpus on many nodes, through a shared run directory.')
+	commands = parser.add_subparsers(dest='command', metavar='command')
+	commands.required = True
+
+	plan = commands.add_parser('plan', help='cut the capture files into units and queue them')
+	plan.add_argument('run_dir', help='the run directory, on a storage which all the nodes mount at the same path')
+	plan.add_argument('path', nargs='+', help='the pcap files, or the directories with the pcap files')
+	plan.add_argument('--extension', default='pcap', help='the extension(s) of the capture files, separated by commas, or glob patterns '
+		'of their names, e.g. pcap,pcapng,pcap.gz or \'*.pcap*\' (default pcap)')
+	plan.add_argument('--backend', default='tshark', choices=fe.BACKENDS, help='read the files with tshark or the native pcap reader')
+	plan.add_argument('--unit-size', type=float, default=UNIT_SIZE / (1024 * 1024),
+		help='cut the files larger than this (in MB of packets) into ranges of streams')
+	plan.add_argument('--label', action='append', default=[], metavar='PATH=CLASS',
+		help='the class of the streams of a file or directory, can be repeated')
+	plan.add_argument('--default-label', default=batch.DEFAULT_LABEL, help='the class of the files without a --label')
+	plan.add_argument('--clump-timeout', type=float, default=st.CLUMP_TIMEOUT, help='the CLUMP_TIMEOUT of the active/idle times')
+	plan.add_argument('--active-timeout', type=float, default=st.ACTIVE_TIMEOUT, help='the ACTIVE_TIMEOUT of the active/idle times')
+	plan.add_argument('--protocols', nargs='+', default=['tcp'], choices=list(pr.PROTOCOLS),
+		help='the protocols of the flows (default tcp)')
+	plan.add_argument('--flow-timeout', type=float, default=pr.FLOW_TIMEOUT,
+		help='the inactivity timeout of the udp and icmp flows (0 -> never)')
+	plan.add_argument('--features', nargs='+', default=None, metavar='FEATURE',
+		help='the features (or groups of features, see features.py) to compute (default all)')
+
+	work = commands.add_parser('work', help='run the units of a run until none is left')
+	work.add_argument('run_dir', help='the run directory')
+	work.add_argument('--processes', type=int, default=1, help='the number of worker processes on this node')
+	work.add_argument('--cache-dir', default=None, help='cache the parsed packets in this directory (e.g. {})'.format(pc.CACHE_DIR))
+	work.add_argument('--cache-key', default='stat', choices=pc.CACHE_KEYS, help='how the cache recognises a file')
+	work.add_argument('--cache-size', type=int, default=pc.CACHE_SIZE // (1024 * 1024), help='the size limit of the cache in MB')
+	work.add_argument('--lease-time', type=float, default=LEASE_TIME,
+		help='seconds after which the unit of a worker which stopped touching it is redone')
+	work.add_argument('--retry-failed', action='store_true', help='run the units which failed {} times again'.format(MAX_ATTEMPTS))
+
+	status = commands.add_parser('status', help='print the units of a run in every state')
+	status.add_argument('run_dir', help='the run directory')
+
+	merge = commands.add_parser('merge', help='write the parts of a run to one output, in the order of the manifest')
+	merge.add_argument('run_dir', help='the run directory')
+	merge.add_argument('--output', default='test.csv',
+		help='the csv file to append the features to (a directory for parquet and arrow)')
+	merge.add_argument('--format', default='csv', choices=sk.FORMATS, help='the format of the output (see sinks.py)')
+	merge.add_argument('--dtype', default=None, choices=sk.DTYPES,
+		help='the dtype of the features (default float32 for memmap, float64 otherwise)')
+	args = parser.parse_args()
+
+	if args.command == 'plan':
+		files_list = []
+		for path in args.path:
+			if os.path.isfile(path):
+				files_list.append(path)
+			else:
+				files_list += gfs.get_all_files_within_dir(os.path.join(path, ''), args.extension)
+		options = {
+			'clump_timeout': args.clump_timeout,
+			'active_timeout': args.active_timeout,
+			'columns': fs.select_columns(args.features),
+			'protocols': tuple(name for name in pr.PROTOCOLS if name in args.protocols),
+			'flow_timeout': args.flow_timeout or None,
+		}
+		units = plan_run(args.run_dir, files_list, args.backend, options, md.get_labels(args.label), args.default_label,
+			max(1, int(args.unit_size * 1024 * 1024)))
+		print('{} units of {} files'.format(len(units), len(files_list)), file=sys.stderr)
+
+	elif args.command == 'work':
+		if args.retry_failed:
+			UnitQueue(args.run_dir).retry_failed()
+		run_workers(args.run_dir, args.processes, args.cache_dir, args.cache_key, args.cache_size * 1024 * 1024, args.lease_time)
+
+	elif args.command == 'status':
+		print_status(args.run_dir)
+
+	else:
+		rows = merge_run(args.run_dir, args.output, args.format, args.dtype)
+		print('{} rows written to {}'.format(rows, args.output), file=sys.stderr)
+#=========================================
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,499 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The registry of the features and the planner which computes only the
+selected ones.
+
+>Every feature (or group of columns, like the min/max/mean/std of the
+fwd iat) declares the intermediates it needs, and every intermediate
+declares the ones it is made from -> the packet arrays of the flow
+table, the flow numbers, the durations, the iat arrays, the active and
+idle times. The planner walks these needs for the selected columns and
+computes every intermediate once for all the flows of the table (with
+the kernels of the kernels.py file), so the features which are not
+selected cost nothing and the ones which share an intermediate share
+its cost.
+
+>A new feature is a function registered with @feature, from the
+intermediates already there (or new ones registered with
+@intermediate), so it is computed from the same single pass over the
+pcap file as the others.
+
+>The columns are selected by their name, or by the name of a group they
+are registered in (GROUPS, e.g. 'fwd' -> fwd_min, fwd_max, fwd_mean,
+fwd_std). The optional features are not in the default (or 'all')
+columns, and only computed when they are selected. The quantile groups (e.g. 'fwd_quantiles' -> fwd_p50,
+fwd_p90, fwd_p99, or 'quantiles' for all of them) are exact here, and
+come from the fixed size sketches of the sketches.py file in the
+streaming mode.
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import numpy as np
+
+from . import statistics as st
+from . import kernels as kn
+from . import sketches as qs
+#=========================================
+#=========================================
+
+##========================================
+#=============--CONSTANTS--===============
+# the values given to the planner -> the packet arrays of the flow
+# table (grouped by the flow), the start index of every flow and the
+# parameters of the features
+INPUTS = ('time', 'fwd', 'rev', 'length', 'starts', 'clump_timeout', 'active_timeout')
+##========================================
+
+# name -> (needed names, function of the values dict)
+INTERMEDIATES = {}
+# list of (columns, needed names, function of the values dict returning
+# a dict of column -> array), in the order of the output columns
+FEATURES = []
+# the name of a group -> its columns, in the order of the output
+GROUPS = {}
+# the optional columns, see get_columns
+OPTIONAL = set()
+
+def intermediate(name, needs=()):
+	"""
+	Registers the function computing an intermediate
+
+	param: the name of the intermediate and the names it is made from
+	(INPUTS or other intermediates)
+
+	return: the decorator
+	"""
+
+	def register(function):
+		INTERMEDIATES[name] = (tuple(needs), function)
+		return function
+
+	return register
+#=========================================
+
+def feature(columns, needs=(), groups=(), optional=False):
+	"""
+	Registers the function computing a group of feature columns
+
+	param: the list of the columns, the intermediates they need, the
+	names of the groups which select them (see select_columns) and
+	whether they are optional (not in the default columns)
+
+	return: the decorator
+	"""
+
+	def register(function):
+		FEATURES.append((list(columns), tuple(needs), function))
+		for group in groups:
+			GROUPS.setdefault(group, []).extend(columns)
+		if optional:
+			OPTIONAL.update(columns)
+		return function
+
+	return register
+#=========================================
+
+def get_columns(optional=False):
+	"""
+	Returns all the feature columns, in the order of the output
+
+	param: whether to add the columns of the optional groups
+
+	return: list of the column names
+	"""
+
+	skipped = set() if optional else OPTIONAL
+
+	return [column for columns, needs, function in FEATURES for column in columns if column not in skipped]
+#=========================================
+
+def select_columns(names=None):
+	"""
+	Expands a selection of features into their columns -> a column name,
+	a group name of GROUPS (e.g. 'fwd' -> fwd_min, fwd_max, fwd_mean,
+	fwd_std, 'fwd_quantiles' -> fwd_p50, fwd_p90, fwd_p99, 'quantiles'
+	-> the columns of all the quantile groups) or 'all' (the default
+	columns)
+
+	param: list of the names (None -> all)
+
+	return: list of the selected columns, in the order of the output
+	"""
+
+	default_columns = get_columns()
+	if names is None:
+		return default_columns
+
+	all_columns = get_columns(optional=True)
+	selected = set()
+	for name in names:
+		if name == 'all':
+			selected.update(default_columns)
+		elif name in GROUPS:
+			selected.update(GROUPS[name])
+		elif name in all_columns:
+			selected.add(name)
+		else:
+			raise ValueError('unknown feature {}, expected a column ({}), a group ({}) or all'.format(name,
+				', '.join(all_columns), ', '.join(GROUPS)))
+
+	return [column for column in all_columns if column in selected]
+#=========================================
+
+def plan(columns):
+	"""
+	Plans the computation of the columns
+
+	param: list of the columns
+
+	return: tuple of (the intermediates in the order of their computation,
+	each needed one only once, and the feature groups to run)
+	"""
+
+	wanted = set(columns)
+	groups = [group for group in FEATURES if wanted.intersection(group[0])]
+
+	order = []
+	def visit(name, path):
+		if name in INPUTS or name in order:
+			return
+		if name not in INTERMEDIATES:
+			raise ValueError('unknown intermediate {}'.format(name))
+		if name in path:
+			raise ValueError('circular intermediates {}'.format(' -> '.join(path + (name,))))
+		for need in INTERMEDIATES[name][0]:
+			visit(need, path + (name,))
+		order.append(name)
+
+	for group_columns, needs, function in groups:
+		for need in needs:
+			visit(need, ())
+
+	return (order, groups)
+#=========================================
+
+def compute_features(times, fwd, rev, lengths, starts, clump_timeout=st.CLUMP_TIMEOUT, active_timeout=st.ACTIVE_TIMEOUT, columns=None):
+	"""
+	Computes the selected features of all the flows at once
+
+	>fwd and rev are masks, every packet is in exactly one of them (see
+	flow_engine.make_flow_table and segregate.get_flow)
+
+	>flows of a single packet (zero duration) give inf/nan rates, where
+	the per stream getters raise a ZeroDivisionError
+
+	param: the arrays of packet times, fwd mask, rev mask and lengths,
+	grouped by the flow in the capture order, the start index of every
+	flow, the two timeouts of the active and idle times and the list of
+	the columns (None -> all, see select_columns)
+
+	return: dict of the columns -> array with one entry per flow
+	"""
+
+	if columns is None:
+		columns = get_columns()
+
+	values = {
+		'time': times,
+		'fwd': fwd,
+		'rev': rev,
+		'length': lengths,
+		'starts': starts,
+		'clump_timeout': clump_timeout,
+		'active_timeout': active_timeout,
+	}
+
+	order, groups = plan(columns)
+	for name in order:
+		values[name] = INTERMEDIATES[name][1](values)
+
+	features = {}
+	wanted = set(columns)
+	for group_columns, needs, function in groups:
+		result = function(values)
+		for column in group_columns:
+			if column in wanted:
+				features[column] = result[column]
+
+	return features
+#=========================================
+
+def get_stats_columns(name, stats):
+	"""
+	Names the (min, max, mean, std) arrays of kernels.segment_stats
+
+	return: dict of '<name>_min' ... '<name>_std' -> array
+	"""
+
+	return {'{}_{}'.format(name, stat): column for stat, column in zip(('min', 'max', 'mean', 'std'), stats)}
+#=========================================
+
+def get_quantiles_columns(name, values, segments, n_segments):
+	"""
+	Computes the sketches.QUANTILES of the values of every flow (see
+	kernels.segment_quantiles)
+
+	return: dict of '<name>_p50' ... -> array
+	"""
+
+	results = kn.segment_quantiles(values, segments, n_segments, qs.QUANTILES)
+
+	return dict(zip(qs.get_quantile_columns(name), results))
+#=========================================
+
+##========================================
+#==========--INTERMEDIATES--==============
+
+@intermediate('counts', needs=('time', 'starts'))
+def get_counts(values):
+	"""
+	The number of packets of every flow
+	"""
+
+	return np.diff(np.append(values['starts'], len(values['time'])))
+#=========================================
+
+@intermediate('n_flows', needs=('starts',))
+def get_n_flows(values):
+	"""
+	The number of flows
+	"""
+
+	return len(values['starts'])
+#=========================================
+
+@intermediate('flows', needs=('counts', 'n_flows'))
+def get_flows(values):
+	"""
+	The flow number of every packet
+	"""
+
+	return np.repeat(np.arange(values['n_flows']), values['counts'])
+#=========================================
+
+@intermediate('durations', needs=('time', 'starts', 'counts'))
+def get_durations(values):
+	"""
+	The duration of every flow
+	"""
+
+	ends = values['starts'] + values['counts'] - 1
+	return values['time'][ends] - values['time'][values['starts']]
+#=========================================
+
+@intermediate('fwd_iat', needs=('time', 'fwd', 'flows'))
+def get_fwd_iat(values):
+	"""
+	The iat of the forward packets (see kernels.get_direction_iat)
+	"""
+
+	return kn.get_direction_iat(values['time'], values['fwd'], values['flows'])
+#=========================================
+
+@intermediate('rev_iat', needs=('time', 'rev', 'flows'))
+def get_rev_iat(values):
+	"""
+	The iat of the backward packets (see kernels.get_direction_iat)
+	"""
+
+	return kn.get_direction_iat(values['time'], values['rev'], values['flows'])
+#=========================================
+
+@intermediate('pair_iat', needs=('time', 'fwd', 'rev', 'flows', 'n_flows'))
+def get_pair_iat(values):
+	"""
+	The 'flow iat' (see kernels.get_pair_iat)
+	"""
+
+	return kn.get_pair_iat(values['time'], values['fwd'], values['rev'], values['flows'], values['n_flows'])
+#=========================================
+
+@intermediate('active_idle', needs=('time', 'flows', 'starts', 'clump_timeout', 'active_timeout'))
+def get_active_idle(values):
+	"""
+	The active and idle times (see kernels.get_active_idle)
+	"""
+
+	return kn.get_active_idle(values['time'], values['flows'], values['starts'],
+		values['clump_timeout'], values['active_timeout'])
+#=========================================
+
+@intermediate('total_bytes', needs=('length', 'starts', 'n_flows'))
+def get_total_bytes(values):
+	"""
+	The bytes of every flow
+	"""
+
+	if values['n_flows'] == 0:
+		return np.zeros(0)
+	return np.add.reduceat(values['length'], values['starts'])
+#=========================================
+##========================================
+
+##========================================
+#=============--FEATURES--================
+# registered in the order of the columns of the output csv
+
+@feature(['duration'], needs=('durations',))
+def duration_feature(values):
+	"""
+	The flow duration
+	"""
+
+	return {'duration': values['durations']}
+#=========================================
+
+@feature(['fwd_min', 'fwd_max', 'fwd_mean', 'fwd_std'], needs=('fwd_iat', 'n_flows'), groups=('fwd',))
+def fwd_iat_features(values):
+	"""
+	The min, max, mean and std of the forward iat
+	"""
+
+	iat, flows = values['fwd_iat']
+	return get_stats_columns('fwd', kn.segment_stats(iat, flows, values['n_flows']))
+#=========================================
+
+@feature(['rev_min', 'rev_max', 'rev_mean', 'rev_std'], needs=('rev_iat', 'n_flows'), groups=('rev',))
+def rev_iat_features(values):
+	"""
+	The min, max, mean and std of the backward iat
+	"""
+
+	iat, flows = values['rev_iat']
+	return get_stats_columns('rev', kn.segment_stats(iat, flows, values['n_flows']))
+#=========================================
+
+@feature(['flow_min', 'flow_max', 'flow_mean', 'flow_std'], needs=('pair_iat', 'n_flows'), groups=('flow',))
+def flow_iat_features(values):
+	"""
+	The min, max, mean and std of the 'flow iat'
+	"""
+
+	iat, flows = values['pair_iat']
+	# np.mean/np.std of an empty list are nan
+	return get_stats_columns('flow', kn.segment_stats(iat, flows, values['n_flows'], (0, 0, np.nan, np.nan)))
+#=========================================
+
+@feature(['active_min', 'active_max', 'active_mean', 'active_std'], needs=('active_idle', 'n_flows'), groups=('active',))
+def active_features(values):
+	"""
+	The min, max, mean and std of the active times
+	"""
+
+	active, active_flows, idle, idle_flows = values['active_idle']
+	return get_stats_columns('active', kn.segment_stats(active, active_flows, values['n_flows']))
+#=========================================
+
+@feature(['idle_min', 'idle_max', 'idle_mean', 'idle_std'], needs=('active_idle', 'n_flows'), groups=('idle',))
+def idle_features(values):
+	"""
+	The min, max, mean and std of the idle times
+	"""
+
+	active, active_flows, idle, idle_flows = values['active_idle']
+	return get_stats_columns('idle', kn.segment_stats(idle, idle_flows, values['n_flows']))
+#=========================================
+
+@feature(['flow_bytes_psec'], needs=('total_bytes', 'durations'))
+def bytes_rate_feature(values):
+	"""
+	The bytes per second of the flow
+	"""
+
+	with np.errstate(divide='ignore', invalid='ignore'):
+		return {'flow_bytes_psec': values['total_bytes'] / values['durations']}
+#=========================================
+
+@feature(['flow_packets_psec'], needs=('counts', 'durations'))
+def packets_rate_feature(values):
+	"""
+	The packets per second of the flow
+	"""
+
+	with np.errstate(divide='ignore', invalid='ignore'):
+		return {'flow_packets_psec': values['counts'] / values['durations']}
+#=========================================
+##========================================
+
+##========================================
+#=========--OPTIONAL FEATURES--===========
+# the quantiles of the series of the flows, after the default columns
+
+@feature(qs.get_quantile_columns('fwd'), needs=('fwd_iat', 'n_flows'), groups=('fwd_quantiles', 'quantiles'),
+	optional=True)
+def fwd_iat_quantiles(values):
+	"""
+	The median, p90 and p99 of the forward iat
+	"""
+
+	iat, flows = values['fwd_iat']
+	return get_quantiles_columns('fwd', iat, flows, values['n_flows'])
+#=========================================
+
+@feature(qs.get_quantile_columns('rev'), needs=('rev_iat', 'n_flows'), groups=('rev_quantiles', 'quantiles'),
+	optional=True)
+def rev_iat_quantiles(values):
+	"""
+	The median, p90 and p99 of the backward iat
+	"""
+
+	iat, flows = values['rev_iat']
+	return get_quantiles_columns('rev', iat, flows, values['n_flows'])
+#=========================================
+
+@feature(qs.get_quantile_columns('flow'), needs=('pair_iat', 'n_flows'), groups=('flow_quantiles', 'quantiles'),
+	optional=True)
+def flow_iat_quantiles(values):
+	"""
+	The median, p90 and p99 of the 'flow iat'
+	"""
+
+	iat, flows = values['pair_iat']
+	return get_quantiles_columns('flow', iat, flows, values['n_flows'])
+#=========================================
+
+@feature(qs.get_quantile_columns('active'), needs=('active_idle', 'n_flows'), groups=('active_quantiles', 'quantiles'),
+	optional=True)
+def active_quantiles(values):
+	"""
+	The median, p90 and p99 of the active times
+	"""
+
+	active, active_flows, idle, idle_flows = values['active_idle']
+	return get_quantiles_columns('active', active, active_flows, values['n_flows'])
+#=========================================
+
+@feature(qs.get_quantile_columns('idle'), needs=('active_idle', 'n_flows'), groups=('idle_quantiles', 'quantiles'),
+	optional=True)
+def idle_quantiles(values):
+	"""
+	The median, p90 and p99 of the idle times
+	"""
+
+	active, active_flows, idle, idle_flows = values['active_idle']
+	return get_quantiles_columns('idle', idle, idle_flows, values['n_flows'])
+#=========================================
+
+@feature(qs.get_quantile_columns('size'), needs=('length', 'flows', 'n_flows'), groups=('size_quantiles', 'quantiles'),
+	optional=True)
+def size_quantiles(values):
+	"""
+	The median, p90 and p99 of the packet lengths (frame.len)
+	"""
+
+	return get_quantiles_columns('size', values['length'], values['flows'], values['n_flows'])
+#=========================================
+##========================================
+
+##========================================
+#=============--CONSTANTS--===============
+# The 23 default features (without the optional groups), in the order of
+# the columns of the output csv
+FEATURE_COLUMNS = get_columns()
+##========================================
@@ -0,0 +1,196 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The Flow container -> the packets of one tcp stream as parallel numpy
+arrays instead of 'src,dst,time' strings.
+
+>The packets are grouped by their direction (see segregate.py) -> the
+forward packets first (the src endpoint of the first packet), then the
+backward packets, each group in the capture order. So the forward and
+the backward packets are slices of the arrays (views, no copy), and
+'order' keeps the capture position of every packet.
+
+>The times are float64 (frame.time_relative), the lengths uint16 (or
+uint32 when a packet is larger) and the capture positions uint16 (or
+uint32 for the flows of 65536 packets or more), about a dozen bytes per
+packet. The two endpoints (ip, tcp port) are kept once per flow.
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import socket
+import struct
+
+import numpy as np
+
+from . import statistics as st
+from . import stream_index as si
+#=========================================
+#=========================================
+
+class Flow(object):
+	"""
+	The packets of one flow, grouped by their direction, see the module
+	docstring
+	"""
+
+	__slots__ = ('stream', 'src', 'dst', 'time', 'length', 'order', 'n_fwd', 'n_rev')
+
+	def __init__(self, stream, src, dst, time, length, order, n_fwd, n_rev):
+		"""
+		param: the stream number, the endpoints (the src and dst (ip, port)
+		of the first packet), the arrays of the times, lengths and capture
+		positions grouped by the direction, and the number of forward and
+		backward packets
+		"""
+
+		self.stream = stream
+		self.src = src
+		self.dst = dst
+		self.time = time
+		self.length = length
+		self.order = order
+		self.n_fwd = n_fwd
+		self.n_rev = n_rev
+
+	def __len__(self):
+		return len(self.time)
+
+	def get_rev_slice(self):
+		"""
+		Returns the slice of the backward packets in the arrays
+		"""
+
+		return slice(self.n_fwd, self.n_fwd + self.n_rev)
+
+	@property
+	def fwd_time(self):
+		return self.time[:self.n_fwd]
+
+	@property
+	def rev_time(self):
+		return self.time[self.get_rev_slice()]
+
+	@property
+	def fwd_length(self):
+		return self.length[:self.n_fwd]
+
+	@property
+	def rev_length(self):
+		return self.length[self.get_rev_slice()]
+
+	@property
+	def nbytes(self):
+		return self.time.nbytes + self.length.nbytes + self.order.nbytes
+
+	def get_times(self):
+		"""
+		Returns the times of all the packets in the capture order (a copy)
+		"""
+
+		times = np.empty_like(self.time)
+		times[self.order] = self.time
+		return times
+
+	def get_lengths(self):
+		"""
+		Returns the lengths of all the packets in the capture order (a copy)
+		"""
+
+		lengths = np.empty_like(self.length)
+		lengths[self.order] = self.length
+		return lengths
+
+	def to_lists(self):
+		"""
+		Returns the packets the old way -> [fwd list, rev list] of
+		'src,dst,time' strings
+		"""
+
+		fwd = ['{},{},{:.9f}'.format(self.src[0], self.dst[0], time) for time in self.fwd_time.tolist()]
+		rev = ['{},{},{:.9f}'.format(self.dst[0], self.src[0], time) for time in self.rev_time.tolist()]
+
+		return [fwd, rev]
+#=========================================
+
+def make_flow(stream, src, dst, addresses, ports, times, lengths):
+	"""
+	Makes the Flow of the packets of a stream
+
+	param: the stream number, the src and dst endpoints (ip, port) of the
+	first packet, the lists of the src ip addresses (in any hashable
+	form, e.g. bytes or str) and the src ports, the times and the lengths
+	of the packets in the capture order
+
+	return: the Flow
+	"""
+
+	count = len(times)
+	if count == 0:
+		return Flow(stream, None, None, np.zeros(0), np.zeros(0, dtype=np.uint16), np.zeros(0, dtype=np.uint16), 0, 0)
+
+	# the src endpoints as address code * 65536 + port (like
+	# flow_engine.get_endpoints), compared in one vectorized pass
+	codes = {}
+	endpoints = np.array([codes.setdefault(address, len(codes)) for address in addresses], dtype=np.int64) << 16 \
+		| np.asarray(ports, dtype=np.int64)
+
+	# False -> forward, True -> backward
+	direction = endpoints != endpoints[0]
+	order = np.argsort(direction, kind='stable').astype(np.uint16 if count <= 0x10000 else np.uint32)
+	n_rev = int(np.count_nonzero(direction))
+	n_fwd = count - n_rev
+
+	lengths = np.asarray(lengths)
+	length_dtype = np.uint16 if lengths.max() <= 0xFFFF else np.uint32
+
+	return Flow(stream, src, dst, np.asarray(times, dtype=np.float64)[order], lengths.astype(length_dtype)[order],
+		order, n_fwd, n_rev)
+#=========================================
+
+def read_flow(file, stream_no):
+	"""
+	Reads the packets of one tcp stream of a file into a Flow -> by
+	seeking to its records with the stream index (see stream_index.py),
+	or else from the tshark output of the stream
+
+	param: the pcap file and the stream number
+
+	return: the Flow
+	"""
+
+	try:
+		packets = si.get_stream_packets(file, int(stream_no))
+	except (OSError, ValueError, struct.error):
+		packets = None
+
+	if packets is not None:
+		if not packets['time']:
+			return make_flow(stream_no, None, None, [], [], [], [])
+
+		def get_name(address):
+			return socket.inet_ntop(socket.AF_INET if len(address) == 4 else socket.AF_INET6, address)
+
+		times = np.array(packets['time'], dtype=np.int64) / 1e9
+
+		return make_flow(stream_no, (get_name(packets['src'][0]), packets['sport'][0]),
+			(get_name(packets['dst'][0]), packets['dport'][0]), packets['src'], packets['sport'], times, packets['length'])
+
+	lines = st.get_stream_fields(file, stream_no, ['ip.src', 'ipv6.src', 'ip.dst', 'ipv6.dst', 'tcp.srcport', 'tcp.dstport',
+		'frame.time_relative', 'frame.len'], ',')
+	fields = [line.split(',') for line in lines]
+	if not fields:
+		return make_flow(stream_no, None, None, [], [], [], [])
+
+	# the ip or the ipv6 address, whichever the packet has
+	sources = [field[0] or field[1] for field in fields]
+	ports = [int(field[4]) for field in fields]
+	first = fields[0]
+
+	return make_flow(stream_no, (sources[0], ports[0]), (first[2] or first[3], int(first[5])), sources, ports,
+		[float(field[6]) for field in fields], [int(field[7]) for field in fields])
+#=========================================
@@ -0,0 +1,459 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The single pass extraction engine. Instead of starting a tshark
+process for every feature of every stream (each one rereading the
+whole capture), tshark is run only once per pcap file and exports
+the fields below for every tcp packet.
+
+>The rows are grouped by the tcp stream in memory and all the 23
+features are computed from that one table, using the same functions
+as the per stream getters in the statistics.py file, so that the
+numbers are the same.
+
+>The same table can also be built without tshark by the native
+reader in the pcap_reader.py file (backend='native').
+
+>The udp and icmp flows (protocols, see pcap_reader.PROTOCOLS) come
+from the same single pass over the file and go through the same
+kernels. Their flows are numbered per protocol (pcap_reader.FlowTracker),
+so the flows are keyed by the pair (protocol, stream).
+
+>get_feature_table computes the features of all the streams at once
+with the vectorized kernels of the kernels.py file, get_file_features
+goes stream by stream with the functions of the statistics.py file.
+
+>The parsed flow table can be cached on disk (packet_cache.py), so that
+changing only the feature parameters does not parse the file again.
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import subprocess as sp
+
+import numpy as np
+
+from . import statistics as st
+from . import pcap_reader as pr
+from . import kernels as kn
+from . import features as fs
+from . import packet_cache as pc
+from . import instrument as im
+#=========================================
+#=========================================
+
+##========================================
+#=============--CONSTANTS--===============
+# The fields exported by tshark for every packet, in this order
+# (ipv6.src/ipv6.dst are used when the packet has no IPv4 header)
+TSHARK_FIELDS = ['tcp.stream', 'ip.src', 'ip.dst', 'ipv6.src', 'ipv6.dst', 'frame.time_relative', 'frame.len',
+	'tcp.srcport', 'tcp.dstport', 'udp.srcport', 'udp.dstport', 'icmp.type', 'icmpv6.type']
+
+# The display filters of the protocols of the flows
+TSHARK_FILTERS = {
+	'tcp': 'tcp',
+	'udp': 'udp',
+	'icmp': 'icmp or icmpv6',
+}
+
+# The packet table can be built from the tshark output or by the
+# native pcap reader (pcap_reader.py), both give the same table
+BACKENDS = ('tshark', 'native')
+##========================================
+
+def get_tshark_protocol(stream, udp_port, icmp_type, icmpv6_type):
+	"""
+	Returns the ip protocol of a packet printed by tshark, from which of
+	the fields are set (the icmp errors also carry the quoted udp or tcp
+	header, like the native reader they are icmp packets)
+
+	param: the tcp.stream, udp.srcport, icmp.type and icmpv6.type fields
+
+	return: (int) the ip protocol number, or None if the packet is of
+	none of the pcap_reader.PROTOCOLS (e.g. the first frame of streaming.py)
+	"""
+
+	if icmp_type != '':
+		return pr.IPPROTO_ICMP
+	if icmpv6_type != '':
+		return pr.IPPROTO_ICMPV6
+	if stream != '':
+		return pr.IPPROTO_TCP
+	if udp_port != '':
+		return pr.IPPROTO_UDP
+
+	return None
+#=========================================
+
+def get_packet_table(file, backend='tshark', streams=None, protocols=('tcp',), flow_timeout=pr.FLOW_TIMEOUT):
+	"""
+	Reads all the packets of the file in a single pass, with the chosen
+	backend
+
+	param: the pcap file to parse, the backend ('tshark' or 'native'),
+	optionally the range of tcp streams to keep as (first, last), where
+	last is excluded and may be None for all the remaining streams, the
+	protocols of the flows (see pcap_reader.PROTOCOLS) and the inactivity
+	timeout of the udp and icmp flows (see pcap_reader.FlowTracker)
+
+	return: dict of numpy arrays -> 'stream', 'protocol', 'src', 'dst'
+	(ip addresses as integer codes), 'sport', 'dport', 'time' and
+	'length', one entry per packet in the capture order (see
+	pcap_reader.read_packet_table)
+	"""
+
+	if backend == 'native':
+		with im.timed('decode'):
+			table = pr.read_packet_table(file, protocols=protocols, flow_timeout=flow_timeout)
+		return select_streams(table, streams)
+	if backend != 'tshark':
+		raise ValueError('unknown backend {}, expected one of {}'.format(backend, BACKENDS))
+
+	display_filter = ' or '.join(TSHARK_FILTERS[name] for name in pr.PROTOCOLS if name in protocols)
+	if streams is not None:
+		display_filter = 'tcp.stream >= {}'.format(streams[0])
+		if streams[1] is not None:
+			display_filter += ' and tcp.stream < {}'.format(streams[1])
+
+	# -E occurrence=f keeps only the outer ip header for tunnelled packets
+	command = ['tshark', '-r', file, '-Y', display_filter, '-T', 'fields',
+		'-E', 'separator=,', '-E', 'occurrence=f']
+	for field in TSHARK_FIELDS:
+		command += ['-e', field]
+
+	with im.timed('tshark'):
+		out = sp.check_output(command, stderr=sp.DEVNULL, universal_newlines=True)
+
+	with im.timed('parse'):
+		return parse_tshark_output(out, protocols, flow_timeout)
+#=========================================
+
+def parse_tshark_output(out, protocols=('tcp',), flow_timeout=pr.FLOW_TIMEOUT):
+	"""
+	Parses the TSHARK_FIELDS printed by tshark into the packet table
+
+	param: (str) the output of tshark, and the protocols and the timeout
+	of the udp and icmp flows (see get_packet_table)
+
+	return: the packet table, see get_packet_table
+	"""
+
+	ip_protocols = pr.get_ip_protocols(protocols)
+	flow_tracker = pr.FlowTracker(flow_timeout)
+	addresses = {}
+
+	stream_col = []
+	protocol_col = []
+	src_col = []
+	dst_col = []
+	sport_col = []
+	dport_col = []
+	time_col = []
+	len_col = []
+
+	for line in out.split('\n'):
+		if line == '':
+			continue
+
+		(stream, ip_src, ip_dst, ipv6_src, ipv6_dst, time, length, sport, dport,
+			udp_sport, udp_dport, icmp_type, icmpv6_type) = line.split(',')
+		if ip_src == '':
+			ip_src, ip_dst = ipv6_src, ipv6_dst
+
+		protocol = get_tshark_protocol(stream, udp_sport, icmp_type, icmpv6_type)
+		if protocol not in ip_protocols:
+			continue
+		if protocol == pr.IPPROTO_UDP:
+			sport, dport = udp_sport, udp_dport
+		elif protocol != pr.IPPROTO_TCP:
+			sport = dport = '0'
+
+		if protocol == pr.IPPROTO_TCP:
+			stream_col.append(int(stream))
+		else:
+			stream_col.append(flow_tracker.get_flow(protocol, ip_src, int(sport), ip_dst, int(dport), float(time)))
+		protocol_col.append(protocol)
+		src_col.append(addresses.setdefault(ip_src, len(addresses)))
+		dst_col.append(addresses.setdefault(ip_dst, len(addresses)))
+		sport_col.append(int(sport))
+		dport_col.append(int(dport))
+		time_col.append(float(time))
+		len_col.append(int(length))
+
+	table = {
+		'stream': np.array(stream_col, dtype=np.int64),
+		'protocol': np.array(protocol_col, dtype=np.int64),
+		'src': np.array(src_col, dtype=np.int64),
+		'dst': np.array(dst_col, dtype=np.int64),
+		'sport': np.array(sport_col, dtype=np.int64),
+		'dport': np.array(dport_col, dtype=np.int64),
+		'time': np.array(time_col, dtype=np.float64),
+		'length': np.array(len_col, dtype=np.int64),
+	}
+
+	return table
+#=========================================
+
+def select_streams(table, streams):
+	"""
+	Keeps only the packets of the tcp streams in the range (first, last)
+	of the packet table, see get_packet_table
+
+	param: the packet table and the range of streams (or None for all)
+
+	return: the packet table of the selected streams
+	"""
+
+	if streams is None:
+		return table
+
+	keep = (table['protocol'] == pr.IPPROTO_TCP) & (table['stream'] >= streams[0])
+	if streams[1] is not None:
+		keep &= table['stream'] < streams[1]
+
+	selected = {}
+	for column in table:
+		selected[column] = table[column][keep]
+
+	return selected
+#=========================================
+
+def get_flow_starts(table):
+	"""
+	Returns the start index of every flow of a table grouped by the flow
+	(the pair of protocol and stream)
+
+	param: the grouped table
+
+	return: numpy array of the start indexes
+	"""
+
+	stream = table['stream']
+	starts = np.flatnonzero((np.diff(stream) != 0) | (np.diff(table['protocol']) != 0)) + 1
+	if len(stream):
+		starts = np.append(0, starts)
+
+	return starts
+#=========================================
+
+def group_streams(table):
+	"""
+	Groups the packet table by the flow (the protocol, then the stream
+	number), keeping the capture order of the packets within each flow
+
+	param: the packet table
+
+	return: tuple of (the stream numbers, the start index of each flow
+	in the grouped table, the grouped table)
+	"""
+
+	# lexsort is stable, the last key is the first one sorted on
+	order = np.lexsort((table['stream'], table['protocol']))
+	grouped = {}
+	for column in table:
+		grouped[column] = table[column][order]
+
+	starts = get_flow_starts(grouped)
+
+	return (grouped['stream'][starts], starts, grouped)
+#=========================================
+
+def get_endpoints(table):
+	"""
+	Encodes the src and dst endpoints (ip address and port) of the
+	packets as integers -> address code * 65536 + port, so that IPv4 and
+	IPv6 endpoints are compared in one vectorized pass
+
+	param: the packet table (see get_packet_table)
+
+	return: tuple of the (src, dst) arrays of the endpoint codes
+	"""
+
+	return (table['src'] << 16 | table['sport'], table['dst'] << 16 | table['dport'])
+#=========================================
+
+def get_stream_features(times, src, lengths):
+	"""
+	Takes the packets of one stream and computes all the features of
+	that flow, the same way as the getters in statistics.py do
+
+	>forward packets have the src endpoint (ip and port) of the first
+	packet, all the others are backward packets (see segregate.get_flow)
+
+	param: the arrays of packet times, src endpoint codes (see
+	get_endpoints) and lengths of the stream
+
+	return: tuple of (flow_info_list, duration, flow_bytes_psec,
+	flow_packets_psec, active_info, idle_info)
+	"""
+
+	flow_times = times.tolist()
+	fwd = src == src[0]
+	fwd_list = times[fwd].tolist()
+	rev_list = times[~fwd].tolist()
+
+	total_bytes = int(lengths.sum())
+	duration = flow_times[-1] - flow_times[0]
+
+	flow_info_list = st.get_iat_info_from_times(fwd_list, rev_list)
+	# like the kernels, a zero duration (e.g. a single packet) gives inf/nan rates
+	with np.errstate(divide='ignore', invalid='ignore'):
+		flow_bytes_psec = np.float64(total_bytes)/duration
+		flow_packets_psec = np.float64(len(flow_times))/duration
+	active_info = st.get_active_info_from_times(flow_times)
+	idle_info = st.get_idle_info_from_times(flow_times)
+
+	return (flow_info_list, duration, flow_bytes_psec, flow_packets_psec, active_info, idle_info)
+#=========================================
+
+def get_file_features(file, backend='tshark'):
+	"""
+	Computes the features of all the tcp streams of a pcap file with
+	a single pass over the file (the udp and icmp flows are only in
+	get_feature_table)
+
+	param: the pcap file to parse and the backend ('tshark' or 'native')
+
+	return: dict of stream number -> the tuple returned by
+	get_stream_features, sorted by the stream number
+	"""
+
+	stream_nos, starts, grouped = group_streams(get_packet_table(file, backend))
+	ends = np.append(starts[1:], len(grouped['stream']))
+	src = get_endpoints(grouped)[0]
+
+	file_features = {}
+	for stream_no, start, end in zip(stream_nos.tolist(), starts, ends):
+		file_features[stream_no] = get_stream_features(
+			grouped['time'][start:end], src[start:end], grouped['length'][start:end])
+
+	return file_features
+#=========================================
+
+def make_flow_table(table):
+	"""
+	Groups the packets of a packet table by the flow and finds their
+	direction
+
+	>forward packets have the src endpoint (ip and port) of the first
+	packet of the flow, all the others are backward packets -> every
+	packet has exactly one direction, also when the two hosts are the
+	same (loopback, hairpin NAT) and only the ports differ
+
+	param: the packet table (see get_packet_table)
+
+	return: the flow table, see get_flow_table
+	"""
+
+	stream_nos, starts, grouped = group_streams(table)
+
+	counts = np.diff(np.append(starts, len(grouped['stream'])))
+	src = get_endpoints(grouped)[0]
+	fwd = src == np.repeat(src[starts], counts)
+
+	return {
+		'stream': grouped['stream'],
+		'protocol': grouped['protocol'],
+		'fwd': fwd,
+		'rev': ~fwd,
+		'time': grouped['time'],
+		'length': grouped['length'],
+	}
+#=========================================
+
+def get_flow_table(file, backend='tshark', streams=None, cache_dir=None, cache_key='stat', cache_size=pc.CACHE_SIZE,
+		protocols=('tcp',), flow_timeout=pr.FLOW_TIMEOUT):
+	"""
+	Returns the flow table of the file -> its packets grouped by the flow
+	(in the capture order within a flow), with their direction (see
+	make_flow_table)
+
+	>with a cache directory, the flow table of the whole file is saved
+	there and loaded by the later runs (see packet_cache.py)
+
+	param: the pcap file to parse, the backend ('tshark' or 'native'),
+	optionally the range of streams (see get_packet_table), the cache
+	directory (None -> no caching), the kind of cache key, the size
+	limit of the cache in bytes, and the protocols and the timeout of
+	the udp and icmp flows (see get_packet_table)
+
+	return: dict of numpy arrays -> 'stream', 'protocol', 'fwd' and 'rev'
+	(the direction masks), 'time' and 'length', one entry per packet
+	"""
+
+	if cache_dir is not None:
+		key = pc.get_cache_key(file, backend, cache_key, protocols, flow_timeout)
+		with im.timed('cache'):
+			flow_table = pc.load_table(cache_dir, key)
+		if flow_table is not None:
+			flow_table = select_streams(flow_table, streams)
+			im.count('packets', len(flow_table['stream']))
+			return flow_table
+
+	table = get_packet_table(file, backend, streams, protocols, flow_timeout)
+	with im.timed('group'):
+		flow_table = make_flow_table(table)
+	im.count('packets', len(flow_table['stream']))
+
+	# only the tables of whole files are cached
+	if cache_dir is not None and streams is None:
+		with im.timed('cache'):
+			pc.save_table(cache_dir, key, flow_table, cache_size)
+
+	return flow_table
+#=========================================
+
+def compute_feature_table(flow_table, clump_timeout=st.CLUMP_TIMEOUT, active_timeout=st.ACTIVE_TIMEOUT, columns=None):
+	"""
+	Computes the features of all the flows of a flow table with the
+	vectorized kernels
+
+	param: the flow table (see get_flow_table), the two timeouts of the
+	active and idle times and the list of the feature columns to compute
+	(None -> all, see features.select_columns)
+
+	return: dict of 'stream', 'protocol' and the feature columns -> array
+	with one entry per flow, sorted by the protocol and the stream number
+	"""
+
+	with im.timed('features'):
+		starts = get_flow_starts(flow_table)
+
+		feature_table = {'stream': flow_table['stream'][starts], 'protocol': flow_table['protocol'][starts]}
+		feature_table.update(fs.compute_features(flow_table['time'], flow_table['fwd'],
+			flow_table['rev'], flow_table['length'], starts, clump_timeout, active_timeout, columns))
+	im.count('flows', len(starts))
+
+	return feature_table
+#=========================================
+
+def get_feature_table(file, backend='tshark', streams=None, cache_dir=None, cache_key='stat',
+		cache_size=pc.CACHE_SIZE, clump_timeout=st.CLUMP_TIMEOUT, active_timeout=st.ACTIVE_TIMEOUT, columns=None,
+		protocols=('tcp',), flow_timeout=pr.FLOW_TIMEOUT):
+	"""
+	Computes the features of all the flows of a pcap file with a single
+	pass over the file (or its cached flow table) and the vectorized
+	kernels
+
+	>a single stream is the range (stream_no, stream_no + 1) -> one
+	tshark run for all its features, instead of one per getter of the
+	statistics.py file
+
+	param: the pcap file to parse, the backend ('tshark' or 'native'),
+	the range of streams and the cache options (see get_flow_table), the
+	two timeouts of the active and idle times, the feature columns (see
+	compute_feature_table), and the protocols and the timeout of the udp
+	and icmp flows (see get_packet_table)
+
+	return: dict of 'stream', 'protocol' and the feature columns -> array
+	with one entry per flow, sorted by the protocol and the stream number
+	"""
+
+	flow_table = get_flow_table(file, backend, streams, cache_dir, cache_key, cache_size, protocols, flow_timeout)
+
+	return compute_feature_table(flow_table, clump_timeout, active_timeout, columns)
+#=========================================
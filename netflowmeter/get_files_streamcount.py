@@ -16,26 +16,48 @@ import numpy as np
 import subprocess as sp
 import os
 import glob
-import statistics as st
+from . import statistics as st
+from . import stream_index as si
 #=========================================
 #=========================================
 
+##========================================
+#=============--CONSTANTS--===============
+# the files written next to the captures -> the stream indexes and the
+# temporary files of the atomic writes (e.g. <file>.streams.npz.<pid>.tmp)
+SKIPPED_SUFFIXES = (si.INDEX_SUFFIX, '.tmp')
+##========================================
+
 def get_all_files_within_dir(directory, extension):
 	"""
 	Takes input as the directory name with trailing '/' and the
 	extension and returns the list of files in the current 
 	directory with the specified extension
 
-	param: directory and the extension
+	>several extensions can be given, as a list or separated by commas
+	(e.g. 'pcap,pcapng,pcap.gz'), and an extension with a wildcard is
+	taken as a glob pattern of the file names (e.g. '*.pcap*'). The
+	stream indexes saved next to the captures and the temporary files
+	being written (see SKIPPED_SUFFIXES) are never listed.
+
+	param: directory and the extension(s)
 
 	return = the list of all the files with the 
 	specified extension
 	"""
-	glob_command = directory + '*' + '.' + extension
-	# print(glob_command)
+	if isinstance(extension, str):
+		extension = extension.split(',')
+
+	files = set()
+	for pattern in extension:
+		pattern = pattern.strip()
+		if not pattern:
+			continue
+		if not glob.has_magic(pattern):
+			pattern = '*.' + pattern.lstrip('.')
+		files.update(glob.glob(directory + pattern))
 
-	files = glob.glob(glob_command)
-	files_list = sorted(files)
+	files_list = sorted(file for file in files if not file.endswith(SKIPPED_SUFFIXES))
 
 	return files_list
 #=========================================
@@ -44,7 +66,7 @@ def get_stream_count(files_list):
 	"""
 	Takes input a file list and returns the list containing
 	all the stream counts for all the files in the input
-	file list
+	file list (from their stream indexes, see stream_index.py)
 
 	param: list of pcap files
 
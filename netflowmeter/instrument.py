@@ -0,0 +1,320 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The instrumentation of the extraction -> the time spent in every
+stage (see STAGES) and the counters of the work done (the tshark
+processes started, the packets read, the flows and the rows written),
+so that a run tells where its time goes.
+
+>The timers wrap whole calls (a file, a shard, a batch of rows), never
+single packets, so they cost nothing noticeable and are always on. The
+processes started by the subprocess module (and by asyncio) are counted
+with an audit hook, installed when this module is imported.
+
+>The timers and the counters are kept per process. The worker
+processes send theirs back with the result of every task (see
+batch.iter_results) and the main process adds them up, so the stage
+times of a run are summed over all its workers.
+
+>main_driver.py writes them as a JSON report with a short summary on
+stderr (--profile), dumps the cProfile stats of the main process
+(--cprofile) and prints the throughput of a long run every
+--log-interval seconds (see ThroughputLogger).
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import platform
+import resource
+import threading
+from contextlib import contextmanager
+#=========================================
+#=========================================
+
+##========================================
+#=============--CONSTANTS--===============
+# the stages of the extraction, in the order of the summary
+STAGES = (
+	'tshark',	# the tshark processes, until their whole output is read
+	'decode',	# the native reader (pcap_reader.py, sharding.py)
+	'parse',	# the parsing of the text output of tshark
+	'cache',	# the loading and saving of the packet cache
+	'group',	# the grouping of the packets by flow and their direction
+	'features',	# the vectorized feature kernels
+	'stream',	# the streaming mode, decoding and features packet by packet
+	'output',	# the writing of the rows to the sink
+)
+REPORT_VERSION = 1
+# seconds between two throughput lines of a long run
+LOG_INTERVAL = 60.0
+# the functions of the cProfile summary
+PROFILE_TOP = 25
+##========================================
+
+_stats = {'stages': {}, 'counters': {}}
+# the threads of a process add to the same stats (e.g. async_runner.py)
+_lock = threading.Lock()
+
+def _count_spawns(event, args):
+	"""
+	Audit hook which counts the processes started by the subprocess module
+	"""
+
+	if event == 'subprocess.Popen':
+		count('spawns')
+#=========================================
+
+sys.addaudithook(_count_spawns)
+
+def add_time(stage, seconds, calls=1):
+	"""
+	Adds the time of a stage
+
+	param: the stage (see STAGES), the seconds and the number of calls
+	"""
+
+	with _lock:
+		entry = _stats['stages'].setdefault(stage, [0.0, 0])
+		entry[0] += seconds
+		entry[1] += calls
+#=========================================
+
+@contextmanager
+def timed(stage):
+	"""
+	Times the block of a with statement as a stage
+
+	param: the stage (see STAGES)
+	"""
+
+	started = time.perf_counter()
+	try:
+		yield
+	finally:
+		add_time(stage, time.perf_counter() - started)
+#=========================================
+
+def count(counter, value=1):
+	"""
+	Adds to a counter (e.g. 'packets', 'flows', 'rows')
+	"""
+
+	with _lock:
+		_stats['counters'][counter] = _stats['counters'].get(counter, 0) + value
+#=========================================
+
+def get_stats():
+	"""
+	Returns a copy of the timers and the counters of this process
+
+	return: dict of 'stages' (stage -> [seconds, calls]) and 'counters'
+	(counter -> value)
+	"""
+
+	return {
+		'stages': {stage: list(entry) for stage, entry in _stats['stages'].items()},
+		'counters': dict(_stats['counters']),
+	}
+#=========================================
+
+def take_stats():
+	"""
+	Returns the timers and the counters of this process and resets them,
+	e.g. to send them back with the result of a task
+
+	return: see get_stats
+	"""
+
+	stats = get_stats()
+	reset()
+
+	return stats
+#=========================================
+
+def merge_stats(stats):
+	"""
+	Adds the timers and the counters of another process (see take_stats)
+	"""
+
+	for stage, (seconds, calls) in stats['stages'].items():
+		add_time(stage, seconds, calls)
+	for counter, value in stats['counters'].items():
+		count(counter, value)
+#=========================================
+
+def reset():
+	"""
+	Resets the timers and the counters of this process
+	"""
+
+	_stats['stages'].clear()
+	_stats['counters'].clear()
+#=========================================
+
+def get_peak_rss():
+	"""
+	Returns the peak resident set size of this process in KB
+
+	>VmHWM of /proc where available, as ru_maxrss is carried over from
+	the parent process by exec on Linux (and is in bytes on macOS)
+	"""
+
+	try:
+		with open('/proc/self/status') as f:
+			for line in f:
+				if line.startswith('VmHWM:'):
+					return int(line.split()[1])
+	except OSError:
+		pass
+
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	if sys.platform == 'darwin':
+		peak //= 1024
+
+	return peak
+#=========================================
+
+def make_report(seconds, settings=None):
+	"""
+	Makes the report of a run from the timers and the counters
+
+	param: the wall clock seconds of the run and the dict of its settings
+
+	return: dict of the report, see write_report
+	"""
+
+	stats = get_stats()
+	counters = stats['counters']
+	stages = sorted(stats['stages'].items(), key=lambda item: STAGES.index(item[0]) if item[0] in STAGES else len(STAGES))
+
+	return {
+		'version': REPORT_VERSION,
+		'time': time.time(),
+		'argv': sys.argv,
+		'python': platform.python_version(),
+		'platform': platform.platform(),
+		'cpus': os.cpu_count(),
+		'settings': settings or {},
+		'seconds': seconds,
+		'stages': {stage: {'seconds': entry[0], 'calls': entry[1]} for stage, entry in stages},
+		'counters': counters,
+		'packets_per_sec': counters.get('packets', 0) / seconds if seconds else None,
+		'flows_per_sec': counters.get('flows', 0) / seconds if seconds else None,
+		'peak_rss_kb': get_peak_rss(),
+		'peak_child_rss_kb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+	}
+#=========================================
+
+def format_summary(report):
+	"""
+	Returns the human summary of a report
+
+	param: the report (see make_report)
+
+	return: (str) the lines of the summary
+	"""
+
+	counters = report['counters']
+	lines = ['{:.3f} s, {} packets ({:.0f}/s), {} flows ({:.0f}/s), {} rows, {} processes started, {} KB peak RSS'.format(
+		report['seconds'], counters.get('packets', 0), report['packets_per_sec'] or 0, counters.get('flows', 0),
+		report['flows_per_sec'] or 0, counters.get('rows', 0), counters.get('spawns', 0), report['peak_rss_kb'])]
+
+	# the stages overlap with each other across the workers, so the
+	# shares are of their sum and not of the wall clock time
+	total = sum(entry['seconds'] for entry in report['stages'].values())
+	for stage, entry in report['stages'].items():
+		lines.append('  {:<10} {:10.3f} s {:6.1f} % {:>8} calls'.format(
+			stage, entry['seconds'], 100.0 * entry['seconds'] / total if total else 0.0, entry['calls']))
+
+	return '\n'.join(lines)
+#=========================================
+
+def write_report(path, report):
+	"""
+	Writes a report as a JSON file (written to a temporary file and
+	renamed, so it is never half written)
+
+	param: the JSON file and the report (see make_report)
+	"""
+
+	temp_file = path + '.{}.tmp'.format(os.getpid())
+	with open(temp_file, 'w') as f:
+		json.dump(report, f, indent=1)
+	os.replace(temp_file, path)
+#=========================================
+
+def start_profiler():
+	"""
+	Starts the cProfile profiler of this process
+
+	return: the cProfile.Profile
+	"""
+
+	profiler = cProfile.Profile()
+	profiler.enable()
+
+	return profiler
+#=========================================
+
+def dump_profile(profiler, path, top=PROFILE_TOP):
+	"""
+	Stops a profiler, dumps its stats (read back with pstats.Stats(path))
+	and prints the functions of the largest cumulative time on stderr
+
+	param: the cProfile.Profile, the output file and the number of
+	functions printed
+	"""
+
+	profiler.disable()
+	profiler.dump_stats(path)
+
+	pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(top)
+#=========================================
+
+class ThroughputLogger(object):
+	"""
+	Prints the throughput of a long run on stderr, at most once every
+	interval -> the elapsed time, the tasks, packets and flows done and
+	their rates since the start and since the last line
+	"""
+
+	def __init__(self, interval=LOG_INTERVAL, file=sys.stderr):
+		"""
+		param: the seconds between two lines and the file to print to
+		"""
+
+		self.interval = interval
+		self.file = file
+		self.started = time.monotonic()
+		self.last = (self.started, 0, 0)
+
+	def tick(self):
+		"""
+		Prints a line if the interval is over (called after every task)
+		"""
+
+		now = time.monotonic()
+		if now - self.last[0] < self.interval:
+			return
+
+		counters = _stats['counters']
+		packets = counters.get('packets', 0)
+		flows = counters.get('flows', 0)
+		elapsed = now - self.started
+		window = now - self.last[0]
+
+		print('{:8.0f} s {:>6} tasks {:>12} pkts {:>9.0f} pkts/s ({:.0f} now) {:>9} flows {:>7.0f} flows/s ({:.0f} now)'.format(
+			elapsed, counters.get('tasks', 0), packets, packets / elapsed, (packets - self.last[1]) / window,
+			flows, flows / elapsed, (flows - self.last[2]) / window), file=self.file)
+		self.last = (now, packets, flows)
+#=========================================
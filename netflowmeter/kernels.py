@@ -0,0 +1,190 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The vectorized feature kernels. They take the packet arrays of all
+the flows of a file at once (grouped by the flow, in the capture order)
+and compute the 23 features with segmented numpy operations, without
+a python loop over the flows or the packets.
+
+>The results are the same as the functions in the statistics.py file
+(get_iat_info_from_times, get_active_info_from_times and
+get_idle_info_from_times), up to the rounding of the sums.
+
+>The kernels are put together into the features by the registry of
+the features.py file.
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import numpy as np
+
+from . import statistics as st
+#=========================================
+#=========================================
+
+def segment_stats(values, segments, n_segments, empty=(0, 0, 0, 0)):
+	"""
+	Computes the min, max, mean and std of the values of every segment
+
+	param: the values, the segment number of every value (sorted, so
+	that the values of a segment are contiguous), the number of segments
+	and the (min, max, mean, std) to give for the empty segments
+
+	return: tuple of 4 arrays (min, max, mean, std), one entry per segment
+	"""
+
+	counts = np.bincount(segments, minlength=n_segments)
+	filled = counts > 0
+
+	stats = tuple(np.full(n_segments, value, dtype=np.float64) for value in empty)
+	if len(values) == 0:
+		return stats
+
+	starts = (np.cumsum(counts) - counts)[filled]
+	seg_counts = counts[filled]
+
+	mean = np.add.reduceat(values, starts) / seg_counts
+	# two pass variance, like np.std
+	dev = values - np.repeat(mean, seg_counts)
+	std = np.sqrt(np.add.reduceat(dev * dev, starts) / seg_counts)
+
+	stats[0][filled] = np.minimum.reduceat(values, starts)
+	stats[1][filled] = np.maximum.reduceat(values, starts)
+	stats[2][filled] = mean
+	stats[3][filled] = std
+
+	return stats
+#=========================================
+
+def segment_quantiles(values, segments, n_segments, quantiles, empty=0):
+	"""
+	Computes the quantiles of the values of every segment, exactly -> the
+	value of rank ceil(q * n) of a segment of n values, like
+	sketches.QuantileSketch gives
+
+	param: the values, the segment number of every value (sorted, so
+	that the values of a segment are contiguous), the number of
+	segments, the list of (suffix, quantile) (see sketches.QUANTILES)
+	and the value to give for the empty segments
+
+	return: tuple of arrays, one per quantile, one entry per segment
+	"""
+
+	counts = np.bincount(segments, minlength=n_segments)
+	filled = counts > 0
+
+	results = tuple(np.full(n_segments, empty, dtype=np.float64) for quantile in quantiles)
+	if len(values) == 0:
+		return results
+
+	# the values sorted within every segment
+	ordered = values[np.lexsort((values, segments))]
+	starts = (np.cumsum(counts) - counts)[filled]
+	seg_counts = counts[filled]
+
+	for result, (suffix, quantile) in zip(results, quantiles):
+		ranks = np.maximum(np.ceil(quantile * seg_counts).astype(np.int64), 1)
+		result[filled] = ordered[starts + ranks - 1]
+
+	return results
+#=========================================
+
+def get_direction_iat(times, mask, flows):
+	"""
+	Returns the inter arrival times of the packets selected by the mask
+	(one direction), within every flow
+
+	param: the packet times, the direction mask and the flow number of
+	every packet
+
+	return: tuple of (iat values, flow number of every value)
+	"""
+
+	dir_times = times[mask]
+	dir_flows = flows[mask]
+
+	same_flow = dir_flows[1:] == dir_flows[:-1]
+	iat = np.diff(dir_times)[same_flow]
+
+	return (iat, dir_flows[1:][same_flow])
+#=========================================
+
+def get_pair_iat(times, fwd, rev, flows, n_flows):
+	"""
+	Returns the 'flow iat' of the statistics.py file -> the difference
+	between the k-th forward and the k-th backward packet times of a flow,
+	for k up to the smaller of the two counts
+
+	param: the packet times, the fwd and rev masks, the flow number of
+	every packet and the number of flows
+
+	return: tuple of (iat values, flow number of every value)
+	"""
+
+	fwd_flows = flows[fwd]
+	rev_flows = flows[rev]
+	fwd_counts = np.bincount(fwd_flows, minlength=n_flows)
+	rev_counts = np.bincount(rev_flows, minlength=n_flows)
+	pairs = np.minimum(fwd_counts, rev_counts)
+
+	# rank of every packet within its direction of the flow
+	fwd_rank = np.arange(len(fwd_flows)) - np.repeat(np.cumsum(fwd_counts) - fwd_counts, fwd_counts)
+	rev_rank = np.arange(len(rev_flows)) - np.repeat(np.cumsum(rev_counts) - rev_counts, rev_counts)
+
+	fwd_keep = fwd_rank < pairs[fwd_flows]
+	rev_keep = rev_rank < pairs[rev_flows]
+
+	iat = times[fwd][fwd_keep] - times[rev][rev_keep]
+
+	return (iat, fwd_flows[fwd_keep])
+#=========================================
+
+def get_active_idle(times, flows, starts, clump_timeout, active_timeout):
+	"""
+	Segments every flow into the active and idle times, the same way
+	as get_active_info_from_times and get_idle_info_from_times do
+
+	>for every gap between two packets of a flow, gaps over the
+	clump_timeout (and the active_timeout) give an active and an idle
+	time of (gap - the last such gap), smaller gaps give an idle time
+	of 0, and every flow ends with an active time of 0
+
+	param: the packet times, the flow number of every packet, the start
+	index of every flow and the two timeouts
+
+	return: tuple of (active values, their flow numbers, idle values,
+	their flow numbers)
+	"""
+
+	n_flows = len(starts)
+	gaps = np.diff(times)
+	same_flow = flows[1:] == flows[:-1]
+	gap_index = np.nonzero(same_flow)[0]
+	gaps = gaps[same_flow]
+	gap_flows = flows[1:][same_flow]
+
+	# 'last_active' of the loops -> the last gap which updated it
+	updates = (gaps <= clump_timeout) | (gaps > active_timeout)
+	last_update = np.maximum.accumulate(np.where(updates, np.arange(len(gaps)), -1))
+	prev_update = np.concatenate(([-1], last_update))[:-1].astype(np.int64)
+	# the first gap of every flow in the gap arrays
+	flow_first_gap = np.searchsorted(gap_index, starts)
+	in_flow = prev_update >= flow_first_gap[gap_flows]
+	last_active = np.where(in_flow, gaps[np.maximum(prev_update, 0)], 0)
+
+	clumps = (gaps > clump_timeout) & (gaps > active_timeout)
+
+	# active -> the clump values, then a 0 at the end of every flow
+	active = np.concatenate((gaps[clumps] - last_active[clumps], np.zeros(n_flows)))
+	active_flows = np.concatenate((gap_flows[clumps], np.arange(n_flows)))
+	order = np.argsort(active_flows, kind='stable')
+
+	idle = np.where(gaps <= clump_timeout, 0, gaps - last_active)[updates]
+	idle_flows = gap_flows[updates]
+
+	return (active[order], active_flows[order], idle, idle_flows)
+#=========================================
@@ -0,0 +1,468 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The live mode, which computes the same 23 features for the traffic
+of a network interface while it happens, with the streaming flow table
+of the streaming.py file.
+
+>The packets come from tshark (-i <interface> -l, line buffered), from
+a raw socket on the interface (Linux, needs root) or from a pcap file
+replayed at its original pace (for the tests). A reader thread puts
+them into a bounded queue, and when the queue is full the packets are
+dropped and counted instead of stalling the capture.
+
+>The main loop numbers the packets of the socket and replay sources
+with the stream tracker, and feeds them to the flow table, which
+finishes the flows timed out before every packet (at the time of the
+packet, before its stream is numbered, like streaming.get_feature_table
+does). So the flows are the ones of the streaming mode, whatever the
+backlog of the queue. While the queue is empty it also finishes, at
+least every TICK seconds, the flows timed out at the current time
+(minus a TICK, for the packet the reader may still hold), so a flow is
+emitted less than a second after its timeout. The long lived flows can also be
+emitted as periodic snapshots, and the throughput, the drops and the
+emit latency are reported every few seconds.
+
+	sudo netflowmeter-live eth0 --source socket --output live.csv --snapshot-interval 10
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import sys
+import csv
+import time
+import queue
+import socket
+import struct
+import argparse
+import threading
+import subprocess as sp
+
+from . import statistics as st
+from . import pcap_reader as pr
+from . import features as fs
+from . import streaming as sm
+#=========================================
+#=========================================
+
+##========================================
+#=============--CONSTANTS--===============
+SOURCES = ('tshark', 'socket', 'replay')
+# seconds between two checks of the flow timeouts
+TICK = 0.25
+QUEUE_SIZE = 100000
+STATS_INTERVAL = 10
+
+# raw sockets (Linux) -> all the protocols, and the packet statistics
+ETH_P_ALL = 0x0003
+SOL_PACKET = 263
+PACKET_STATISTICS = 6
+# packets between two reads of the drops of the kernel
+STATS_PACKETS = 1000
+##========================================
+
+def iter_tshark_capture(interface, stop, origin, capture_filter='tcp'):
+	"""
+	Reads the tcp packets of an interface from the line buffered output
+	of tshark
+
+	param: the interface, the threading.Event which stops the capture,
+	the time origin in ns and the capture filter (BPF syntax)
+
+	return: generator of (stream, src, dst, time, length, flags, protocol)
+	tuples
+	"""
+
+	command = ['tshark', '-i', interface, '-l', '-n', '-Q', '-T', 'fields',
+		'-E', 'separator=,', '-E', 'occurrence=f']
+	if capture_filter:
+		command += ['-f', capture_filter]
+	for field in sm.TSHARK_FIELDS:
+		command += ['-e', field]
+
+	proc = sp.Popen(command, stdout=sp.PIPE, stderr=sp.DEVNULL, universal_newlines=True, bufsize=1)
+
+	# the reads block while there is no traffic, so the stop kills tshark
+	def kill():
+		stop.wait()
+		proc.kill()
+	threading.Thread(target=kill, daemon=True).start()
+
+	try:
+		for packet in sm.parse_tshark_lines(proc.stdout, origin):
+			yield packet
+	finally:
+		stop.set()
+		proc.stdout.close()
+		proc.wait()
+#=========================================
+
+def iter_socket_capture(interface, stop, origin, counters=None):
+	"""
+	Reads the tcp packets of an interface from a raw socket (Linux only,
+	needs root or CAP_NET_RAW)
+
+	param: the interface, the threading.Event which stops the capture,
+	the time origin in ns and a dict which gets the 'kernel_drops' of the
+	socket
+
+	return: generator of (conversation, src, dst, time, length, flags,
+	protocol) tuples, numbered by LiveMeter (see get_conversation)
+	"""
+
+	sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+	sock.bind((interface, 0))
+	sock.settimeout(TICK)
+
+	count = 0
+	try:
+		while not stop.is_set():
+			try:
+				data = sock.recv(pr.MAX_SNAPLEN)
+			except socket.timeout:
+				data = None
+			now = time.time_ns()
+
+			count += 1
+			if counters is not None and (data is None or count % STATS_PACKETS == 0):
+				# the counters of the kernel are reset when read
+				received, dropped = struct.unpack('II', sock.getsockopt(SOL_PACKET, PACKET_STATISTICS, 8))
+				counters['kernel_drops'] = counters.get('kernel_drops', 0) + dropped
+			if data is None:
+				continue
+
+			pkt = pr.decode_packet(data, 0, len(data), pr.LINKTYPE_ETHERNET)
+			if pkt is None:
+				continue
+
+			yield get_conversation(pkt, (now - origin) / 1e9, len(data))
+	finally:
+		sock.close()
+#=========================================
+
+def iter_replay(file, stop, started, speed=1.0):
+	"""
+	Replays the tcp packets of a capture file at their original pace
+	(the times of the packets are the ones of the file, so the features
+	are the same as the offline ones)
+
+	param: the capture file, the threading.Event which stops the replay,
+	the time.monotonic() of the start of the replay and the speed factor
+	(2 -> twice as fast)
+
+	return: generator of (conversation, src, dst, time, length, flags,
+	protocol) tuples, numbered by LiveMeter (see get_conversation)
+	"""
+
+	origin = None
+	for buf, ts, orig_len, linktype, offset, caplen in pr.iter_file_records(file):
+		if origin is None:
+			origin = ts
+
+		pkt = pr.decode_packet(buf, offset, caplen, linktype)
+		if pkt is None:
+			continue
+
+		packet = get_conversation(pkt, (ts - origin) / 1e9, orig_len)
+		delay = started + packet[3] / speed - time.monotonic()
+		if delay > 0 and stop.wait(delay):
+			return
+		if stop.is_set():
+			return
+		yield packet
+#=========================================
+
+def get_conversation(pkt, seconds, length):
+	"""
+	Makes the packet tuple of a decoded packet, with the arguments of
+	pcap_reader.StreamTracker.get_stream in place of its stream number
+	(the packets are numbered in the main loop, see LiveMeter)
+
+	param: the tuple of pcap_reader.decode_packet, the time and the length
+	of the packet
+
+	return: tuple of (conversation, src, dst, time, length, flags,
+	protocol)
+	"""
+
+	ip_src, ip_dst, src, dst, sport, dport, seq, flags, protocol = pkt
+
+	return ((src, sport, dst, dport, seq, flags), (ip_src, sport), (ip_dst, dport), seconds, length, flags, protocol)
+#=========================================
+
+class LiveMeter(object):
+	"""
+	Runs the streaming flow table on a live source of packets
+	"""
+
+	def __init__(self, packets, clock, on_flow, on_snapshot=None, flow_timeout=sm.FLOW_TIMEOUT,
+			close_linger=sm.CLOSE_LINGER, clump_timeout=st.CLUMP_TIMEOUT, active_timeout=st.ACTIVE_TIMEOUT,
+			tracker=None, queue_size=QUEUE_SIZE, block=False, snapshot_interval=None,
+			stats_interval=STATS_INTERVAL, on_stats=None, stop=None, counters=None):
+		"""
+		param: the packet generator, the function giving the current time
+		(in the time of the packets), the function called with (stream,
+		features) of every finished flow and the one called with (stream,
+		time, features) of the snapshots, the timeouts (see
+		streaming.StreamingFlowTable), the stream tracker which numbers the
+		packets of the source (see get_conversation, None -> the source
+		numbers them, e.g. tshark), the size of the packet queue,
+		whether the reader waits for room in the queue instead of dropping
+		(e.g. for a replay), the seconds between the snapshots of the open
+		flows (None -> no snapshots), and the seconds between the reports
+		of the metrics with the function called with them, the
+		threading.Event which stops the run (and the source) and the dict
+		of the counters, shared with the source (e.g. 'kernel_drops')
+		"""
+
+		self.packets = packets
+		self.clock = clock
+		self.on_flow = on_flow
+		self.on_snapshot = on_snapshot
+		self.tracker = tracker
+		self.flow_table = sm.StreamingFlowTable(flow_timeout, close_linger, clump_timeout, active_timeout,
+			tracker.forget_stream if tracker is not None else None)
+		self.queue = queue.Queue(queue_size)
+		self.block = block
+		self.snapshot_interval = snapshot_interval
+		self.stats_interval = stats_interval
+		self.on_stats = on_stats
+		self.stop = stop if stop is not None else threading.Event()
+
+		self.counters = counters if counters is not None else {}
+		for counter in ('received', 'processed', 'dropped', 'flows', 'snapshots'):
+			self.counters.setdefault(counter, 0)
+		self.counters.setdefault('max_latency', 0.0)
+
+	def _read(self):
+		"""
+		The reader thread -> moves the packets from the source to the queue
+		"""
+
+		try:
+			for packet in self.packets:
+				self.counters['received'] += 1
+				if self.block:
+					self.queue.put(packet)
+				else:
+					try:
+						self.queue.put_nowait(packet)
+					except queue.Full:
+						self.counters['dropped'] += 1
+				if self.stop.is_set():
+					break
+		finally:
+			# None marks the end of the source
+			self.queue.put(None)
+
+	def _add_packet(self, packet):
+		"""
+		Numbers a packet of the queue (after the flows timed out before it
+		are finished, so a flow which goes on after its timeout gets a new
+		stream) and adds it to the flow table
+		"""
+
+		self.flow_table.advance(packet[3])
+		if self.tracker is not None:
+			packet = (self.tracker.get_stream(*packet[0]),) + packet[1:]
+
+		self._emit(self.flow_table.add_packet(*packet), packet[3])
+		self.counters['processed'] += 1
+
+	def _emit(self, finished, now):
+		"""
+		Emits the finished flows, and measures how long after its timeout
+		every timed out flow is emitted
+		"""
+
+		for stream, flow in finished:
+			if not flow.closed and self.flow_table.flow_timeout is not None:
+				latency = now - flow.last_time - self.flow_table.flow_timeout
+				self.counters['max_latency'] = max(self.counters['max_latency'], latency)
+			self.counters['flows'] += 1
+			self.on_flow(stream, flow.get_features())
+
+	def _snapshot(self, now):
+		"""
+		Emits the features so far of the flows open for longer than the
+		snapshot interval
+		"""
+
+		for flows in (self.flow_table.open_flows, self.flow_table.closed_flows):
+			for (protocol, stream), flow in flows.items():
+				if now - flow.first_time >= self.snapshot_interval:
+					self.counters['snapshots'] += 1
+					self.on_snapshot(stream, now, flow.get_features())
+
+	def get_stats(self, elapsed):
+		"""
+		Returns the metrics of the run
+
+		param: the seconds since the start
+
+		return: dict of the counters, the rates and the sizes of the queue
+		and of the flow table
+		"""
+
+		stats = dict(self.counters)
+		stats['seconds'] = elapsed
+		stats['packets_per_sec'] = stats['processed'] / elapsed if elapsed else 0.0
+		stats['queued'] = self.queue.qsize()
+		stats['open_flows'] = len(self.flow_table)
+
+		return stats
+
+	def run(self, duration=None):
+		"""
+		Runs until the source ends, the duration is over or stop() is
+		called, then finishes all the open flows
+
+		param: the duration in seconds (None -> no limit)
+
+		return: the final metrics (see get_stats)
+		"""
+
+		started = time.monotonic()
+		next_stats = started + self.stats_interval if self.stats_interval else None
+		next_snapshot = self.clock() + self.snapshot_interval if self.snapshot_interval else None
+		next_tick = time.monotonic() + TICK
+
+		reader = threading.Thread(target=self._read, daemon=True)
+		reader.start()
+
+		try:
+			while not self.stop.is_set():
+				try:
+					packet = self.queue.get(timeout=TICK)
+				except queue.Empty:
+					packet = False
+				if packet is None:
+					break
+
+				if packet:
+					self._add_packet(packet)
+
+				wall = time.monotonic()
+				# with a backlog, the packets of the queue finish the flows
+				if wall >= next_tick and self.queue.empty():
+					next_tick = wall + TICK
+					now = self.clock()
+					self._emit(self.flow_table.expire(now - TICK), now)
+
+					if next_snapshot is not None and now >= next_snapshot:
+						next_snapshot = now + self.snapshot_interval
+						self._snapshot(now)
+
+				if next_stats is not None and wall >= next_stats:
+					next_stats = wall + self.stats_interval
+					if self.on_stats is not None:
+						self.on_stats(self.get_stats(wall - started))
+
+				if duration is not None and wall - started >= duration:
+					break
+		except KeyboardInterrupt:
+			pass
+		finally:
+			self.stop.set()
+
+		self._emit(self.flow_table.flush(), self.clock())
+
+		return self.get_stats(time.monotonic() - started)
+#=========================================
+
+def print_stats(stats):
+	"""
+	Prints the metrics of a LiveMeter on stderr
+	"""
+
+	print('{seconds:8.1f} s {processed:>10} pkts {packets_per_sec:>9.0f} pkts/s {dropped:>8} dropped '
+		'{kernel_drops:>8} kernel drops {queued:>6} queued {open_flows:>7} open {flows:>8} flows '
+		'{max_latency:6.3f} s latency'.format(kernel_drops=stats.get('kernel_drops', '-'), **stats),
+		file=sys.stderr)
+#=========================================
+
+def get_row(first, features):
+	"""
+	Returns the csv row of a flow -> the first columns and the features,
+	the nan values left empty like pandas.DataFrame.to_csv does
+
+	param: the list of the first columns and the features dict
+
+	return: list of the values of the row
+	"""
+
+	values = [features[column] for column in fs.FEATURE_COLUMNS]
+
+	return first + ['' if value != value else value for value in values]
+#=========================================
+
+def main():
+	parser = argparse.ArgumentParser(description='Extract the flow features of the live traffic of an interface.')
+	parser.add_argument('interface', help='the interface to capture (or the pcap file with --source replay)')
+	parser.add_argument('--source', default='tshark', choices=SOURCES, help='where the packets come from')
+	parser.add_argument('--capture-filter', default='tcp', help='tshark source -> the capture filter (BPF syntax)')
+	parser.add_argument('--speed', type=float, default=1.0, help='replay source -> the speed factor of the replay')
+	parser.add_argument('--label', default='VPN', help='the class of the flows in the csv file')
+	parser.add_argument('--output', default='live.csv', help='the csv file to append the finished flows to')
+	parser.add_argument('--snapshot-output', default=None, help='the csv file of the snapshots of the open flows')
+	parser.add_argument('--snapshot-interval', type=float, default=None, help='seconds between the snapshots of the open flows')
+	parser.add_argument('--duration', type=float, default=None, help='stop after this many seconds')
+	parser.add_argument('--queue-size', type=int, default=QUEUE_SIZE, help='the packets waiting to be processed before the drops')
+	parser.add_argument('--stats-interval', type=float, default=STATS_INTERVAL, help='seconds between the reports of the metrics')
+	parser.add_argument('--clump-timeout', type=float, default=st.CLUMP_TIMEOUT, help='the CLUMP_TIMEOUT of the active/idle times')
+	parser.add_argument('--active-timeout', type=float, default=st.ACTIVE_TIMEOUT, help='the ACTIVE_TIMEOUT of the active/idle times')
+	parser.add_argument('--flow-timeout', type=float, default=sm.FLOW_TIMEOUT, help='finish the flows inactive for this many seconds')
+	parser.add_argument('--close-linger', type=float, default=sm.CLOSE_LINGER,
+		help='seconds a closed (FIN/RST) flow waits for its last packets')
+	args = parser.parse_args()
+
+	stop = threading.Event()
+	counters = {}
+	origin = time.time_ns()
+	tracker = pr.StreamTracker()
+
+	if args.source == 'replay':
+		started = time.monotonic()
+		packets = iter_replay(args.interface, stop, started, args.speed)
+		clock = lambda: (time.monotonic() - started) * args.speed
+	else:
+		if args.source == 'tshark':
+			packets = iter_tshark_capture(args.interface, stop, origin, args.capture_filter)
+			# tshark numbers the streams itself
+			tracker = None
+		else:
+			packets = iter_socket_capture(args.interface, stop, origin, counters)
+		clock = lambda: (time.time_ns() - origin) / 1e9
+
+	output = open(args.output, 'a', newline='')
+	writer = csv.writer(output)
+	snapshot_output = open(args.snapshot_output, 'a', newline='') if args.snapshot_output else None
+
+	# the same columns as main_driver.data_to_csv, flushed row by row
+	def on_flow(stream, features):
+		writer.writerow(get_row([args.label], features))
+		output.flush()
+
+	def on_snapshot(stream, now, features):
+		if snapshot_output is not None:
+			csv.writer(snapshot_output).writerow(get_row([stream, now], features))
+			snapshot_output.flush()
+
+	meter = LiveMeter(packets, clock, on_flow, on_snapshot, args.flow_timeout, args.close_linger,
+		args.clump_timeout, args.active_timeout, tracker, args.queue_size, args.source == 'replay',
+		args.snapshot_interval, args.stats_interval, print_stats, stop, counters)
+
+	try:
+		print_stats(meter.run(args.duration))
+	finally:
+		output.close()
+		if snapshot_output is not None:
+			snapshot_output.close()
+#=========================================
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,235 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>A small driver program to initiate the data extraction
+process from the pcap (packet capture) files.
+
+>All the pcap files of the given directories are processed on a pool
+of worker processes (see batch.py) and the features of their streams
+are written to the output in batches (csv, parquet, arrow or a raw
+memmap matrix, see sinks.py), with a checkpoint in the run
+manifest after each batch (see manifest.py). A run which was stopped is
+resumed with --resume, without writing any row twice.
+
+	netflowmeter /path/to/VPN/ --label /path/to/VPN/=VPN --workers 32
+	netflowmeter /path/to/VPN/ --label /path/to/VPN/=VPN --workers 32 --resume
+	netflowmeter /path/to/VPN/ --format parquet --output /path/to/features/
+	netflowmeter /path/to/VPN/ --protocols tcp udp icmp
+	netflowmeter /path/to/capture.pcap --backend native --workers 1 --output capture.csv
+	netflowmeter /path/to/VPN/ --profile run.json --cprofile run.pstats
+
+>--profile writes the time of every stage and the counters of the run
+(see instrument.py) as a JSON report, with a summary on stderr. The
+stage times are summed over the worker processes. --cprofile only
+profiles the main process, so use it with --workers 1 to profile the
+extraction itself.
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from . import __version__
+from . import statistics as st
+from . import flow_engine as fe
+from . import features as fs
+from . import packet_cache as pc
+from . import pcap_reader as pr
+from . import streaming as sm
+from . import sketches as qs
+from . import batch
+from . import manifest as mf
+from . import sinks as sk
+from . import get_files_streamcount as gfs
+from . import instrument as im
+#======================================
+#======================================
+
+## Function to write the data into a csv format
+def data_to_csv(feature_table, output, columns=fs.FEATURE_COLUMNS):
+
+# The class of every stream comes from the label mapping of the
+# batch (the files used are of VPN datasets, so by default 'VPN')
+# the columns are -> class, duration, fwd/rev/flow iat, active times,
+# idle times (each with min, max, mean, std), flowBytesPsec, flowPacketsPsec
+# (or only the --features selected), appended in batches by the csv sink
+	sk.CsvSink(output, columns).write(feature_table)
+#=========================================
+
+def get_labels(label_args):
+	"""
+	Parses the --label options of the form PATH=CLASS, where PATH is a
+	pcap file, a directory or a file name
+
+	param: list of the PATH=CLASS strings
+
+	return: dict of path -> class, for batch.get_label
+	"""
+
+	labels = {}
+	for item in label_args:
+		path, sep, label = item.rpartition('=')
+		if sep == '':
+			raise ValueError('expected PATH=CLASS, got {}'.format(item))
+		if os.path.exists(path):
+			path = os.path.abspath(path)
+		labels[path] = label
+
+	return labels
+#=========================================
+
+def main():
+	parser = argparse.ArgumentParser(description='Extract the flow features of the pcap files in the given directories.')
+	parser.add_argument('path', nargs='+', help='the pcap files, or the directories with the pcap files')
+	parser.add_argument('--version', action='version', version='%(prog)s {}'.format(__version__))
+	parser.add_argument('--extension', default='pcap', help='the extension(s) of the capture files, separated by commas, or glob patterns '
+		'of their names, e.g. pcap,pcapng,pcap.gz or \'*.pcap*\' (default pcap)')
+	parser.add_argument('--backend', default='tshark', choices=fe.BACKENDS, help='read the files with tshark or the native pcap reader')
+	parser.add_argument('--workers', type=int, default=None, help='the number of worker processes (default all the cpus)')
+	parser.add_argument('--split-size', type=int, default=batch.SPLIT_SIZE // (1024 * 1024),
+		help='split the files larger than this (in MB) into ranges of streams (tshark) or byte ranges (native)')
+	parser.add_argument('--label', action='append', default=[], metavar='PATH=CLASS',
+		help='the class of the streams of a file or directory, can be repeated')
+	parser.add_argument('--default-label', default=batch.DEFAULT_LABEL, help='the class of the files without a --label')
+	parser.add_argument('--output', default='test.csv',
+		help='the csv file to write the features to (a directory for parquet and arrow)')
+	parser.add_argument('--format', default='csv', choices=sk.FORMATS, help='the format of the output (see sinks.py)')
+	parser.add_argument('--dtype', default=None, choices=sk.DTYPES,
+		help='the dtype of the features (default float32 for memmap, float64 for the others)')
+	parser.add_argument('--clump-timeout', type=float, default=st.CLUMP_TIMEOUT, help='the CLUMP_TIMEOUT of the active/idle times')
+	parser.add_argument('--active-timeout', type=float, default=st.ACTIVE_TIMEOUT, help='the ACTIVE_TIMEOUT of the active/idle times')
+	parser.add_argument('--cache-dir', default=None, help='cache the parsed packets in this directory (e.g. {})'.format(pc.CACHE_DIR))
+	parser.add_argument('--cache-key', default='stat', choices=pc.CACHE_KEYS,
+		help='key the cache by the size and mtime of the files (stat) or their content (hash)')
+	parser.add_argument('--cache-size', type=int, default=pc.CACHE_SIZE // (1024 * 1024), help='the size limit of the cache in MB')
+	parser.add_argument('--streaming', action='store_true',
+		help='read the packets one by one with a bounded flow table, for the captures larger than the memory')
+	parser.add_argument('--protocols', nargs='+', default=['tcp'], choices=list(pr.PROTOCOLS),
+		help='the protocols of the flows -> the tcp streams, and the udp and icmp flows cut by --flow-timeout')
+	parser.add_argument('--flow-timeout', type=float, default=sm.FLOW_TIMEOUT,
+		help='finish the flows inactive for this many seconds (0 -> never) -> all the flows in the streaming mode, '
+		'the udp and icmp flows otherwise')
+	parser.add_argument('--close-linger', type=float, default=sm.CLOSE_LINGER,
+		help='streaming mode -> seconds a closed (FIN/RST) flow waits for its last packets')
+	parser.add_argument('--features', nargs='+', default=None, metavar='FEATURE',
+		help='compute only these features -> columns (e.g. fwd_mean), groups (e.g. idle) or all (default), '
+		'and the optional quantile groups (e.g. fwd_quantiles -> fwd_p50, fwd_p90, fwd_p99, or quantiles for all)')
+	parser.add_argument('--quantile-error', type=float, default=qs.ERROR,
+		help='streaming mode -> the rank error of the quantile sketches (the batch mode gives the exact quantiles)')
+	parser.add_argument('--async', dest='use_async', action='store_true',
+		help='streaming mode with tshark -> parse the output of --workers tshark processes in one asyncio loop')
+	parser.add_argument('--resume', action='store_true',
+		help='resume the run of the manifest of --output, skipping the streams already written')
+	parser.add_argument('--retry-quarantined', action='store_true', help='with --resume, run the tasks which failed again')
+	parser.add_argument('--overwrite', action='store_true',
+		help='replace the output and the manifest of an earlier run (without it, an existing output needs --resume)')
+	parser.add_argument('--flush-rows', type=int, default=mf.FLUSH_ROWS,
+		help='write the rows and checkpoint the manifest every this many rows (or {:g} seconds)'.format(mf.FLUSH_INTERVAL))
+	parser.add_argument('--profile', default=None, metavar='PATH',
+		help='write the time of every stage and the counters of the run to this JSON file (see instrument.py)')
+	parser.add_argument('--cprofile', default=None, metavar='PATH',
+		help='dump the cProfile stats of the main process to this file (use --workers 1 to profile the extraction)')
+	parser.add_argument('--log-interval', type=float, default=im.LOG_INTERVAL,
+		help='print the throughput every this many seconds (0 -> never)')
+	args = parser.parse_args()
+
+	if args.resume and args.overwrite:
+		parser.error('--resume and --overwrite cannot be used together')
+	# a new run never appends to the rows of an earlier one
+	manifest_file = mf.get_manifest_file(args.output)
+	existing = sk.get_output_files(args.output, args.format)
+	if os.path.exists(manifest_file):
+		existing.append(manifest_file)
+	if args.overwrite:
+		sk.remove_output(args.output, args.format)
+		if os.path.exists(manifest_file):
+			os.remove(manifest_file)
+	elif existing and not (args.resume and os.path.exists(manifest_file)):
+		parser.error('{} exists, use --resume to go on with its run (if it has a manifest) or --overwrite to replace it'.format(
+			existing[0]))
+
+	started = time.monotonic()
+	profiler = im.start_profiler() if args.cprofile else None
+	logger = im.ThroughputLogger(args.log_interval) if args.log_interval > 0 else None
+
+	#The function get_all_files_within_directory returns a list of all files in the specified directory in str format.
+	files_list = []
+	for path in args.path:
+		if os.path.isfile(path):
+			files_list.append(path)
+		else:
+			files_list += gfs.get_all_files_within_dir(os.path.join(path, ''), args.extension)
+
+	# the actual collection of data
+	# (a single pass over each file, see flow_engine.py, on a pool of
+	# worker processes, see batch.py)
+	columns = fs.select_columns(args.features)
+	options = {
+		'clump_timeout': args.clump_timeout,
+		'active_timeout': args.active_timeout,
+		'columns': columns,
+		'protocols': tuple(name for name in pr.PROTOCOLS if name in args.protocols),
+		'flow_timeout': args.flow_timeout or None,
+	}
+	if args.streaming:
+		options['close_linger'] = args.close_linger
+		# only a setting of the runs with quantile columns
+		if sm.get_sketch_size(columns, args.quantile_error) is not None:
+			options['quantile_error'] = args.quantile_error
+	else:
+		options['cache_dir'] = args.cache_dir
+		options['cache_key'] = args.cache_key
+		options['cache_size'] = args.cache_size * 1024 * 1024
+	labels = get_labels(args.label)
+
+	# the run manifest, with the settings which change the rows (a run is
+	# only resumed with the same ones)
+	settings = {key: value for key, value in options.items() if not key.startswith('cache_')}
+	settings.update(backend=args.backend, streaming=args.streaming, labels=labels, default_label=args.default_label,
+		format=args.format, dtype=args.dtype)
+	sink = sk.get_sink(args.output, args.format, columns, args.dtype)
+	run_manifest = mf.RunManifest(args.output, settings, sink.get_position())
+	if args.resume:
+		# a manifest of another version or of other settings, or an
+		# output shorter than its last checkpoint
+		try:
+			if run_manifest.load(args.retry_quarantined):
+				sink.restore(run_manifest.data['position'])
+		except ValueError as error:
+			parser.error(str(error))
+	run_manifest.save()
+
+	"""
+	Writing the data collected to the output sink
+	(the csv format by default), batch by batch
+	"""
+	checkpoint = mf.Checkpoint(run_manifest, sink, args.flush_rows)
+	for file, streams, feature_table, error in batch.iter_batch(files_list, args.backend, args.workers,
+			args.split_size * 1024 * 1024, labels, args.default_label, options, args.streaming, args.use_async, run_manifest):
+		if error is not None:
+			checkpoint.fail(file, streams, error)
+		else:
+			checkpoint.add(file, streams, feature_table)
+		if logger is not None:
+			logger.tick()
+	checkpoint.flush()
+	sink.close()
+
+	if profiler is not None:
+		im.dump_profile(profiler, args.cprofile)
+	if args.profile is not None:
+		report = im.make_report(time.monotonic() - started, settings)
+		im.write_report(args.profile, report)
+		print(im.format_summary(report), file=sys.stderr)
+#=========================================
+
+if __name__ == '__main__':
+	main()
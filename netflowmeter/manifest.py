@@ -0,0 +1,301 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The run manifest, which makes the long extraction runs resumable.
+
+>The manifest is a json file next to the output (<output>.manifest.json).
+It keeps the settings of the run, the position of the output sink at
+the last checkpoint (see sinks.py), the ranges of tcp streams of every file whose rows are in
+the output, and the quarantined tasks -> the files (or ranges of
+streams) which failed, with their error.
+
+>The rows are written in batches by a Checkpoint -> the rows of the
+finished tasks are written to the sink and synced to the disk, and only
+then the manifest is replaced (written to a temporary file and renamed,
+so it is never half written). A run which is killed between two
+checkpoints is resumed (--resume) by cutting the output back to the
+position of the last checkpoint and skipping the streams already done,
+so no row is ever written twice.
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import os
+import sys
+import json
+import time
+
+import numpy as np
+
+from . import instrument as im
+#=========================================
+#=========================================
+
+##========================================
+#=============--CONSTANTS--===============
+MANIFEST_SUFFIX = '.manifest.json'
+MANIFEST_VERSION = 1
+# a checkpoint is made after this many rows or seconds
+FLUSH_ROWS = 10000
+FLUSH_INTERVAL = 60.0
+##========================================
+
+def get_manifest_file(output):
+	"""
+	Returns the manifest file of an output file
+
+	param: the output (csv) file
+
+	return: (str) the path of the manifest
+	"""
+
+	return output + MANIFEST_SUFFIX
+#=========================================
+
+def get_file_stamp(file):
+	"""
+	Returns what tells whether a file changed since a checkpoint
+
+	param: the capture file
+
+	return: list of [size, mtime in ns]
+	"""
+
+	stat = os.stat(file)
+
+	return [stat.st_size, stat.st_mtime_ns]
+#=========================================
+
+def subtract_ranges(first, last, done):
+	"""
+	Removes the ranges of streams already done from a range of streams
+
+	param: the range (first, last), last being None for all the remaining
+	streams, and the list of the [first, last] ranges done
+
+	return: list of the (first, last) ranges left, in order
+	"""
+
+	left = []
+	for done_first, done_last in sorted(done, key=lambda pair: pair[0]):
+		if last is not None and done_first >= last:
+			break
+		if done_last is not None and done_last <= first:
+			continue
+		if done_first > first:
+			left.append((first, done_first))
+		if done_last is None:
+			return left
+		first = max(first, done_last)
+
+	if last is None or first < last:
+		left.append((first, last))
+
+	return left
+#=========================================
+
+def merge_ranges(ranges):
+	"""
+	Merges the overlapping and adjacent ranges of streams
+
+	param: list of the [first, last] ranges, last being None for all the
+	remaining streams
+
+	return: the sorted list of the merged ranges
+	"""
+
+	merged = []
+	for first, last in sorted(ranges, key=lambda pair: pair[0]):
+		if merged and (merged[-1][1] is None or first <= merged[-1][1]):
+			if merged[-1][1] is not None and (last is None or last > merged[-1][1]):
+				merged[-1][1] = last
+			continue
+		merged.append([first, last])
+
+	return merged
+#=========================================
+
+class RunManifest(object):
+	"""
+	The manifest of an extraction run, see the module docstring
+	"""
+
+	def __init__(self, output, settings=None, position=0):
+		"""
+		param: the output of the run, the settings which change its rows
+		and the position of its sink (see sinks.py) at the start
+		"""
+
+		self.output = output
+		self.file = get_manifest_file(output)
+		self.data = {
+			'version': MANIFEST_VERSION,
+			# as read back from the json file (tuples -> lists)
+			'settings': json.loads(json.dumps(settings or {})),
+			'position': position,
+			'rows': 0,
+			'files': {},
+			'quarantine': [],
+		}
+
+	def load(self, retry_quarantined=False):
+		"""
+		Loads the manifest of an earlier run to resume it (its sink is
+		then cut back to data['position'], see sinks.py)
+
+		param: whether to run the quarantined tasks again
+
+		return: (bool) False if there is no manifest (a new run)
+		"""
+
+		if not os.path.exists(self.file):
+			return False
+
+		with open(self.file) as f:
+			data = json.load(f)
+
+		if data.get('version') != MANIFEST_VERSION:
+			raise ValueError('{} is of version {}, expected {}'.format(self.file, data.get('version'), MANIFEST_VERSION))
+		if data['settings'] != self.data['settings']:
+			raise ValueError('the settings of the run changed since {} was written, use another --output'.format(self.file))
+
+		if retry_quarantined:
+			data['quarantine'] = []
+		self.data = data
+
+		return True
+
+	def save(self):
+		"""
+		Replaces the manifest file at once (temporary file and rename)
+		"""
+
+		temp_file = self.file + '.{}.tmp'.format(os.getpid())
+		with open(temp_file, 'w') as f:
+			json.dump(self.data, f, indent=1)
+			f.flush()
+			os.fsync(f.fileno())
+		os.replace(temp_file, self.file)
+
+	def get_pending(self, file, streams=None):
+		"""
+		Returns the parts of a task which are neither done nor quarantined
+
+		param: the file and its range of streams (None -> all)
+
+		return: list of the ranges of streams left (None -> the whole file)
+		"""
+
+		path = os.path.abspath(file)
+		first, last = streams or (0, None)
+
+		skip = [entry['streams'] for entry in self.data['quarantine'] if entry['file'] == path]
+		entry = self.data['files'].get(path)
+		if entry is not None:
+			# its rows are in the output already, it cannot be redone
+			if entry['stamp'] != get_file_stamp(file):
+				if [0, None] not in skip:
+					self.quarantine(file, None, 'the file changed since its rows were written')
+				return []
+			skip += entry['done']
+
+		return [None if pair == (0, None) else pair for pair in subtract_ranges(first, last, skip)]
+
+	def add_done(self, file, streams, rows):
+		"""
+		Marks the streams of a file as done, once its rows are in the output
+
+		param: the file, its range of streams (None -> all) and the number
+		of rows written
+		"""
+
+		path = os.path.abspath(file)
+		entry = self.data['files'].setdefault(path, {'stamp': get_file_stamp(file), 'done': [], 'rows': 0})
+		entry['done'] = merge_ranges(entry['done'] + [list(streams or (0, None))])
+		entry['rows'] += rows
+		self.data['rows'] += rows
+
+	def quarantine(self, file, streams, error):
+		"""
+		Sets a failed task aside -> it is logged and skipped on resume
+
+		param: the file, its range of streams (None -> all) and the error
+		"""
+
+		self.data['quarantine'].append({
+			'file': os.path.abspath(file),
+			'streams': list(streams or (0, None)),
+			'error': error,
+			'time': time.time(),
+		})
+		print('quarantined {} {}: {}'.format(file, list(streams or (0, None)), error.strip().splitlines()[-1]), file=sys.stderr)
+#=========================================
+
+class Checkpoint(object):
+	"""
+	Writes the rows of the finished tasks to the output in batches and
+	records them in the manifest after each batch, see the module
+	docstring
+	"""
+
+	def __init__(self, manifest, sink, flush_rows=FLUSH_ROWS, flush_interval=FLUSH_INTERVAL):
+		"""
+		param: the RunManifest, the sink of the rows (see sinks.py), and
+		the rows and seconds between two checkpoints
+		"""
+
+		self.manifest = manifest
+		self.sink = sink
+		self.flush_rows = flush_rows
+		self.flush_interval = flush_interval
+		self.pending = []
+		self.rows = 0
+		self.last_flush = time.monotonic()
+
+	def add(self, file, streams, feature_table):
+		"""
+		Adds the feature table of a finished task
+
+		param: the file, its range of streams (None -> all) and the table
+		"""
+
+		rows = len(feature_table['stream'])
+		self.pending.append((file, streams, feature_table, rows))
+		self.rows += rows
+
+		if self.rows >= self.flush_rows or time.monotonic() - self.last_flush >= self.flush_interval:
+			self.flush()
+
+	def fail(self, file, streams, error):
+		"""
+		Quarantines a failed task (saved with the next checkpoint)
+
+		param: the file, its range of streams (None -> all) and the error
+		"""
+
+		self.manifest.quarantine(file, streams, error)
+
+	def flush(self):
+		"""
+		Writes the pending rows, syncs the sink and saves the manifest
+		"""
+
+		with im.timed('output'):
+			tables = [table for file, streams, table, rows in self.pending if rows]
+			if tables:
+				self.sink.write({column: np.concatenate([table[column] for table in tables]) for column in tables[0]})
+
+			self.manifest.data['position'] = self.sink.sync()
+		im.count('rows', self.rows)
+		for file, streams, table, rows in self.pending:
+			self.manifest.add_done(file, streams, rows)
+		self.manifest.save()
+
+		self.pending = []
+		self.rows = 0
+		self.last_flush = time.monotonic()
+#=========================================
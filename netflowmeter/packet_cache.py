@@ -0,0 +1,163 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The on-disk cache of the parsed packet tables. The flow table of a
+pcap file (stream, protocol, direction, time and length of every packet, see
+flow_engine.get_flow_table) is saved as a compressed .npz file, so that
+the runs which only change the feature parameters (CLUMP_TIMEOUT,
+ACTIVE_TIMEOUT, the labels) skip the dissection of the file and only
+redo the math of the kernels.
+
+>The cache key is made of the file (its size and modification time, or
+a hash of its content), the backend, the protocols of the flows and the
+PARSER_VERSION. The cache
+directory is kept under a size limit by removing the least recently
+used entries.
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import os
+import hashlib
+
+import numpy as np
+#=========================================
+#=========================================
+
+##========================================
+#=============--CONSTANTS--===============
+# bump when the parsing of the packets changes, to invalidate the cache
+PARSER_VERSION = 3
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'netflowmeter')
+CACHE_SIZE = 2 * 1024 * 1024 * 1024
+CACHE_SUFFIX = '.npz'
+# 'stat' -> path, size and mtime of the file, 'hash' -> its content
+CACHE_KEYS = ('stat', 'hash')
+CHUNK_SIZE = 1024 * 1024
+##========================================
+
+def get_cache_key(file, backend, key='stat', protocols=('tcp',), flow_timeout=None):
+	"""
+	Returns the cache key of a file
+
+	param: the pcap file, the backend which parses it, the kind of
+	key ('stat' or 'hash', see CACHE_KEYS), and the protocols of the
+	flows and the timeout of the udp and icmp flows (see
+	pcap_reader.FlowTracker) which change the table
+
+	return: (str) the hex digest naming the cache entry
+	"""
+
+	flows = ','.join(sorted(set(protocols)))
+	if flows != 'tcp':
+		flows += ':{}'.format(flow_timeout)
+
+	digest = hashlib.blake2b(digest_size=20)
+	digest.update('{}:{}:{}:{}:'.format(PARSER_VERSION, backend, key, flows).encode())
+
+	if key == 'hash':
+		with open(file, 'rb') as f:
+			chunk = f.read(CHUNK_SIZE)
+			while chunk:
+				digest.update(chunk)
+				chunk = f.read(CHUNK_SIZE)
+	elif key == 'stat':
+		stat = os.stat(file)
+		digest.update('{}:{}:{}'.format(os.path.abspath(file), stat.st_size, stat.st_mtime_ns).encode())
+	else:
+		raise ValueError('unknown cache key {}, expected one of {}'.format(key, CACHE_KEYS))
+
+	return digest.hexdigest()
+#=========================================
+
+def load_table(cache_dir, cache_key):
+	"""
+	Loads a table from the cache and marks it as recently used
+
+	param: the cache directory and the key of the entry
+
+	return: the table (dict of numpy arrays) or None if not cached
+	"""
+
+	path = os.path.join(cache_dir, cache_key + CACHE_SUFFIX)
+
+	try:
+		with np.load(path) as saved:
+			table = {column: saved[column] for column in saved.files}
+	except (OSError, ValueError):
+		return None
+
+	try:
+		os.utime(path)
+	except OSError:
+		pass
+
+	return table
+#=========================================
+
+def has_table(cache_dir, cache_key):
+	"""
+	Tells whether a table is in the cache, without loading it
+
+	param: the cache directory and the key of the entry
+
+	return: (bool) True if the entry exists
+	"""
+
+	return os.path.exists(os.path.join(cache_dir, cache_key + CACHE_SUFFIX))
+#=========================================
+
+def save_table(cache_dir, cache_key, table, cache_size=CACHE_SIZE):
+	"""
+	Saves a table to the cache and removes the least recently used
+	entries until the cache is under its size limit
+
+	param: the cache directory, the key of the entry, the table and the
+	size limit of the cache directory in bytes
+	"""
+
+	os.makedirs(cache_dir, exist_ok=True)
+	path = os.path.join(cache_dir, cache_key + CACHE_SUFFIX)
+
+	# write to a temporary file first, so that the other processes never
+	# load a half written entry
+	temp_path = path + '.{}.tmp'.format(os.getpid())
+	with open(temp_path, 'wb') as f:
+		np.savez_compressed(f, **table)
+	os.replace(temp_path, path)
+
+	trim_cache(cache_dir, cache_size)
+#=========================================
+
+def trim_cache(cache_dir, cache_size=CACHE_SIZE):
+	"""
+	Removes the least recently used entries of the cache directory until
+	its total size is under cache_size bytes
+
+	param: the cache directory and its size limit in bytes
+	"""
+
+	entries = []
+	for name in os.listdir(cache_dir):
+		if not name.endswith(CACHE_SUFFIX):
+			continue
+		try:
+			stat = os.stat(os.path.join(cache_dir, name))
+		except OSError:
+			continue
+		entries.append((stat.st_mtime, stat.st_size, name))
+
+	total = sum(entry[1] for entry in entries)
+	for mtime, size, name in sorted(entries):
+		if total <= cache_size:
+			break
+		try:
+			os.remove(os.path.join(cache_dir, name))
+		except OSError:
+			pass
+		total -= size
+#=========================================
@@ -0,0 +1,898 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>A native reader for the libpcap and pcapng capture files, so that
+the features can be extracted without tshark (and without Wireshark
+installed on the host).
+
+>The file is memory mapped and the Ethernet/IPv4/IPv6/TCP headers are
+decoded in place with the struct module. The tcp stream numbers are
+assigned in the same way as the tshark field tcp.stream, so the packet
+table is the same as the one built from the tshark output.
+
+>The udp and icmp packets (optional, see PROTOCOLS) are decoded in the
+same pass. They have no connection, so their flows are the
+conversations of their endpoints, cut after FLOW_TIMEOUT seconds of
+inactivity (see FlowTracker).
+
+>The captures can be compressed (gzip, bz2, xz or zstd, found from
+their magic bytes). They are decompressed as a stream, in READ_SIZE
+chunks, straight into the record reader (see iter_file_records),
+without a temporary decompressed copy on disk.
+
+>The output is a columnar packet table (a dict of numpy arrays) which
+the flow_engine.py file uses directly.
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import os
+import bz2
+import gzip
+import lzma
+import mmap
+import struct
+from collections import OrderedDict
+
+import numpy as np
+#=========================================
+#=========================================
+
+##========================================
+#=============--CONSTANTS--===============
+# pcap magic numbers -> (byte order, ticks per second)
+PCAP_MAGIC = {
+	b'\xd4\xc3\xb2\xa1': ('<', 10**6),
+	b'\xa1\xb2\xc3\xd4': ('>', 10**6),
+	b'\x4d\x3c\xb2\xa1': ('<', 10**9),
+	b'\xa1\xb2\x3c\x4d': ('>', 10**9),
+}
+
+# pcapng block types
+PCAPNG_SHB = 0x0A0D0D0A
+PCAPNG_IDB = 0x00000001
+PCAPNG_OPB = 0x00000002
+PCAPNG_EPB = 0x00000006
+PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+PCAPNG_IF_TSRESOL = 9
+
+# link layer types
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LOOP = 108
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+LINKTYPE_LINUX_SLL2 = 276
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_IPV6 = 0x86DD
+ETHERTYPE_VLAN = (0x8100, 0x88A8, 0x9100)
+
+# BSD loopback address families which carry IPv6
+AF_INET = 2
+AF_INET6 = (10, 24, 28, 30)
+
+IPPROTO_ICMP = 1
+IPPROTO_IPIP = 4
+IPPROTO_TCP = 6
+IPPROTO_UDP = 17
+IPPROTO_IPV6 = 41
+IPPROTO_ICMPV6 = 58
+# IPv6 extension headers -> True if the length field is in 4 byte units (AH)
+IPV6_EXT_HEADERS = {0: False, 43: False, 60: False, 51: True}
+IPV6_FRAGMENT = 44
+
+TCP_SYN = 0x02
+TCP_ACK = 0x10
+
+# the protocols of the flows -> their ip protocol numbers
+PROTOCOLS = {
+	'tcp': (IPPROTO_TCP,),
+	'udp': (IPPROTO_UDP,),
+	'icmp': (IPPROTO_ICMP, IPPROTO_ICMPV6),
+}
+TCP_ONLY = frozenset((IPPROTO_TCP,))
+# seconds of inactivity after which a udp or icmp conversation starts a
+# new flow
+FLOW_TIMEOUT = 120
+
+# find_record -> the number of valid record headers in a row which mark
+# the start of a record, and the largest captured length of a record
+SYNC_RECORDS = 8
+MAX_SNAPLEN = 262144
+
+# magic bytes of the compressed captures -> their compression
+COMPRESSION_MAGIC = {
+	b'\x1f\x8b': 'gzip',
+	b'BZh': 'bz2',
+	b'\xfd7zXZ\x00': 'xz',
+	b'\x28\xb5\x2f\xfd': 'zstd',
+}
+# bytes decompressed per read of a compressed capture
+READ_SIZE = 4 * 1024 * 1024
+##========================================
+
+_U16 = struct.Struct('!H')
+_TCP = struct.Struct('!HHI5xB')
+_UDP = struct.Struct('!HH')
+
+#=========================================
+
+class StreamTracker(object):
+	"""
+	Assigns the tcp stream numbers to the packets the way tshark does
+	for the tcp.stream field:
+
+	>a new stream number is given to every new conversation (the pair
+	of ip address and port endpoints), in the order of the first packet
+
+	>a SYN (without ACK) in a known conversation, whose sequence number
+	is not the first one seen from that endpoint, starts a new stream
+	(the ports are reused by a new connection)
+	"""
+
+	def __init__(self):
+		self.conversations = {}
+		self.keys = {}
+		self.next_stream = 0
+
+	def get_stream(self, src, sport, dst, dport, seq, flags):
+		"""
+		Returns the stream number of a tcp packet
+
+		param: the src and dst addresses and ports, the sequence number
+		and the tcp flags of the packet
+
+		return: (int) the stream number
+		"""
+
+		end_a = (src, sport)
+		end_b = (dst, dport)
+		key = (end_a, end_b) if end_a <= end_b else (end_b, end_a)
+
+		conv = self.conversations.get(key)
+		if conv is not None and flags & (TCP_SYN | TCP_ACK) == TCP_SYN:
+			base_seq = conv[1].get(end_a)
+			if base_seq is not None and base_seq != seq:
+				conv = None
+
+		if conv is None:
+			conv = (self.next_stream, {})
+			self.keys[self.next_stream] = key
+			self.next_stream += 1
+			self.conversations[key] = conv
+
+		conv[1].setdefault(end_a, seq)
+
+		return conv[0]
+
+	def forget_stream(self, stream):
+		"""
+		Drops the conversation of a finished stream, so that the memory
+		of a long capture is bounded by the streams still open (a later
+		packet of the same conversation starts a new stream)
+
+		param: the stream number
+		"""
+
+		key = self.keys.pop(stream, None)
+		conv = self.conversations.get(key)
+		if conv is not None and conv[0] == stream:
+			del self.conversations[key]
+#=========================================
+
+class FlowTracker(object):
+	"""
+	Assigns the flow numbers to the udp and icmp packets, which have no
+	connection to follow:
+
+	>a flow is a conversation (the pair of ip address and port endpoints,
+	the ports being 0 for icmp) of one protocol
+
+	>a packet which comes more than the timeout after the last packet of
+	its conversation starts a new flow
+
+	>the flows of every protocol are numbered from 0, in the order of
+	their first packet (like tcp.stream for the tcp packets)
+
+	The conversations are kept in the order of their last packet, so the
+	timed out ones are dropped from the front and the memory is bounded
+	by the open flows.
+	"""
+
+	def __init__(self, timeout=FLOW_TIMEOUT):
+		"""
+		param: the seconds of inactivity which end a flow (None -> never)
+		"""
+
+		self.timeout = timeout
+		self.conversations = OrderedDict()
+		self.next_flow = {}
+
+	def get_flow(self, protocol, src, sport, dst, dport, time):
+		"""
+		Returns the flow number of a udp or icmp packet
+
+		param: the ip protocol number, the src and dst addresses and ports
+		and the time of the packet in seconds
+
+		return: (int) the flow number, within the protocol
+		"""
+
+		end_a = (src, sport)
+		end_b = (dst, dport)
+		key = (protocol, end_a, end_b) if end_a <= end_b else (protocol, end_b, end_a)
+
+		if self.timeout is not None:
+			while self.conversations:
+				first = next(iter(self.conversations.values()))
+				if time - first[1] <= self.timeout:
+					break
+				self.conversations.popitem(last=False)
+
+		conv = self.conversations.pop(key, None)
+		if conv is None:
+			conv = [self.next_flow.get(protocol, 0), time]
+			self.next_flow[protocol] = conv[0] + 1
+		conv[1] = time
+		self.conversations[key] = conv
+
+		return conv[0]
+#=========================================
+
+def get_ip_protocols(protocols):
+	"""
+	Returns the ip protocol numbers of the flow protocols
+
+	param: the names of the protocols (see PROTOCOLS)
+
+	return: frozenset of the ip protocol numbers
+	"""
+
+	numbers = set()
+	for name in protocols:
+		if name not in PROTOCOLS:
+			raise ValueError('unknown protocol {}, expected one of {}'.format(name, tuple(PROTOCOLS)))
+		numbers.update(PROTOCOLS[name])
+
+	return frozenset(numbers)
+#=========================================
+
+def get_file_state(buf):
+	"""
+	Reads the header of a pcap or pcapng file, up to its first packet
+	record
+
+	param: the buffer (memory map) of the capture file
+
+	return: dict of the reading state -> 'format' ('pcap' or 'pcapng'),
+	'offset' of the first record and 'order' (byte order), with
+	'linktype', 'ticks' and 'snaplen' for pcap or 'interfaces' (list of
+	the (link type, if_tsresol) of the section) for pcapng
+	"""
+
+	magic = bytes(buf[0:4])
+
+	if magic in PCAP_MAGIC:
+		order, ticks = PCAP_MAGIC[magic]
+		snaplen, linktype = struct.unpack_from(order + 'II', buf, 16)
+		return {'format': 'pcap', 'offset': 24, 'order': order, 'ticks': ticks,
+			'snaplen': snaplen, 'linktype': linktype & 0x0FFFFFFF}
+
+	if len(magic) < 4 or struct.unpack_from('<I', magic)[0] != PCAPNG_SHB:
+		raise ValueError('not a pcap or pcapng file')
+
+	# the blocks before the first packet block only describe the section
+	# and its interfaces
+	state = {'format': 'pcapng', 'offset': 0, 'order': '<', 'interfaces': []}
+	for record in _iter_pcapng_records(buf, state, None, stop=True):
+		pass
+
+	return state
+#=========================================
+
+def iter_records(buf, state=None, end=None, partial=False):
+	"""
+	Takes the contents of a pcap or pcapng file and yields its packet
+	records without copying the packet data
+
+	>a part of the file can be read by starting from a reading state
+	whose offset is a record (see get_file_state and find_record) and
+	stopping at the first record which starts at or after end
+
+	param: the buffer (memory map) of the capture file, the reading
+	state (None -> the start of the file), which is updated to the next
+	record once the generator is exhausted, the end offset (None ->
+	the end of the file) and whether the buffer is only the start of
+	the rest of the file (partial=True -> stops at the first record
+	which is not whole in the buffer, see iter_file_records)
+
+	return: generator of (time in ns, original length, link type,
+	offset of the packet data, captured length)
+	"""
+
+	if state is None:
+		state = get_file_state(buf)
+
+	if state['format'] == 'pcap':
+		return _iter_pcap_records(buf, state, end, partial)
+
+	return _iter_pcapng_records(buf, state, end, partial=partial)
+#=========================================
+
+def get_compression(file):
+	"""
+	Finds the compression of a capture file from its magic bytes
+
+	param: the capture file
+
+	return: (str) 'gzip', 'bz2', 'xz' or 'zstd', None if the file is
+	not compressed
+	"""
+
+	with open(file, 'rb') as f:
+		magic = f.read(6)
+
+	for prefix, compression in COMPRESSION_MAGIC.items():
+		if magic.startswith(prefix):
+			return compression
+
+	return None
+#=========================================
+
+def open_compressed(file, compression):
+	"""
+	Opens a compressed capture file for reading its decompressed bytes
+
+	param: the capture file and its compression (see get_compression)
+
+	return: binary file object
+	"""
+
+	if compression == 'gzip':
+		return gzip.open(file, 'rb')
+	if compression == 'bz2':
+		return bz2.open(file, 'rb')
+	if compression == 'xz':
+		return lzma.open(file, 'rb')
+
+	try:
+		import zstandard
+	except ImportError:
+		raise ImportError('reading the zstd compressed captures needs the zstandard package (pip install zstandard)')
+
+	return zstandard.ZstdDecompressor().stream_reader(open(file, 'rb'), read_size=READ_SIZE, closefd=True)
+#=========================================
+
+def iter_file_records(file, state=None, read_size=READ_SIZE):
+	"""
+	Reads a capture file and yields its packet records, with the buffer
+	which holds each of them. A plain file is memory mapped, a compressed
+	one is decompressed as a stream into a window of about read_size
+	bytes, so it is never held (or written) whole.
+
+	param: the capture file, a dict to fill with the reading state of
+	the file (see get_file_state), with its 'compression' (None for a
+	plain file), the 'base' offset of the current buffer in the
+	decompressed file and once the generator is exhausted its number of
+	'sections' (None for a compressed file, which is not counted), and
+	the number of bytes decompressed per read
+
+	return: generator of (buffer, time in ns, original length, link
+	type, offset of the packet data in the buffer, captured length)
+	"""
+
+	if state is None:
+		state = {}
+
+	compression = get_compression(file)
+
+	if compression is None:
+		with open(file, 'rb') as f:
+			buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+			try:
+				state.update(get_file_state(buf), compression=None, base=0)
+				for record in iter_records(buf, state):
+					yield (buf,) + record
+				state['sections'] = get_section_count(buf)
+			finally:
+				buf.close()
+		return
+
+	with open_compressed(file, compression) as f:
+		buf = f.read(read_size)
+		state.update(get_file_state(buf), compression=compression, base=0)
+		eof = False
+
+		while True:
+			for record in iter_records(buf, state, partial=not eof):
+				yield (buf,) + record
+			if eof:
+				break
+
+			# drops the records read and appends the next chunk
+			data = f.read(read_size)
+			eof = not data
+			state['base'] += state['offset']
+			buf = buf[state['offset']:] + data
+			state['offset'] = 0
+
+		state['offset'] += state['base']
+		state['sections'] = None
+#=========================================
+
+def get_first_time(file):
+	"""
+	Returns the time of the first packet record of a capture
+
+	param: the capture file
+
+	return: (int) the time in ns, None if the file has no record
+	"""
+
+	if os.path.getsize(file) == 0:
+		return None
+
+	records = iter_file_records(file)
+	try:
+		for record in records:
+			return record[1]
+	finally:
+		records.close()
+
+	return None
+#=========================================
+
+def _iter_pcap_records(buf, state, end, partial=False):
+	"""
+	Yields the packet records of the pcap file, see iter_records
+	"""
+
+	header = struct.Struct(state['order'] + 'IIII')
+	linktype = state['linktype']
+	scale = 10**9 // state['ticks']
+
+	offset = state['offset']
+	size = len(buf)
+	if end is None or end > size:
+		end = size
+
+	try:
+		while offset < end and offset + 16 <= size:
+			ts_sec, ts_frac, caplen, orig_len = header.unpack_from(buf, offset)
+			if partial and offset + 16 + caplen > size:
+				break
+			offset += 16
+			yield (ts_sec * 10**9 + ts_frac * scale, orig_len, linktype, offset, caplen)
+			offset += caplen
+	finally:
+		state['offset'] = offset
+#=========================================
+
+def _iter_pcapng_records(buf, state, end, stop=False, partial=False):
+	"""
+	Yields the packet records of the pcapng file (enhanced and obsolete
+	packet blocks), see iter_records. With stop=True the state is left
+	at the first packet block instead (see get_file_state).
+	"""
+
+	order = state['order']
+	interfaces = state['interfaces']
+	offset = state['offset']
+	size = len(buf)
+	if end is None or end > size:
+		end = size
+
+	try:
+		while offset < end and offset + 12 <= size:
+			block_type = struct.unpack_from(order + 'I', buf, offset)[0]
+
+			# the section header block gives the byte order of its section
+			if block_type == PCAPNG_SHB:
+				bom = struct.unpack_from('<I', buf, offset + 8)[0]
+				order = '<' if bom == PCAPNG_BYTE_ORDER_MAGIC else '>'
+				interfaces = []
+
+			block_len = struct.unpack_from(order + 'I', buf, offset + 4)[0]
+			if partial and offset + block_len > size:
+				break
+			body = offset + 8
+
+			if block_type == PCAPNG_IDB:
+				linktype = struct.unpack_from(order + 'H', buf, body)[0]
+				resol = _get_pcapng_tsresol(buf, body + 8, offset + block_len - 4, order)
+				interfaces.append((linktype, resol))
+
+			elif block_type in (PCAPNG_EPB, PCAPNG_OPB):
+				if stop:
+					return
+
+				if block_type == PCAPNG_EPB:
+					if_id, ts_high, ts_low, caplen, orig_len = struct.unpack_from(order + 'IIIII', buf, body)
+				else:
+					if_id, drops, ts_high, ts_low, caplen, orig_len = struct.unpack_from(order + 'HHIIII', buf, body)
+
+				linktype, resol = interfaces[if_id]
+
+				yield (_get_pcapng_time(ts_high, ts_low, resol), orig_len, linktype, body + 20, caplen)
+
+			if block_len < 12:
+				raise ValueError('corrupt pcapng block at offset {}'.format(offset))
+			offset += block_len
+	finally:
+		state['order'] = order
+		state['interfaces'] = interfaces
+		state['offset'] = offset
+#=========================================
+
+def find_record(buf, offset, state):
+	"""
+	Finds the first record of the file which starts at or after an
+	offset, e.g. the start of a byte range of the file. The pcap records
+	have no marker, so a record is taken as found when SYNC_RECORDS
+	valid record headers follow each other from there (or up to the end
+	of the file).
+
+	param: the buffer of the capture file, the offset and the reading
+	state of the file (see get_file_state)
+
+	return: (int) the offset of the record, or the size of the file if
+	there is none
+	"""
+
+	size = len(buf)
+
+	if state['format'] == 'pcap':
+		header = struct.Struct(state['order'] + 'IIII')
+		snaplen = max(state['snaplen'], MAX_SNAPLEN)
+		ticks = state['ticks']
+
+		def next_record(at):
+			ts_sec, ts_frac, caplen, orig_len = header.unpack_from(buf, at)
+			if ts_frac >= ticks or caplen > snaplen or caplen > orig_len:
+				return None
+			return at + 16 + caplen
+		step = 1
+		min_len = 16
+
+	else:
+		order = state['order']
+		interfaces = len(state['interfaces'])
+
+		def next_record(at):
+			block_type, block_len = struct.unpack_from(order + 'II', buf, at)
+			if block_len < 12 or block_len % 4 or at + block_len > size:
+				return None
+			if struct.unpack_from(order + 'I', buf, at + block_len - 4)[0] != block_len:
+				return None
+			if block_type == PCAPNG_EPB and struct.unpack_from(order + 'I', buf, at + 8)[0] >= interfaces:
+				return None
+			return at + block_len
+		# the blocks are 32 bit aligned
+		step = 4
+		min_len = 12
+		offset += -offset % 4
+
+	while offset + min_len <= size:
+		at = offset
+		for _ in range(SYNC_RECORDS):
+			at = next_record(at)
+			if at is None or at > size:
+				break
+			if at + min_len > size:
+				return offset
+		else:
+			return offset
+		offset += step
+
+	return size
+#=========================================
+
+def read_record(buf, offset, state):
+	"""
+	Reads the record of a packet from the offset of its data, for the
+	random access to the packets (see stream_index.py)
+
+	>the timestamp, the captured and the original length are the 16
+	bytes before the packet data, in the pcap records as in the pcapng
+	enhanced and obsolete packet blocks
+
+	param: the buffer of the capture file, the offset of the packet data
+	(see read_packet_table) and the reading state at the end of the file
+	(of its only section for a pcapng file)
+
+	return: (time in ns, original length, link type, offset of the packet
+	data, captured length), like iter_records
+	"""
+
+	order = state['order']
+	ts_high, ts_low, caplen, orig_len = struct.unpack_from(order + 'IIII', buf, offset - 16)
+
+	if state['format'] == 'pcap':
+		return (ts_high * 10**9 + ts_low * (10**9 // state['ticks']), orig_len, state['linktype'], offset, caplen)
+
+	if struct.unpack_from(order + 'I', buf, offset - 28)[0] == PCAPNG_EPB:
+		if_id = struct.unpack_from(order + 'I', buf, offset - 20)[0]
+	else:
+		if_id = struct.unpack_from(order + 'H', buf, offset - 20)[0]
+	linktype, resol = state['interfaces'][if_id]
+
+	return (_get_pcapng_time(ts_high, ts_low, resol), orig_len, linktype, offset, caplen)
+#=========================================
+
+def get_section_count(buf):
+	"""
+	Counts the sections of a pcapng file (1 for a pcap file), by walking
+	its blocks without reading them
+
+	param: the buffer of the capture file
+
+	return: (int) the number of section header blocks
+	"""
+
+	state = get_file_state(buf)
+	if state['format'] == 'pcap':
+		return 1
+
+	sections = 0
+	offset = 0
+	order = state['order']
+	size = len(buf)
+	while offset + 12 <= size:
+		block_type = struct.unpack_from(order + 'I', buf, offset)[0]
+		if block_type == PCAPNG_SHB:
+			sections += 1
+			order = '<' if struct.unpack_from('<I', buf, offset + 8)[0] == PCAPNG_BYTE_ORDER_MAGIC else '>'
+		block_len = struct.unpack_from(order + 'I', buf, offset + 4)[0]
+		if block_len < 12:
+			break
+		offset += block_len
+
+	return sections
+#=========================================
+
+def _get_pcapng_time(ts_high, ts_low, resol):
+	"""
+	Returns the time in ns of a pcapng timestamp in if_tsresol units
+	"""
+
+	ts = (ts_high << 32) | ts_low
+	if resol & 0x80:
+		return (ts * 10**9) >> (resol & 0x7F)
+	if resol <= 9:
+		return ts * 10**(9 - resol)
+
+	return ts // 10**(resol - 9)
+#=========================================
+
+def _get_pcapng_tsresol(buf, offset, end, order):
+	"""
+	Returns the if_tsresol option of an interface description block
+	(6 -> microseconds when the option is not present)
+	"""
+
+	while offset + 4 <= end:
+		code, length = struct.unpack_from(order + 'HH', buf, offset)
+		if code == 0:
+			break
+		if code == PCAPNG_IF_TSRESOL:
+			return buf[offset + 4]
+		offset += 4 + ((length + 3) & ~3)
+
+	return 6
+#=========================================
+
+def decode_packet(buf, offset, caplen, linktype, ip_protocols=TCP_ONLY):
+	"""
+	Decodes the link, ip and tcp (or udp, icmp) headers of a packet
+
+	param: the buffer, the offset and the captured length of the
+	packet data, the link type of the capture and the ip protocol
+	numbers to decode (see get_ip_protocols)
+
+	return: tuple of (ip src, ip dst, src, dst, sport, dport, seq, flags,
+	protocol) or None if the packet is not of one of the protocols. The
+	ip src and dst are of the outer ip header (like ip.src with -E
+	occurrence=f), the src and dst are of the ip header carrying the
+	segment. The seq and flags are 0 for udp and icmp, and the ports are
+	0 for icmp
+	"""
+
+	end = offset + caplen
+
+	# link layer -> the ip version and the offset of the ip header
+	if linktype == LINKTYPE_ETHERNET:
+		offset += 12
+		if offset + 2 > end:
+			return None
+		ethertype = _U16.unpack_from(buf, offset)[0]
+		while ethertype in ETHERTYPE_VLAN and offset + 6 <= end:
+			offset += 4
+			ethertype = _U16.unpack_from(buf, offset)[0]
+		offset += 2
+
+	elif linktype == LINKTYPE_LINUX_SLL:
+		if offset + 16 > end:
+			return None
+		ethertype = _U16.unpack_from(buf, offset + 14)[0]
+		offset += 16
+
+	elif linktype == LINKTYPE_LINUX_SLL2:
+		if offset + 20 > end:
+			return None
+		ethertype = _U16.unpack_from(buf, offset)[0]
+		offset += 20
+
+	elif linktype in (LINKTYPE_NULL, LINKTYPE_LOOP):
+		if offset + 4 > end:
+			return None
+		family = struct.unpack_from('<I' if linktype == LINKTYPE_NULL else '>I', buf, offset)[0]
+		if family > 0xFFFF:
+			family = struct.unpack_from('>I', buf, offset)[0]
+		ethertype = ETHERTYPE_IPV4 if family == AF_INET else ETHERTYPE_IPV6 if family in AF_INET6 else 0
+		offset += 4
+
+	elif linktype in (LINKTYPE_RAW, LINKTYPE_IPV4, LINKTYPE_IPV6):
+		if offset >= end:
+			return None
+		ethertype = ETHERTYPE_IPV4 if buf[offset] >> 4 == 4 else ETHERTYPE_IPV6
+
+	else:
+		return None
+
+	ip_src = None
+	ip_dst = None
+
+	# ip layer(s), following IPv4/IPv6 tunnels down to the tcp header
+	while True:
+		if ethertype == ETHERTYPE_IPV4:
+			if offset + 20 > end:
+				return None
+			ihl = (buf[offset] & 0x0F) * 4
+			# only the first fragment carries the tcp header
+			if _U16.unpack_from(buf, offset + 6)[0] & 0x1FFF:
+				return None
+			proto = buf[offset + 9]
+			src = buf[offset + 12:offset + 16]
+			dst = buf[offset + 16:offset + 20]
+			offset += ihl
+
+		elif ethertype == ETHERTYPE_IPV6:
+			if offset + 40 > end:
+				return None
+			proto = buf[offset + 6]
+			src = buf[offset + 8:offset + 24]
+			dst = buf[offset + 24:offset + 40]
+			offset += 40
+			while proto in IPV6_EXT_HEADERS or proto == IPV6_FRAGMENT:
+				if offset + 8 > end:
+					return None
+				if proto == IPV6_FRAGMENT:
+					if _U16.unpack_from(buf, offset + 2)[0] & 0xFFF8:
+						return None
+					length = 8
+				elif IPV6_EXT_HEADERS[proto]:
+					length = (buf[offset + 1] + 2) * 4
+				else:
+					length = (buf[offset + 1] + 1) * 8
+				proto = buf[offset]
+				offset += length
+
+		else:
+			return None
+
+		if ip_src is None:
+			ip_src, ip_dst = src, dst
+
+		if proto == IPPROTO_IPIP:
+			ethertype = ETHERTYPE_IPV4
+		elif proto == IPPROTO_IPV6:
+			ethertype = ETHERTYPE_IPV6
+		else:
+			break
+
+	if proto not in ip_protocols:
+		return None
+
+	if proto == IPPROTO_TCP:
+		if offset + 14 > end:
+			return None
+		sport, dport, seq, flags = _TCP.unpack_from(buf, offset)
+	elif proto == IPPROTO_UDP:
+		if offset + 4 > end:
+			return None
+		sport, dport = _UDP.unpack_from(buf, offset)
+		seq = flags = 0
+	else:
+		sport = dport = seq = flags = 0
+
+	return (ip_src, ip_dst, src, dst, sport, dport, seq, flags, proto)
+#=========================================
+
+def read_packet_table(file, offsets=False, state=None, protocols=('tcp',), flow_timeout=FLOW_TIMEOUT):
+	"""
+	Reads a pcap or pcapng file and returns the table of all its tcp
+	packets, the same as flow_engine.get_packet_table gives from the
+	tshark output
+
+	param: the capture file to read (plain or compressed), whether to add
+	the 'offset' column (the byte offset of the packet data in the
+	decompressed file), a dict to fill with the reading state at the end
+	of the file (see iter_file_records) and the time of its first record
+	'first_ts',
+	the protocols of the flows (see PROTOCOLS) and the inactivity timeout
+	of the udp and icmp flows (see FlowTracker)
+
+	return: dict of numpy arrays -> 'stream' (tcp.stream, or the flow
+	number of FlowTracker), 'protocol' (the ip protocol number), 'src'
+	and 'dst' (ip addresses, as integer codes), 'sport' and 'dport'
+	(ports), 'time' (frame.time_relative) and 'length' (frame.len), one
+	entry per packet in the capture order
+	"""
+
+	ip_protocols = get_ip_protocols(protocols)
+	tracker = StreamTracker()
+	flow_tracker = FlowTracker(flow_timeout)
+	addresses = {}
+
+	stream_col = []
+	protocol_col = []
+	src_col = []
+	dst_col = []
+	sport_col = []
+	dport_col = []
+	time_col = []
+	len_col = []
+	offset_col = []
+	first_ts = None
+
+	file_state = {}
+	for buf, ts, orig_len, linktype, offset, caplen in iter_file_records(file, file_state):
+		# frame.time_relative is relative to the first frame of the file
+		if first_ts is None:
+			first_ts = ts
+
+		pkt = decode_packet(buf, offset, caplen, linktype, ip_protocols)
+		if pkt is None:
+			continue
+
+		ip_src, ip_dst, src, dst, sport, dport, seq, flags, protocol = pkt
+
+		if protocol == IPPROTO_TCP:
+			stream_col.append(tracker.get_stream(src, sport, dst, dport, seq, flags))
+		else:
+			stream_col.append(flow_tracker.get_flow(protocol, src, sport, dst, dport, (ts - first_ts) / 1e9))
+		protocol_col.append(protocol)
+		src_col.append(addresses.setdefault(ip_src, len(addresses)))
+		dst_col.append(addresses.setdefault(ip_dst, len(addresses)))
+		sport_col.append(sport)
+		dport_col.append(dport)
+		time_col.append(ts - first_ts)
+		len_col.append(orig_len)
+		offset_col.append(file_state['base'] + offset)
+
+	if state is not None:
+		state.update(file_state, first_ts=first_ts)
+
+	table = {
+		'stream': np.array(stream_col, dtype=np.int64),
+		'protocol': np.array(protocol_col, dtype=np.int64),
+		'src': np.array(src_col, dtype=np.int64),
+		'dst': np.array(dst_col, dtype=np.int64),
+		'sport': np.array(sport_col, dtype=np.int64),
+		'dport': np.array(dport_col, dtype=np.int64),
+		'time': np.array(time_col, dtype=np.int64) / 1e9,
+		'length': np.array(len_col, dtype=np.int64),
+	}
+	if offsets:
+		table['offset'] = np.array(offset_col, dtype=np.int64)
+
+	return table
+#=========================================
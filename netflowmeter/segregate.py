@@ -0,0 +1,61 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>An important file which contains the function for segregating
+flows into the direction forward and backward.
+
+>forward packets are decided on the direction of the first arriving
+packet in the flow (src and dst ip addresses)
+
+>backward packets will have the opposite values of the src and dst
+ip address.
+
+>The segregation is important in calculation of the forward, backward
+and the flow inter arrival times in the statistics.py file
+
+>get_flow returns the packets as a flow.Flow (parallel numpy arrays,
+the forward and backward packets being slices of them), seg_flow_pkts
+still returns the old lists of 'src,dst,time' strings (Flow.to_lists())
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+from . import flow as fl
+
+#=========================================
+#=========================================
+
+def get_flow(file, stream_no):
+	"""
+	Takes a file and the stream number and returns the flow with its
+	fwd and back packets
+
+	>fwd packets have the src endpoint (ip and port) of the first
+	packet, all the others are back packets (also when the two ips are
+	the same, e.g. loopback or NAT)
+
+	param: file, stream number
+
+	return: flow.Flow -> fwd_time/rev_time and fwd_length/rev_length
+	"""
+	# the packets of the stream -> ip.src, ip.dst, the tcp ports, frame.time_relative and frame.len
+	# (seeked with the stream index, or the tshark output, see flow.read_flow)
+	return fl.read_flow(file, stream_no)
+#=========================================
+
+def seg_flow_pkts(file, stream_no):
+	"""
+	Takes a file and the stream number of and returns a list containing
+	fwd and back packets (see get_flow)
+
+	param: file, stream number
+
+	return: list of list of fwd and back pkts -> 'src,dst,time' strings
+	"""
+
+	return get_flow(file, stream_no).to_lists()
+#=========================================
@@ -0,0 +1,308 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The sharded reading of one large capture file, so that a single
+file which dominates a batch is also decoded on all the cores.
+
+>The file is cut into byte ranges (shards). Every shard finds its
+first record (pcap_reader.find_record) and decodes the records which
+start in its range with the native reader, into a partial packet
+table. The packets of a tcp conversation are numbered by 'segments'
+within the shard, a new segment at every SYN, since the tcp stream of
+a packet depends on the packets of the earlier shards.
+
+>The partial tables are then stitched in the order of the file -> the
+seams are checked (a shard which did not start at the record where the
+previous one stopped is read again from there), the tshark stream
+numbers are given to the segments by replaying the rules of
+pcap_reader.StreamTracker on their first packets, and the times are
+made relative to the first frame of the file. The direction of every
+packet is then taken from the first packet of its whole stream by
+flow_engine.get_flow_table, and the gaps at the seams are computed by
+the kernels like any other gap, so the features are exactly the ones
+of the serial run.
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import os
+import mmap
+import time
+import multiprocessing as mp
+
+import numpy as np
+
+from . import statistics as st
+from . import pcap_reader as pr
+from . import flow_engine as fe
+from . import packet_cache as pc
+from . import instrument as im
+#=========================================
+#=========================================
+
+##========================================
+#=============--CONSTANTS--===============
+# the smallest shard worth a process of its own (in bytes)
+MIN_SHARD_SIZE = 16 * 1024 * 1024
+##========================================
+
+class SegmentTracker(object):
+	"""
+	Numbers the packets of a shard by segments -> the packets of a tcp
+	conversation, up to its next SYN (without ACK). Every segment keeps
+	what decides its tcp stream in pcap_reader.StreamTracker -> its
+	conversation, the endpoint, the sequence number and the SYN flag of
+	its first packet, and the first sequence number seen from every
+	endpoint.
+	"""
+
+	def __init__(self):
+		self.conversations = {}
+		self.segments = []
+
+	def get_segment(self, src, sport, dst, dport, seq, flags):
+		"""
+		Returns the segment number of a tcp packet
+
+		param: the src and dst addresses and ports, the sequence number
+		and the tcp flags of the packet
+
+		return: (int) the segment number
+		"""
+
+		end_a = (src, sport)
+		end_b = (dst, dport)
+		key = (end_a, end_b) if end_a <= end_b else (end_b, end_a)
+
+		syn = flags & (pr.TCP_SYN | pr.TCP_ACK) == pr.TCP_SYN
+		segment = self.conversations.get(key)
+		if segment is None or syn:
+			segment = len(self.segments)
+			self.segments.append((key, end_a, seq, syn, {}))
+			self.conversations[key] = segment
+
+		self.segments[segment][4].setdefault(end_a, seq)
+
+		return segment
+#=========================================
+
+def get_shard_ranges(file, shards):
+	"""
+	Cuts a file into byte ranges of about the same size
+
+	param: the capture file and the number of shards
+
+	return: list of (start, end) byte ranges, end being None for the last
+	"""
+
+	size = os.path.getsize(file)
+	shards = max(1, min(shards, size // MIN_SHARD_SIZE))
+	bounds = [size * index // shards for index in range(shards)]
+
+	return [(start, bounds[index + 1] if index + 1 < shards else None) for index, start in enumerate(bounds)]
+#=========================================
+
+def read_shard(file, start=0, end=None, state=None):
+	"""
+	Decodes the tcp packets of the records which start in a byte range
+	of the file
+
+	param: the capture file, the byte range and the reading state to
+	start from (None -> the first record at or after start)
+
+	return: dict of the partial table -> 'segment', 'src' and 'dst'
+	(address codes within the shard), 'sport', 'dport', 'ts' (time in ns)
+	and 'length' columns, the 'addresses' of the codes, the 'segments' (see
+	SegmentTracker), the time of the first record 'first_ts', and the
+	reading state at the 'start' and the 'end' of the shard
+	"""
+
+	started = time.perf_counter()
+	tracker = SegmentTracker()
+	addresses = {}
+
+	segment_col = []
+	src_col = []
+	dst_col = []
+	sport_col = []
+	dport_col = []
+	ts_col = []
+	len_col = []
+	first_ts = None
+
+	with open(file, 'rb') as f:
+		buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+		try:
+			if state is None:
+				state = pr.get_file_state(buf)
+				if start > state['offset']:
+					state['offset'] = pr.find_record(buf, start, state)
+			else:
+				state = dict(state)
+			start_state = dict(state)
+
+			for ts, orig_len, linktype, offset, caplen in pr.iter_records(buf, state, end):
+				if first_ts is None:
+					first_ts = ts
+
+				pkt = pr.decode_packet(buf, offset, caplen, linktype)
+				if pkt is None:
+					continue
+
+				ip_src, ip_dst, src, dst, sport, dport, seq, flags, protocol = pkt
+
+				segment_col.append(tracker.get_segment(src, sport, dst, dport, seq, flags))
+				src_col.append(addresses.setdefault(ip_src, len(addresses)))
+				dst_col.append(addresses.setdefault(ip_dst, len(addresses)))
+				sport_col.append(sport)
+				dport_col.append(dport)
+				ts_col.append(ts)
+				len_col.append(orig_len)
+		finally:
+			buf.close()
+
+	im.add_time('decode', time.perf_counter() - started)
+
+	return {
+		'segment': np.array(segment_col, dtype=np.int64),
+		'src': np.array(src_col, dtype=np.int64),
+		'dst': np.array(dst_col, dtype=np.int64),
+		'sport': np.array(sport_col, dtype=np.int64),
+		'dport': np.array(dport_col, dtype=np.int64),
+		'ts': np.array(ts_col, dtype=np.int64),
+		'length': np.array(len_col, dtype=np.int64),
+		'addresses': list(addresses),
+		'segments': tracker.segments,
+		'first_ts': first_ts,
+		'start': start_state,
+		'end': state,
+	}
+#=========================================
+
+def stitch_shards(file, shards, partials):
+	"""
+	Joins the partial tables of the shards of a file into its packet
+	table, the same as pcap_reader.read_packet_table gives
+
+	param: the capture file, its byte ranges (see get_shard_ranges) and
+	the partial tables of the ranges (see read_shard)
+
+	return: the packet table of the file
+	"""
+
+	conversations = {}
+	next_stream = 0
+	addresses = {}
+	first_ts = None
+
+	columns = {'stream': [], 'src': [], 'dst': [], 'sport': [], 'dport': [], 'ts': [], 'length': []}
+
+	for index, partial in enumerate(partials):
+		# a shard which found another first record than the one where
+		# the previous shard stopped is read again from there
+		if index > 0 and partial['start'] != partials[index - 1]['end']:
+			partial = read_shard(file, state=partials[index - 1]['end'], end=shards[index][1])
+			partials[index] = partial
+
+		if first_ts is None:
+			first_ts = partial['first_ts']
+
+		# the tcp stream of every segment, see pcap_reader.StreamTracker
+		streams = np.empty(len(partial['segments']), dtype=np.int64)
+		for segment, (key, end_a, seq, syn, seqs) in enumerate(partial['segments']):
+			conv = conversations.get(key)
+			if conv is not None and syn:
+				base_seq = conv[1].get(end_a)
+				if base_seq is not None and base_seq != seq:
+					conv = None
+
+			if conv is None:
+				conv = (next_stream, {})
+				next_stream += 1
+				conversations[key] = conv
+
+			for end, first_seq in seqs.items():
+				conv[1].setdefault(end, first_seq)
+			streams[segment] = conv[0]
+
+		codes = np.array([addresses.setdefault(address, len(addresses)) for address in partial['addresses']], dtype=np.int64)
+
+		columns['stream'].append(streams[partial['segment']])
+		columns['src'].append(codes[partial['src']])
+		columns['dst'].append(codes[partial['dst']])
+		columns['sport'].append(partial['sport'])
+		columns['dport'].append(partial['dport'])
+		columns['ts'].append(partial['ts'])
+		columns['length'].append(partial['length'])
+
+	table = {column: np.concatenate(columns[column]) for column in columns}
+
+	# frame.time_relative is relative to the first frame of the file
+	table['time'] = (table.pop('ts') - (first_ts or 0)) / 1e9
+	# the shards hold the tcp packets only (see batch.get_tasks)
+	table['protocol'] = np.full(len(table['stream']), pr.IPPROTO_TCP, dtype=np.int64)
+
+	return table
+#=========================================
+
+def read_packet_table(file, shards=None, workers=None):
+	"""
+	Reads the packet table of a file with its shards decoded on a pool
+	of worker processes
+
+	param: the capture file, the number of shards (default -> the number
+	of workers) and the number of worker processes (default -> all the
+	cpus)
+
+	return: the packet table of the file (see stitch_shards)
+	"""
+
+	if workers is None:
+		workers = os.cpu_count() or 1
+	if shards is None:
+		shards = workers
+
+	ranges = get_shard_ranges(file, shards)
+
+	if workers > 1 and len(ranges) > 1:
+		with mp.Pool(min(workers, len(ranges))) as pool:
+			partials = pool.starmap(read_shard, [(file, start, end) for start, end in ranges], chunksize=1)
+	else:
+		partials = [read_shard(file, start, end) for start, end in ranges]
+
+	return stitch_shards(file, ranges, partials)
+#=========================================
+
+def get_feature_table(file, shards, partials, cache_dir=None, cache_key='stat', cache_size=pc.CACHE_SIZE,
+		clump_timeout=st.CLUMP_TIMEOUT, active_timeout=st.ACTIVE_TIMEOUT, columns=None, protocols=('tcp',),
+		flow_timeout=pr.FLOW_TIMEOUT):
+	"""
+	Computes the features of all the tcp streams of a file from the
+	partial tables of its shards, see flow_engine.get_feature_table
+
+	param: the capture file, its byte ranges and their partial tables
+	(see read_shard), the cache options (the stitched flow table is
+	cached like the one of the native backend), the two timeouts of the
+	active and idle times, the feature columns (see
+	flow_engine.compute_feature_table), and the protocols and the flow
+	timeout (only tcp, the files with udp or icmp flows are not sharded)
+
+	return: dict of 'stream' and the feature columns -> array with one
+	entry per stream, sorted by the stream number
+	"""
+
+	with im.timed('group'):
+		flow_table = fe.make_flow_table(stitch_shards(file, shards, partials))
+	im.count('packets', len(flow_table['stream']))
+
+	if cache_dir is not None:
+		with im.timed('cache'):
+			pc.save_table(cache_dir, pc.get_cache_key(file, 'native', cache_key, protocols, flow_timeout), flow_table, cache_size)
+
+	return fe.compute_feature_table(flow_table, clump_timeout, active_timeout, columns)
+#=========================================
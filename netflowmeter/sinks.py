@@ -0,0 +1,432 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The output sinks of the feature rows.
+
+>csv     -> the text rows of data_to_csv (class, then the features, no
+header), appended to the output file, for compatibility.
+>parquet -> a directory of parquet files with typed columns (class,
+file, stream, protocol and the features as float64 or float32) and the
+schema in every file, read back at once with
+pyarrow.parquet.read_table(output) or pandas.read_parquet(output).
+>arrow   -> the same directory of arrow (feather v2) files, read back
+with pyarrow.dataset.dataset(output, format='arrow').
+>memmap  -> a raw matrix of the features (rows x columns, float32 by
+default) for the models to map directly, with a vector of int32 class
+codes (<output>.labels) and a json header (<output>.json) naming the
+columns and the classes, see load_memmap.
+
+>Every sink is fed with feature tables (dict of column -> array) and
+writes them in batches of at most BATCH_ROWS rows, so a whole file is
+never turned into one big frame. The position of a sink (the bytes of
+the csv, the parts of a directory, the rows of the matrix) is saved in
+the run manifest at each checkpoint and a resumed run cuts the output
+back to it (see manifest.py).
+
+>pyarrow is only needed by the parquet and arrow sinks, and pandas by
+the csv sink, and they are only imported by them (so that the runs of
+the other formats do not wait for them).
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import os
+import abc
+import json
+
+import numpy as np
+
+from . import features as fs
+#=========================================
+#=========================================
+
+##========================================
+#=============--CONSTANTS--===============
+FORMATS = ('csv', 'parquet', 'arrow', 'memmap')
+DTYPES = ('float64', 'float32')
+# the rows written at once (a row group of the parquet files)
+BATCH_ROWS = 64 * 1024
+PART_NAME = 'part-{:06d}{}'
+##========================================
+
+def import_pyarrow():
+	"""
+	Imports pyarrow, which only the parquet and arrow sinks need
+
+	return: the pyarrow module
+	"""
+
+	try:
+		import pyarrow
+	except ImportError:
+		raise ImportError('the parquet and arrow formats need pyarrow (pip install pyarrow)')
+
+	return pyarrow
+#=========================================
+
+def iter_batches(feature_table, batch_rows=BATCH_ROWS):
+	"""
+	Cuts a feature table into batches of rows
+
+	param: dict of column -> array and the rows of a batch
+
+	return: iterator of the tables of at most batch_rows rows
+	"""
+
+	rows = len(feature_table['stream']) if 'stream' in feature_table else len(next(iter(feature_table.values()), []))
+	for start in range(0, rows, batch_rows):
+		yield {column: values[start:start + batch_rows] for column, values in feature_table.items()}
+#=========================================
+
+def sync_file(path):
+	"""
+	Flushes a file to the disk
+	"""
+
+	with open(path, 'ab') as f:
+		os.fsync(f.fileno())
+#=========================================
+
+def truncate_file(path, size):
+	"""
+	Cuts a file back to a size it had before
+
+	param: the file and its size in bytes
+	"""
+
+	current = os.path.getsize(path) if os.path.exists(path) else 0
+	if current < size:
+		raise ValueError('{} is shorter than at its last checkpoint ({} < {} bytes)'.format(path, current, size))
+	if current > size:
+		with open(path, 'r+b') as f:
+			f.truncate(size)
+#=========================================
+
+class CsvSink(object):
+	"""
+	Appends the text rows (class, then the features) to a csv file
+	"""
+
+	def __init__(self, output, columns=fs.FEATURE_COLUMNS, dtype='float64', batch_rows=BATCH_ROWS):
+		"""
+		param: the output file, the feature columns, the dtype of the
+		features and the rows written at once
+		"""
+
+		self.output = output
+		self.columns = list(columns)
+		self.dtype = dtype
+		self.batch_rows = batch_rows
+
+	def get_position(self):
+		"""
+		Returns the position of the output (here its size in bytes)
+		"""
+
+		return os.path.getsize(self.output) if os.path.exists(self.output) else 0
+
+	def restore(self, position):
+		"""
+		Cuts the output back to a position of an earlier checkpoint
+		"""
+
+		truncate_file(self.output, position)
+
+	def write(self, feature_table):
+		"""
+		Appends the rows of a feature table (with its 'class' column)
+		"""
+
+		import pandas as pd
+
+		for batch in iter_batches(feature_table, self.batch_rows):
+			dict_info = {'class': batch.get('class', [])}
+			for column in self.columns:
+				dict_info[column] = np.asarray(batch.get(column, []), dtype=self.dtype)
+			pd.DataFrame(dict_info).to_csv(self.output, mode='a', index=False, header=False)
+
+	def sync(self):
+		"""
+		Flushes the rows written to the disk
+
+		return: the position of the output
+		"""
+
+		if os.path.exists(self.output):
+			sync_file(self.output)
+		return self.get_position()
+
+	def close(self):
+		"""
+		Finishes the output
+		"""
+
+		pass
+#=========================================
+
+class PartSink(abc.ABC):
+	"""
+	Writes every batch of rows as a new part file of a directory, written
+	under a temporary name and renamed once complete. The subclasses give
+	the SUFFIX of the part files and write_part (see ParquetSink and
+	ArrowSink)
+	"""
+
+	SUFFIX = ''
+
+	def __init__(self, output, columns=fs.FEATURE_COLUMNS, dtype='float64', batch_rows=BATCH_ROWS):
+		self.pa = import_pyarrow()
+		self.output = output
+		self.columns = list(columns)
+		self.dtype = dtype
+		self.batch_rows = batch_rows
+		self.schema = self.pa.schema([('class', self.pa.string()), ('file', self.pa.string()), ('stream', self.pa.int64()),
+			('protocol', self.pa.uint8())] +
+			[(column, self.pa.from_numpy_dtype(np.dtype(dtype))) for column in self.columns])
+		os.makedirs(output, exist_ok=True)
+		self.parts = self.get_position()
+
+	def get_parts(self):
+		return sorted(name for name in os.listdir(self.output) if name.startswith('part-') and name.endswith(self.SUFFIX))
+
+	def get_position(self):
+		return len(self.get_parts())
+
+	def restore(self, position):
+		parts = self.get_parts()
+		if len(parts) < position:
+			raise ValueError('{} has fewer parts than at its last checkpoint ({} < {})'.format(self.output, len(parts), position))
+		for name in parts[position:]:
+			os.remove(os.path.join(self.output, name))
+		self.parts = position
+
+	def write(self, feature_table):
+		for batch in iter_batches(feature_table, self.batch_rows):
+			arrays = [
+				self.pa.array(np.asarray(batch.get('class', []), dtype=object), type=self.pa.string()),
+				self.pa.array(np.asarray(batch.get('file', []), dtype=object), type=self.pa.string()),
+				self.pa.array(np.asarray(batch['stream'], dtype=np.int64)),
+				self.pa.array(np.asarray(batch['protocol'], dtype=np.uint8)),
+			]
+			arrays += [self.pa.array(np.asarray(batch[column], dtype=self.dtype)) for column in self.columns]
+			table = self.pa.Table.from_arrays(arrays, schema=self.schema)
+
+			# the readers of the directory skip the hidden temporary files
+			name = PART_NAME.format(self.parts, self.SUFFIX)
+			path = os.path.join(self.output, name)
+			temp_path = os.path.join(self.output, '.{}.{}.tmp'.format(name, os.getpid()))
+			self.write_part(temp_path, table)
+			sync_file(temp_path)
+			os.replace(temp_path, path)
+			self.parts += 1
+
+	@abc.abstractmethod
+	def write_part(self, path, table):
+		"""
+		Writes a pyarrow.Table to a part file
+
+		param: the path of the file and the table
+		"""
+
+	def sync(self):
+		return self.parts
+
+	def close(self):
+		pass
+#=========================================
+
+class ParquetSink(PartSink):
+	"""
+	Writes the rows to a directory of parquet files, see PartSink
+	"""
+
+	SUFFIX = '.parquet'
+
+	def write_part(self, path, table):
+		import pyarrow.parquet as pq
+		pq.write_table(table, path, row_group_size=self.batch_rows)
+#=========================================
+
+class ArrowSink(PartSink):
+	"""
+	Writes the rows to a directory of arrow (feather v2) files, see
+	PartSink
+	"""
+
+	SUFFIX = '.arrow'
+
+	def write_part(self, path, table):
+		import pyarrow.feather as feather
+		feather.write_feather(table, path, compression='uncompressed')
+#=========================================
+
+class MemmapSink(object):
+	"""
+	Appends the features to a raw matrix and the class codes to a label
+	vector, with a json header, see load_memmap
+	"""
+
+	def __init__(self, output, columns=fs.FEATURE_COLUMNS, dtype='float32', batch_rows=BATCH_ROWS):
+		self.output = output
+		self.labels_file = output + '.labels'
+		self.header_file = output + '.json'
+		self.columns = list(columns)
+		self.dtype = np.dtype(dtype)
+		self.batch_rows = batch_rows
+
+		self.classes = []
+		self.rows = 0
+		if os.path.exists(self.header_file):
+			with open(self.header_file) as f:
+				header = json.load(f)
+			if header['columns'] != self.columns or header['dtype'] != self.dtype.name:
+				raise ValueError('{} holds other columns or another dtype, use another --output'.format(output))
+			self.classes = header['classes']
+			self.rows = header['rows']
+		elif os.path.exists(output):
+			raise ValueError('{} exists without its header {}, use another --output'.format(output, self.header_file))
+
+		# the rows written after the last header are dropped
+		truncate_file(self.output, self.rows * len(self.columns) * self.dtype.itemsize)
+		truncate_file(self.labels_file, self.rows * np.dtype(np.int32).itemsize)
+
+	def get_position(self):
+		return self.rows
+
+	def restore(self, position):
+		if self.rows < position:
+			raise ValueError('{} has fewer rows than at its last checkpoint ({} < {})'.format(self.output, self.rows, position))
+		truncate_file(self.output, position * len(self.columns) * self.dtype.itemsize)
+		truncate_file(self.labels_file, position * np.dtype(np.int32).itemsize)
+		self.rows = position
+		self.save_header()
+
+	def write(self, feature_table):
+		codes = {label: code for code, label in enumerate(self.classes)}
+
+		with open(self.output, 'ab') as data_f, open(self.labels_file, 'ab') as labels_f:
+			for batch in iter_batches(feature_table, self.batch_rows):
+				matrix = np.empty((len(batch['stream']), len(self.columns)), dtype=self.dtype)
+				for index, column in enumerate(self.columns):
+					matrix[:, index] = batch[column]
+				labels = np.array([codes.setdefault(label, len(codes)) for label in batch['class']], dtype=np.int32)
+
+				matrix.tofile(data_f)
+				labels.tofile(labels_f)
+				self.rows += len(labels)
+
+		self.classes = list(codes)
+
+	def save_header(self):
+		header = {
+			'columns': self.columns,
+			'dtype': self.dtype.name,
+			'classes': self.classes,
+			'rows': self.rows,
+		}
+		temp_file = self.header_file + '.{}.tmp'.format(os.getpid())
+		with open(temp_file, 'w') as f:
+			json.dump(header, f, indent=1)
+			f.flush()
+			os.fsync(f.fileno())
+		os.replace(temp_file, self.header_file)
+
+	def sync(self):
+		for path in (self.output, self.labels_file):
+			if os.path.exists(path):
+				sync_file(path)
+		self.save_header()
+		return self.rows
+
+	def close(self):
+		pass
+#=========================================
+
+def get_output_files(output, format='csv'):
+	"""
+	Lists the files of an output which are there
+
+	param: the output file (or directory for parquet and arrow) and its
+	format (see FORMATS)
+
+	return: list of the paths
+	"""
+
+	if format in ('parquet', 'arrow'):
+		if not os.path.isdir(output):
+			return []
+		suffix = '.' + format
+		return [os.path.join(output, name) for name in sorted(os.listdir(output))
+			if name.startswith('part-') and name.endswith(suffix)]
+
+	paths = [output]
+	if format == 'memmap':
+		paths += [output + '.labels', output + '.json']
+
+	return [path for path in paths if os.path.exists(path)]
+#=========================================
+
+def remove_output(output, format='csv'):
+	"""
+	Removes the files of an output, for a run which replaces it
+
+	param: the output and its format, see get_output_files
+	"""
+
+	for path in get_output_files(output, format):
+		os.remove(path)
+#=========================================
+
+def get_sink(output, format='csv', columns=fs.FEATURE_COLUMNS, dtype=None, batch_rows=BATCH_ROWS):
+	"""
+	Makes the sink of an output
+
+	param: the output file (or directory for parquet and arrow), the
+	format (see FORMATS), the feature columns, the dtype of the features
+	(None -> float32 for memmap, float64 for the others) and the rows
+	written at once
+
+	return: the sink
+	"""
+
+	sinks = {
+		'csv': CsvSink,
+		'parquet': ParquetSink,
+		'arrow': ArrowSink,
+		'memmap': MemmapSink,
+	}
+	if format not in sinks:
+		raise ValueError('unknown format {}, expected one of {}'.format(format, FORMATS))
+	if dtype is None:
+		dtype = 'float32' if format == 'memmap' else 'float64'
+
+	return sinks[format](output, columns, dtype, batch_rows)
+#=========================================
+
+def load_memmap(output):
+	"""
+	Maps the output of a memmap sink, without reading it
+
+	param: the output file of the memmap sink
+
+	return: tuple of (the features matrix as a read only np.memmap, the
+	vector of the class codes, the list of the columns and the list of
+	the classes, indexed by their code)
+	"""
+
+	with open(output + '.json') as f:
+		header = json.load(f)
+
+	shape = (header['rows'], len(header['columns']))
+	if header['rows'] == 0:
+		return (np.empty(shape, dtype=header['dtype']), np.empty(0, dtype=np.int32), header['columns'], header['classes'])
+
+	matrix = np.memmap(output, dtype=header['dtype'], mode='r', shape=shape)
+	labels = np.memmap(output + '.labels', dtype=np.int32, mode='r', shape=(header['rows'],))
+
+	return (matrix, labels, header['columns'], header['classes'])
+#=========================================
@@ -0,0 +1,220 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The quantile sketch, which gives the median, p90 and p99 (QUANTILES)
+of a series of values in a fixed memory, for the flows of the streaming
+mode (see streaming.FlowState), like the accumulators.py file does for
+the min, max, mean and std.
+
+>It is a KLL sketch (Karnin, Lang and Liberty, 2016). The values go
+into a stack of levels, a value of level h standing for 2**h values of
+the series. A full level is sorted and every other value of it moves
+up a level, so the sketch keeps about 3 * k values whatever the length
+of the series, and the rank of a quantile is off by about
+ERROR_FACTOR / k of the count at most (see get_sketch_size). A series
+of up to k values is kept whole, so its quantiles are exact.
+
+>Two sketches of the parts of a series merge into the sketch of the
+whole series, with the same error bound (e.g. the flows carried across
+the files of a chain, or the chunks processed in parallel).
+
+>The quantile of a series of n values is its value of rank ceil(q * n)
+(the smallest value with at least a q share of the series at or below
+it), the same as kernels.segment_quantiles gives in the batch mode.
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import math
+from bisect import bisect_left
+from itertools import accumulate
+#=========================================
+#=========================================
+
+##========================================
+#=============--CONSTANTS--===============
+# the quantiles of the optional feature columns -> (suffix, quantile)
+QUANTILES = [('p50', 0.5), ('p90', 0.9), ('p99', 0.99)]
+# the default rank error of the sketches (a share of the count)
+ERROR = 0.01
+# the largest rank error of a sketch of size k is about ERROR_FACTOR / k
+# (measured on sorted, reversed, uniform and exponential series of 10**3
+# to 10**6 values)
+ERROR_FACTOR = 2.0
+# the capacity of a level shrinks by this factor for every level above it
+DECAY = 2 / 3
+##========================================
+
+def get_sketch_size(error=ERROR):
+	"""
+	Returns the size k of the sketches which give the quantiles within a
+	rank error
+
+	param: the rank error, as a share of the count (e.g. 0.01 -> the p90
+	is a value between the p89 and the p91)
+
+	return: (int) k
+	"""
+
+	if not 0 < error < 1:
+		raise ValueError('the quantile error must be between 0 and 1, got {}'.format(error))
+
+	return max(8, int(math.ceil(ERROR_FACTOR / error)))
+#=========================================
+
+def get_quantile_columns(name):
+	"""
+	Names the quantile columns of a series (e.g. 'fwd' -> fwd_p50,
+	fwd_p90, fwd_p99)
+
+	return: list of the column names, in the order of QUANTILES
+	"""
+
+	return ['{}_{}'.format(name, suffix) for suffix, quantile in QUANTILES]
+#=========================================
+
+class QuantileSketch(object):
+	"""
+	The KLL sketch of a series of values
+	"""
+
+	__slots__ = ('k', 'count', 'size', 'limit', 'levels', 'flips')
+
+	def __init__(self, k=None):
+		"""
+		param: the size of the sketch (None -> the one of ERROR, see
+		get_sketch_size)
+		"""
+
+		self.k = k if k is not None else get_sketch_size()
+		self.count = 0
+		# the values kept in all the levels, and the size at which the
+		# sketch is compressed
+		self.size = 0
+		self.levels = [[]]
+		self.limit = self.get_limit()
+		# bit h -> the offset of the next compaction of the level h
+		self.flips = 0
+
+	def get_capacity(self, level):
+		"""
+		Returns the number of values at which a level is compacted, the
+		top level holding k values and every level below it DECAY times
+		less (and at least 2)
+		"""
+
+		return int(self.k * DECAY ** (len(self.levels) - level - 1)) + 2
+
+	def get_limit(self):
+		"""
+		Returns the number of values at which the sketch is compressed
+		"""
+
+		return sum(self.get_capacity(level) for level in range(len(self.levels)))
+
+	def add(self, value):
+		"""
+		Adds a value to the series
+		"""
+
+		self.levels[0].append(value)
+		self.count += 1
+		self.size += 1
+
+		if self.size >= self.limit:
+			self.compress()
+
+	def compress(self):
+		"""
+		Compacts the full levels, from the bottom up, until the sketch is
+		under its limit again
+		"""
+
+		for level in range(len(self.levels)):
+			values = self.levels[level]
+			if len(values) < self.get_capacity(level):
+				continue
+
+			if level + 1 == len(self.levels):
+				self.levels.append([])
+				self.limit = self.get_limit()
+
+			# every other value of the sorted level moves up with twice the
+			# weight, starting from the first or the second one in turn, so
+			# that the rank errors of the compactions cancel out
+			values.sort()
+			offset = (self.flips >> level) & 1
+			self.flips ^= 1 << level
+			paired = len(values) & ~1
+			self.levels[level + 1].extend(values[offset:paired:2])
+			# an odd value out (the largest) stays in the level
+			self.levels[level] = values[paired:]
+			self.size -= paired // 2
+
+			if self.size < self.limit:
+				break
+
+	def merge(self, other):
+		"""
+		Adds all the values of the other sketch to this one (the size k of
+		this sketch is kept)
+		"""
+
+		if other.count == 0:
+			return
+
+		while len(self.levels) < len(other.levels):
+			self.levels.append([])
+		for level, values in enumerate(other.levels):
+			self.levels[level].extend(values)
+
+		self.count += other.count
+		self.size += other.size
+		self.limit = self.get_limit()
+
+		while self.size >= self.limit:
+			self.compress()
+
+	def copy(self):
+		"""
+		Returns a copy of the sketch
+		"""
+
+		copy = QuantileSketch(self.k)
+		copy.count = self.count
+		copy.size = self.size
+		copy.levels = [list(values) for values in self.levels]
+		copy.limit = self.limit
+		copy.flips = self.flips
+
+		return copy
+
+	def result(self, quantiles=QUANTILES, empty=0):
+		"""
+		Returns the quantiles of the series, or empty when there are no
+		values
+
+		param: list of (suffix, quantile), see QUANTILES
+
+		return: tuple of the values, in the order of the quantiles
+		"""
+
+		if self.count == 0:
+			return tuple(empty for suffix, quantile in quantiles)
+
+		if len(self.levels) == 1:
+			values = sorted(self.levels[0])
+			ranks = range(1, len(values) + 1)
+		else:
+			weighted = sorted((value, 1 << level) for level, values in enumerate(self.levels) for value in values)
+			values = [value for value, weight in weighted]
+			ranks = list(accumulate(weight for value, weight in weighted))
+
+		last = len(values) - 1
+
+		return tuple(values[min(bisect_left(ranks, quantile * self.count), last)] for suffix, quantile in quantiles)
+#=========================================
@@ -36,12 +36,18 @@ which add up to 23 total features, that can be used for further processing, anal
 or for machine learning purposes.
 -=========================================================
 """
+from itertools import islice
+
 import numpy as np
 # import pandas as pd
 
+import struct
 import subprocess as sp
 # import pyshark
-import segregate as seg
+from . import segregate as seg
+from . import stream_index as si
+from . import accumulators as acc
+from . import instrument as im
 #=========================================
 #=========================================
 
@@ -55,15 +61,55 @@ def get_total_flows(pcapfile):
 	"""
 	Gives the total number of flows in a pcapfile. Only the flows count,
 	not the flows themselves.
+
+	>the count comes from the stream index of the file (see
+	stream_index.py), which is built once and saved next to the file
 	
 	param: The pcap file to parse
 	return: (int) The number of flows/streams
 	"""
 
-	command = 'tshark -qz conv,tcp -r {} | wc -l'.format(pcapfile)
-	flows = sp.getoutput(command)
+	index = si.get_stream_index(pcapfile)
+
+	return len(index['stream'])
+#=========================================
+
+def get_stream_fields(file, stream_no, fields, separator=None):
+	"""
+	Returns the tshark output lines of one stream of the file.
+
+	>the packets of the stream are decoded from their offsets in the
+	stream index of the file (see stream_index.get_stream_lines), so only
+	the records of the stream are read. Otherwise (other fields, a file
+	the native reader cannot read) tshark is run with the arguments as a
+	list, without a shell, so the file name needs no quoting.
 
-	return (int(flows) - 6)
+	param: file, stream number, list of the fields to print and the
+	separator of the fields (None -> tshark's tab)
+
+	return: list of the lines, one per packet
+	"""
+
+	try:
+		lines = si.get_stream_lines(file, int(stream_no), fields, separator)
+	except (OSError, ValueError, struct.error):
+		# e.g. a truncated file, which tshark may still read
+		lines = None
+	if lines is not None:
+		return lines
+
+	# -E occurrence=f keeps only the outer ip header for tunnelled packets
+	# (like the native reader)
+	command = ['tshark', '-r', file, '-Y', 'tcp.stream eq {}'.format(int(stream_no)), '-T', 'fields', '-E', 'occurrence=f']
+	for field in fields:
+		command += ['-e', field]
+	if separator is not None:
+		command += ['-E', 'separator={}'.format(separator)]
+
+	with im.timed('tshark'):
+		out = sp.run(command, stdout=sp.PIPE, stderr=sp.DEVNULL, universal_newlines=True).stdout
+
+	return out.splitlines()
 #=========================================
 
 def get_flow_duration(file, stream_no):
@@ -76,10 +122,7 @@ def get_flow_duration(file, stream_no):
 	"""
 
 	#Flow duration
-	command = 'tshark -r {} -Y "tcp.stream eq {}" -T fields -e frame.time_relative'.format(file, stream_no)
-	temp_str = sp.getoutput(command)
-
-	dur_list = temp_str.split('\n')
+	dur_list = get_stream_fields(file, stream_no, ['frame.time_relative'])
 	time1 = float(dur_list[0])
 	time2 = float(dur_list[-1])
 
@@ -98,10 +141,7 @@ def get_flow_bytes(file, stream_no):
 	"""
 
 	# total flow bytes
-	command = 'tshark -r {} -Y "tcp.stream eq {}" -T fields -e frame.len'.format(file, stream_no)
-	temp_str = sp.getoutput(command)
-
-	bytes_list = temp_str.split('\n')
+	bytes_list = get_stream_fields(file, stream_no, ['frame.len'])
 	acc = 0
 	for item in bytes_list:
 		acc += int(item)
@@ -118,10 +158,8 @@ def get_flow_packets(file, stream_no):
 	return: (float) total packets in the flow
 	"""
 
-	command = 'tshark -r {} -Y "tcp.stream eq {}" -T fields -e frame.len | wc -l'.format(file, stream_no)
-	temp_str = sp.getoutput(command)
-
-	return int(temp_str)
+	# one line per packet (like | wc -l)
+	return len(get_stream_fields(file, stream_no, ['frame.len']))
 #=========================================
 
 def get_fwd_rev_flow_iat(file, stream_no):
@@ -137,80 +175,43 @@ def get_fwd_rev_flow_iat(file, stream_no):
 
 	"""
 
-	super_list = seg.seg_flow_pkts(file, stream_no)
-
-	fwd = super_list[0]
-	rev = super_list[1]
+	flow = seg.get_flow(file, stream_no)
 
-	fwd_list = []
-	rev_list = []
-
-	for i in fwd:
-		s, d, time = i.split(',')
-		fwd_list.append(float(time))
-
-	for i in rev:
-		s, d, time = i.split(',')
-		rev_list.append(float(time))
-
-	fwd_iat_list = [t-s for s,t in zip(fwd_list, fwd_list[1:])]
-	rev_iat_list = [t-s for s,t in zip(rev_list, rev_list[1:])]
-
-	flow_iat_list = []
-	for (f,r) in zip(fwd_list, rev_list):
-		flow_iat_list.append(f-r)
-
-
-	#-----Forward packets iat stats
-	fwd_min_iat = 0
-	fwd_max_iat = 0
-	fwd_mean_iat = 0
-	fwd_std_iat = 0
-
-
-	#-----Backward packets iat stats
-	rev_min_iat = 0
-	rev_max_iat = 0
-	rev_mean_iat = 0
-	rev_std_iat = 0
+	# the fwd and rev times are views of the flow arrays, no parsing
+	return get_iat_info_from_times(flow.fwd_time.tolist(), flow.rev_time.tolist())
+#=========================================
 
+def get_iat_info_from_times(fwd_list, rev_list):
+	"""
+	Takes the forward and the reverse packet times of a flow and
+	returns the list containing the statistics like min, max,
+	mean and std of the fwd, rev and flow iats
 
-	#-----Flow packets iat stats
-	flow_min_iat = 0
-	flow_max_iat = 0
-	flow_mean_iat = 0
-	flow_std_iat = 0
+	param: list of fwd packet times and list of rev packet times
 
+	return: list containing tuples of [(fwd), (rev), (flow)], where each ()
+	has min, max, mean and std
+	"""
 
-	fwd_min_iat = min(fwd_iat_list, default=0)
-	fwd_max_iat = max(fwd_iat_list, default=0)
-	if(len(fwd_iat_list) == 0):
-		fwd_mean_iat = 0
-		fwd_std_iat = 0
-	else:
-		fwd_mean_iat = np.mean(fwd_iat_list)
-		fwd_std_iat = np.std(fwd_iat_list)
+	#-----Forward, backward and flow packets iat stats
+	fwd_iat = acc.RunningStats()
+	rev_iat = acc.RunningStats()
+	flow_iat = acc.RunningStats()
 
-	
-	rev_min_iat = min(rev_iat_list, default=0)
-	rev_max_iat = max(rev_iat_list, default=0)
-	if(len(rev_iat_list) == 0):
-		rev_mean_iat = 0
-		rev_std_iat = 0
-	else:
-		rev_mean_iat = np.mean(rev_iat_list)
-		rev_std_iat = np.std(rev_iat_list)
+	for s,t in zip(fwd_list, islice(fwd_list, 1, None)):
+		fwd_iat.add(t-s)
 
+	for s,t in zip(rev_list, islice(rev_list, 1, None)):
+		rev_iat.add(t-s)
 
-	flow_min_iat = min(flow_iat_list, default=0)
-	flow_max_iat = max(flow_iat_list, default=0)
-	flow_mean_iat = np.mean(flow_iat_list)
-	flow_std_iat = np.std(flow_iat_list)
+	for (f,r) in zip(fwd_list, rev_list):
+		flow_iat.add(f-r)
 
 
-	fwd_info = (fwd_min_iat, fwd_max_iat, fwd_mean_iat, fwd_std_iat)
-	rev_info = (rev_min_iat, rev_max_iat, rev_mean_iat, rev_std_iat)
-	flow_info = (flow_min_iat, flow_max_iat, flow_mean_iat, flow_std_iat)
+	fwd_info = fwd_iat.result()
+	rev_info = rev_iat.result()
+	# the mean and std of no flow iats are nan (as np.mean([]) is)
+	flow_info = flow_iat.result(empty=(0, 0, np.nan, np.nan))
 
 	flow_info_list = [fwd_info, rev_info, flow_info]
 
@@ -265,16 +266,28 @@ def get_active_info(file, stream_no):
 	return: the tuple(min, max, mean, std) 
 	"""
 
-	command = 'tshark -r {} -Y "tcp.stream eq {}" -T fields -e frame.time_relative'.format(file, stream_no)
-	temp_str = sp.getoutput(command)
-	flow_str = temp_str.split('\n')
-
-	active_times_list = []
+	flow_str = get_stream_fields(file, stream_no, ['frame.time_relative'])
 
 	flow_times = []
 	for string in flow_str:
 		flow_times.append(float(string))
 
+	return get_active_info_from_times(flow_times)
+#=========================================
+
+def get_active_info_from_times(flow_times):
+	"""
+	Takes the packet times of a flow (in the capture order) and
+	returns the tuple of (min, max, mean, std) for the active
+	times of the flow
+
+	param: list of the flow packet times
+
+	return: the tuple(min, max, mean, std) 
+	"""
+
+	active_times = acc.RunningStats()
+
 	start_active = 0
 	last_active = 0
 	last_timestamp = flow_times[0]
@@ -288,7 +301,7 @@ def get_active_info(file, stream_no):
 				if current_time > ACTIVE_TIMEOUT:
 					duration = abs(last_active - start_active)
 					if duration >= 0:	
-						active_times_list.append(current_time - last_active)
+						active_times.add(current_time - last_active)
 
 					last_active = current_time
 					start_active = current_time
@@ -297,13 +310,10 @@ def get_active_info(file, stream_no):
 
 			last_timestamp = flow_times[index + 1]
 		except:
-			active_times_list.append(0)
+			active_times.add(0)
 
     #==========
-	active_time_min = min(active_times_list)
-	active_time_max = max(active_times_list)
-	active_time_mean = np.mean(active_times_list)
-	active_time_std = np.std(active_times_list)
+	active_time_min, active_time_max, active_time_mean, active_time_std = active_times.result()
 
 	return(active_time_min, active_time_max, active_time_mean, active_time_std)
 
@@ -322,16 +332,28 @@ def get_idle_info(file, stream_no):
 	"""
 
 	##==============
-	command = 'tshark -r {} -Y "tcp.stream eq {}" -T fields -e frame.time_relative'.format(file, stream_no)
-	temp_str = sp.getoutput(command)
-	flow_str = temp_str.split('\n')
-
-	idle_times_list = []
+	flow_str = get_stream_fields(file, stream_no, ['frame.time_relative'])
 
 	flow_times = []
 	for string in flow_str:
 		flow_times.append(float(string))
 
+	return get_idle_info_from_times(flow_times)
+#=========================================
+
+def get_idle_info_from_times(flow_times):
+	"""
+	Takes the packet times of a flow (in the capture order) and
+	returns the tuple of (min, max, mean, std) for the idle
+	times of the flow
+
+	param: list of the flow packet times
+
+	return: the tuple(min, max, mean, std) 
+	"""
+
+	idle_times = acc.RunningStats()
+
 	last_active = 0
 	last_timestamp = flow_times[0]
 
@@ -340,11 +362,11 @@ def get_idle_info(file, stream_no):
 			current_time = flow_times[index + 1] - last_timestamp
 			if flow_times[index + 1] - last_timestamp > CLUMP_TIMEOUT:
 				if current_time > ACTIVE_TIMEOUT:	
-					idle_times_list.append(current_time - last_active)
+					idle_times.add(current_time - last_active)
 					last_active = current_time
 				
 			else:
-				idle_times_list.append(0)
+				idle_times.add(0)
 				last_active = current_time
 
 			last_timestamp = flow_times[index + 1]
@@ -352,10 +374,8 @@ def get_idle_info(file, stream_no):
 			continue
 
     #==========
-	idle_time_min = min(idle_times_list)
-	idle_time_max = max(idle_times_list)
-	idle_time_mean = np.mean(idle_times_list)
-	idle_time_std = np.std(idle_times_list)
+	# a single packet flow has no idle times -> all 0
+	idle_time_min, idle_time_max, idle_time_mean, idle_time_std = idle_times.result()
 
 	return(idle_time_min, idle_time_max, idle_time_mean, idle_time_std)
 
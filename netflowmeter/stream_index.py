@@ -0,0 +1,231 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The stream index of a pcap file -> every tcp stream with its packet
+count, bytes, first/last packet time and the byte offsets of its first
+and last packet in the file, found in one pass of the native reader.
+
+>The index also maps every stream to the offsets of all its packets ->
+a sorted array of the offsets of the packet data, grouped by the stream
+(the packets of a stream from its 'packet_start', in the capture order),
+with the reading state of the file. A single stream is then decoded by
+seeking to its records only (get_stream_packets), so the queries of one
+flow cost its size instead of the size of the file. The per stream
+getters of the statistics.py file and segregate.get_flow use it
+instead of a tshark pass over the whole file with 'tcp.stream eq N'.
+
+>The index is saved next to the pcap file (<file>.streams.npz) and
+reused as long as the size and the modification time of the file are
+the same, so the later runs do not enumerate the streams again.
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import os
+import json
+import mmap
+import socket
+
+import numpy as np
+
+from . import pcap_reader as pr
+#=========================================
+#=========================================
+
+##========================================
+#=============--CONSTANTS--===============
+INDEX_SUFFIX = '.streams.npz'
+# bump when the columns or their meaning change
+INDEX_VERSION = 2
+INDEX_COLUMNS = ['stream', 'packets', 'bytes', 'first_time', 'last_time', 'first_offset', 'last_offset', 'packet_start']
+# the tshark fields which get_stream_lines decodes from the file
+SEEK_FIELDS = ('tcp.stream', 'ip.src', 'ip.dst', 'ipv6.src', 'ipv6.dst', 'tcp.srcport', 'tcp.dstport',
+	'frame.time_relative', 'frame.len')
+##========================================
+
+def build_stream_index(file):
+	"""
+	Finds all the tcp streams of the file in a single pass
+
+	param: the pcap file
+
+	return: dict of the INDEX_COLUMNS -> array with one entry per stream,
+	sorted by the stream number, 'packet_offset' -> the offsets of the
+	packets grouped by the stream, and 'state' -> the reading state of
+	the file (see pcap_reader.read_packet_table)
+	"""
+
+	state = {}
+	table = pr.read_packet_table(file, offsets=True, state=state)
+
+	order = np.argsort(table['stream'], kind='stable')
+	streams, starts, packets = np.unique(table['stream'][order], return_index=True, return_counts=True)
+	first = order[starts]
+	last = order[starts + packets - 1]
+
+	index = {
+		'stream': streams,
+		'packets': packets,
+		'bytes': np.add.reduceat(table['length'][order], starts) if len(streams) else np.zeros(0, dtype=np.int64),
+		'first_time': table['time'][first],
+		'last_time': table['time'][last],
+		'first_offset': table['offset'][first],
+		'last_offset': table['offset'][last],
+		'packet_start': starts.astype(np.int64),
+		'packet_offset': table['offset'][order],
+		'state': state,
+	}
+
+	# the interfaces of a pcapng file are only known for its last section,
+	# and a compressed file cannot be seeked into
+	if state['compression'] is not None or state['sections'] > 1:
+		index['packet_offset'] = None
+
+	return index
+#=========================================
+
+def get_file_stamp(file):
+	"""
+	Returns the (size, mtime in ns, index version) of the file, which
+	decides if a saved index is still valid
+	"""
+
+	stat = os.stat(file)
+
+	return np.array([stat.st_size, stat.st_mtime_ns, INDEX_VERSION], dtype=np.int64)
+#=========================================
+
+def get_stream_index(file):
+	"""
+	Returns the stream index of the file, from the saved index when it
+	is valid, otherwise it is built and saved next to the file
+
+	param: the pcap file
+
+	return: dict of the INDEX_COLUMNS -> array, 'packet_offset' (None if
+	the packets cannot be read by their offsets) and 'state', see
+	build_stream_index
+	"""
+
+	index_file = file + INDEX_SUFFIX
+	stamp = get_file_stamp(file)
+
+	if os.path.exists(index_file):
+		try:
+			with np.load(index_file) as saved:
+				if np.array_equal(saved['stamp'], stamp):
+					index = {column: saved[column] for column in INDEX_COLUMNS}
+					index['state'] = json.loads(str(saved['state']))
+					index['packet_offset'] = saved['packet_offset'] if index['state']['seekable'] else None
+					return index
+		except (OSError, KeyError, ValueError):
+			pass
+
+	index = build_stream_index(file)
+
+	# write to a temporary file first, so that a crash never leaves a
+	# half written index; a read only directory just means no caching
+	try:
+		temp_file = index_file + '.{}.tmp'.format(os.getpid())
+		state = dict(index['state'], seekable=index['packet_offset'] is not None)
+		with open(temp_file, 'wb') as f:
+			np.savez(f, stamp=stamp, state=np.array(json.dumps(state)),
+				packet_offset=index['packet_offset'] if state['seekable'] else np.zeros(0, dtype=np.int64),
+				**{column: index[column] for column in INDEX_COLUMNS})
+		os.replace(temp_file, index_file)
+	except OSError:
+		pass
+
+	return index
+#=========================================
+
+def get_stream_packets(file, stream_no):
+	"""
+	Decodes the tcp packets of one stream, by seeking to their records
+	with the stream index of the file
+
+	param: the pcap file and the stream number
+
+	return: dict of the lists 'src' and 'dst' (ip addresses, as bytes),
+	'sport' and 'dport' (tcp ports), 'time' (frame.time_relative, in ns) and 'length' (frame.len) in the
+	capture order, or None if the packets of the file cannot be read by
+	their offsets (a compressed file or a pcapng file of several
+	sections)
+	"""
+
+	index = get_stream_index(file)
+	if index['packet_offset'] is None:
+		return None
+
+	packets = {'src': [], 'dst': [], 'sport': [], 'dport': [], 'time': [], 'length': []}
+	position = np.searchsorted(index['stream'], stream_no)
+	if position == len(index['stream']) or index['stream'][position] != stream_no:
+		return packets
+
+	start = index['packet_start'][position]
+	offsets = index['packet_offset'][start:start + index['packets'][position]]
+	state = index['state']
+
+	with open(file, 'rb') as f:
+		buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+		try:
+			for offset in offsets.tolist():
+				ts, orig_len, linktype, offset, caplen = pr.read_record(buf, offset, state)
+				pkt = pr.decode_packet(buf, offset, caplen, linktype)
+
+				packets['src'].append(pkt[0])
+				packets['dst'].append(pkt[1])
+				packets['sport'].append(pkt[4])
+				packets['dport'].append(pkt[5])
+				packets['time'].append(ts - state['first_ts'])
+				packets['length'].append(orig_len)
+		finally:
+			buf.close()
+
+	return packets
+#=========================================
+
+def get_stream_lines(file, stream_no, fields, separator=None):
+	"""
+	Returns the lines of the tshark output of the fields of one stream
+	(see statistics.get_stream_fields), decoded from the file with the
+	stream index instead of running tshark
+
+	param: the pcap file, the stream number, the list of the fields (of
+	SEEK_FIELDS) and the separator of the fields (None -> tab)
+
+	return: list of str, one line per packet, or None if the fields or
+	the file cannot be read this way
+	"""
+
+	if any(field not in SEEK_FIELDS for field in fields):
+		return None
+
+	packets = get_stream_packets(file, stream_no)
+	if packets is None:
+		return None
+
+	def get_address(address, version):
+		if len(address) != version:
+			return ''
+		return socket.inet_ntop(socket.AF_INET if version == 4 else socket.AF_INET6, address)
+
+	columns = {
+		'tcp.stream': [str(stream_no)] * len(packets['time']),
+		'ip.src': [get_address(address, 4) for address in packets['src']],
+		'ip.dst': [get_address(address, 4) for address in packets['dst']],
+		'ipv6.src': [get_address(address, 16) for address in packets['src']],
+		'ipv6.dst': [get_address(address, 16) for address in packets['dst']],
+		'tcp.srcport': [str(port) for port in packets['sport']],
+		'tcp.dstport': [str(port) for port in packets['dport']],
+		'frame.time_relative': ['{:.9f}'.format(time / 1e9) for time in packets['time']],
+		'frame.len': [str(length) for length in packets['length']],
+	}
+
+	return [(separator or '\t').join(values) for values in zip(*[columns[field] for field in fields])]
+#=========================================
@@ -0,0 +1,758 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The streaming mode, for the captures which are larger than the memory.
+The packets are read one by one (from the stdout pipe of tshark or from
+the native reader) and every open flow keeps only a small state ->
+the online statistics (accumulators.py) of its iat, active and idle
+times, the last packet times, and at most MAX_PENDING packet times
+waiting for their 'flow iat' pair (see FlowState).
+
+>A flow is finished and its features are emitted when it is closed
+(RST, or FIN from both sides, after a short linger for the last ACKs)
+or when it has been inactive for the flow timeout, like CICFlowMeter
+does. The memory is then bounded by the number of flows open at the
+same time, not by the size of the capture.
+
+>The optional quantile features (see features.py) come from a
+sketch per series of the flow (sketches.py), so they take a fixed
+memory per flow too. They are exact for the series of up to k values,
+and within the rank error of the sketches otherwise.
+
+>The features are the same as the ones of get_fwd_rev_flow_iat,
+get_active_info and get_idle_info in the statistics.py file, as long
+as no stream is cut. The batch mode keeps a tcp stream whole, while
+the streaming mode cuts it into several flows when a packet comes more
+than the flow timeout after the previous one (flow_timeout=None never
+cuts), or more than the close linger after the RST or the FINs of both
+sides. Every part is then a flow of its own, with a new stream number
+(see StreamingFlowTable), so the streams after the first cut are also
+numbered differently from the batch mode.
+
+>The udp and icmp flows (see pcap_reader.PROTOCOLS) are read in the
+same pass, numbered by pcap_reader.FlowTracker with the flow timeout, so
+they are the same flows as the ones of flow_engine.get_feature_table.
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import subprocess as sp
+import tempfile
+from collections import deque, OrderedDict
+
+import numpy as np
+
+from . import statistics as st
+from . import pcap_reader as pr
+from . import flow_engine as fe
+from . import features as fs
+from . import accumulators as acc
+from . import sketches as qs
+from . import instrument as im
+#=========================================
+#=========================================
+
+##========================================
+#=============--CONSTANTS--===============
+# seconds of inactivity after which a flow is finished
+FLOW_TIMEOUT = pr.FLOW_TIMEOUT
+# seconds a closed flow (RST or FIN both ways) waits for its last packets
+CLOSE_LINGER = 5
+
+# the most packet times of a flow waiting in the queue of the 'flow iat'
+# pairs (see FlowState), so a one-sided flow keeps a bounded state
+MAX_PENDING = 4096
+
+TCP_FIN = 0x01
+TCP_RST = 0x04
+
+# the series of a flow with a quantile sketch -> the fwd, rev and flow
+# iat, the active and idle times and the packet lengths
+SKETCHES = ('fwd', 'rev', 'flow', 'active', 'idle', 'size')
+
+# the characters of the end of the stderr of tshark kept in its errors
+STDERR_TAIL = 2000
+
+# the fields exported by tshark for every packet, in this order
+TSHARK_FIELDS = ['tcp.stream', 'ip.src', 'ip.dst', 'ipv6.src', 'ipv6.dst', 'frame.time_epoch', 'frame.len', 'tcp.flags',
+	'tcp.srcport', 'tcp.dstport', 'udp.srcport', 'udp.dstport', 'icmp.type', 'icmpv6.type']
+##========================================
+
+class FlowState(object):
+	"""
+	The state of one open flow. Every packet updates it in O(1), in the
+	same way as the loops of the statistics.py file go over the packets:
+
+	>forward packets have the src endpoint (ip, port) of the first
+	packet, all the others are backward packets
+
+	>the 'flow iat' pairs the k-th forward and the k-th backward packet,
+	so the times of the direction which is ahead wait in a queue. The
+	queue holds MAX_PENDING times at most, the later packets of that
+	direction are only counted, and their pairs are left out of the flow
+	iat (an approximation of statistics.py for the flows which have more
+	than MAX_PENDING packets of a direction ahead of the other one)
+
+	>the gaps between packets give the active and idle times, with the
+	last clump gap ('last_active') carried from packet to packet
+
+	>with a sketch size, every value of the SKETCHES series also goes into
+	its quantile sketch
+	"""
+
+	__slots__ = ('stream', 'protocol', 'first_src', 'first_time', 'last_time', 'packets', 'bytes',
+		'fwd_last', 'rev_last', 'fwd_iat', 'rev_iat', 'pair_iat', 'fwd_pending', 'rev_pending',
+		'fwd_dropped', 'rev_dropped', 'last_active', 'active', 'idle', 'fin', 'closed', 'sketches')
+
+	def __init__(self, src, time, protocol=pr.IPPROTO_TCP, sketch_size=None, stream=None):
+		"""
+		param: the src endpoint and the time of the first packet, the ip
+		protocol, the size k of the quantile sketches (None -> no
+		sketches) and the stream number of the flow
+		"""
+
+		self.stream = stream
+		self.protocol = protocol
+		self.first_src = src
+		self.first_time = time
+		self.last_time = time
+		self.packets = 0
+		self.bytes = 0
+		self.fwd_last = None
+		self.rev_last = None
+		self.fwd_iat = acc.RunningStats()
+		self.rev_iat = acc.RunningStats()
+		self.pair_iat = acc.RunningStats()
+		self.fwd_pending = deque()
+		self.rev_pending = deque()
+		# the packets of a direction ahead of the queue, after its times
+		self.fwd_dropped = 0
+		self.rev_dropped = 0
+		self.last_active = 0
+		self.active = acc.RunningStats()
+		self.idle = acc.RunningStats()
+		self.fin = set()
+		self.closed = False
+		self.sketches = None
+		if sketch_size is not None:
+			self.sketches = {name: qs.QuantileSketch(sketch_size) for name in SKETCHES}
+
+	def add_packet(self, src, time, length, clump_timeout=st.CLUMP_TIMEOUT, active_timeout=st.ACTIVE_TIMEOUT):
+		"""
+		Updates the flow with a packet
+
+		param: the src endpoint, the time and the length of the packet, and the
+		two timeouts of the active and idle times
+		"""
+
+		sketches = self.sketches
+		if sketches is not None:
+			sketches['size'].add(length)
+
+		if self.packets:
+			gap = time - self.last_time
+			if gap > clump_timeout:
+				if gap > active_timeout:
+					self.active.add(gap - self.last_active)
+					self.idle.add(gap - self.last_active)
+					if sketches is not None:
+						sketches['active'].add(gap - self.last_active)
+						sketches['idle'].add(gap - self.last_active)
+					self.last_active = gap
+			else:
+				self.idle.add(0)
+				if sketches is not None:
+					sketches['idle'].add(0)
+				self.last_active = gap
+
+		self.last_time = time
+		self.packets += 1
+		self.bytes += length
+
+		if src == self.first_src:
+			if self.fwd_last is not None:
+				self.fwd_iat.add(time - self.fwd_last)
+				if sketches is not None:
+					sketches['fwd'].add(time - self.fwd_last)
+			self.fwd_last = time
+			if self.rev_pending:
+				iat = time - self.rev_pending.popleft()
+				self.pair_iat.add(iat)
+				if sketches is not None:
+					sketches['flow'].add(iat)
+			elif self.rev_dropped:
+				self.rev_dropped -= 1
+			elif self.fwd_dropped or len(self.fwd_pending) >= MAX_PENDING:
+				self.fwd_dropped += 1
+			else:
+				self.fwd_pending.append(time)
+		else:
+			if self.rev_last is not None:
+				self.rev_iat.add(time - self.rev_last)
+				if sketches is not None:
+					sketches['rev'].add(time - self.rev_last)
+			self.rev_last = time
+			if self.fwd_pending:
+				iat = self.fwd_pending.popleft() - time
+				self.pair_iat.add(iat)
+				if sketches is not None:
+					sketches['flow'].add(iat)
+			elif self.fwd_dropped:
+				self.fwd_dropped -= 1
+			elif self.rev_dropped or len(self.rev_pending) >= MAX_PENDING:
+				self.rev_dropped += 1
+			else:
+				self.rev_pending.append(time)
+
+	def get_features(self):
+		"""
+		Returns the features of the flow
+
+		return: dict of the features.FEATURE_COLUMNS (and the quantile
+		columns of the SKETCHES, see features.py) -> value
+		"""
+
+		# every flow ends with an active time of 0 (get_active_info_from_times)
+		active = self.active.copy()
+		active.add(0)
+
+		duration = self.last_time - self.first_time
+
+		values = [duration]
+		values += self.fwd_iat.result()
+		values += self.rev_iat.result()
+		values += self.pair_iat.result(empty=(0, 0, np.nan, np.nan))
+		values += active.result()
+		values += self.idle.result()
+
+		# like the kernels, a zero duration gives inf/nan rates
+		with np.errstate(divide='ignore', invalid='ignore'):
+			values.append(np.float64(self.bytes) / duration)
+			values.append(np.float64(self.packets) / duration)
+
+		features = dict(zip(fs.FEATURE_COLUMNS, values))
+
+		if self.sketches is not None:
+			for name in SKETCHES:
+				sketch = self.sketches[name]
+				if name == 'active':
+					sketch = sketch.copy()
+					sketch.add(0)
+				features.update(zip(qs.get_quantile_columns(name), sketch.result()))
+
+		return features
+#=========================================
+
+class StreamingFlowTable(object):
+	"""
+	The table of the open flows, keyed by the protocol and the stream
+	number. The flows are kept in the order of their last packet, so the
+	timed out ones are always at the front.
+
+	>The tcp flows are numbered by the table in the order of their first
+	packet, which is the numbering of tcp.stream and of the stream
+	tracker as long as no flow is cut. A flow cut by the linger or the
+	flow timeout is finished, and its later packets make a new flow with
+	a new number, even when the reader still gives them the number of the
+	cut flow (tshark, which does not know about the cut).
+	"""
+
+	def __init__(self, flow_timeout=FLOW_TIMEOUT, close_linger=CLOSE_LINGER,
+			clump_timeout=st.CLUMP_TIMEOUT, active_timeout=st.ACTIVE_TIMEOUT, on_finish=None, sketch_size=None):
+		"""
+		param: the flow timeout (None -> never), the linger of the closed
+		flows, the two timeouts of the active and idle times, a function
+		called with the stream number of every finished tcp flow (e.g. to
+		forget its conversation in the stream tracker) and the size of the
+		quantile sketches of the flows (None -> no sketches, see
+		get_sketch_size)
+		"""
+
+		self.flow_timeout = flow_timeout
+		self.close_linger = close_linger
+		self.clump_timeout = clump_timeout
+		self.active_timeout = active_timeout
+		self.on_finish = on_finish
+		self.sketch_size = sketch_size
+		self.open_flows = OrderedDict()
+		self.closed_flows = OrderedDict()
+		# the flows finished by advance, for the next add_packet or flush
+		self.finished = []
+		self.next_stream = 0
+
+	def __len__(self):
+		return len(self.open_flows) + len(self.closed_flows)
+
+	def add_packet(self, stream, src, dst, time, length, flags=0, protocol=pr.IPPROTO_TCP):
+		"""
+		Adds a packet to its flow, and finishes the flows which timed out
+		before it
+
+		param: the stream number, the src and dst endpoints (tuples of the
+		ip and the port), the time, the length, the tcp flags and the ip
+		protocol of the packet
+
+		return: list of (stream, FlowState) of the finished flows
+		"""
+
+		finished = self.expire(time)
+		if self.finished:
+			finished = self.finished + finished
+			self.finished = []
+
+		key = (protocol, stream)
+		flow = self.open_flows.pop(key, None)
+		if flow is None:
+			flow = self.closed_flows.pop(key, None)
+		if flow is None:
+			if protocol == pr.IPPROTO_TCP:
+				stream = self.next_stream
+				self.next_stream += 1
+			flow = FlowState(src, time, protocol, self.sketch_size, stream)
+
+		flow.add_packet(src, time, length, self.clump_timeout, self.active_timeout)
+
+		if flags & TCP_RST:
+			flow.closed = True
+		elif flags & TCP_FIN:
+			flow.fin.add(src)
+			if len(flow.fin) == 2:
+				flow.closed = True
+
+		if flow.closed:
+			self.closed_flows[key] = flow
+		else:
+			self.open_flows[key] = flow
+
+		return finished
+
+	def expire(self, now):
+		"""
+		Finishes the flows whose last packet is older than the timeouts
+
+		param: the current time
+
+		return: list of (stream, FlowState) of the finished flows
+		"""
+
+		finished = []
+
+		for flows, timeout in ((self.closed_flows, self.close_linger), (self.open_flows, self.flow_timeout)):
+			if timeout is None:
+				continue
+			while flows:
+				key, flow = next(iter(flows.items()))
+				if now - flow.last_time <= timeout:
+					break
+				del flows[key]
+				finished.append((key, flow))
+
+		return self.finish(finished)
+
+	def advance(self, now):
+		"""
+		Finishes the flows which timed out before the next packet, ahead of
+		its stream lookup (see iter_native_packets), so that the stream
+		tracker forgets their conversations before it numbers the packet.
+		The finished flows are returned by the next add_packet or flush
+
+		param: the time of the next packet
+		"""
+
+		self.finished += self.expire(now)
+
+	def flush(self):
+		"""
+		Finishes all the flows, at the end of the capture
+
+		return: list of (stream, FlowState) of the finished flows
+		"""
+
+		finished = list(self.closed_flows.items()) + list(self.open_flows.items())
+		self.closed_flows.clear()
+		self.open_flows.clear()
+
+		finished = self.finished + self.finish(finished)
+		self.finished = []
+
+		return finished
+
+	def finish(self, finished):
+		"""
+		Calls on_finish with the stream number given by the reader to the
+		finished tcp flows (the udp and icmp flows are cut by
+		pcap_reader.FlowTracker itself)
+
+		param: list of ((protocol, stream), FlowState) of the finished
+		flows, keyed as in the table
+
+		return: list of (stream, FlowState) of the finished flows
+		"""
+
+		if self.on_finish is not None:
+			for key, flow in finished:
+				if flow.protocol == pr.IPPROTO_TCP:
+					self.on_finish(key[1])
+
+		return [(flow.stream, flow) for key, flow in finished]
+#=========================================
+
+def get_sketch_size(columns, quantile_error=qs.ERROR):
+	"""
+	Returns the size of the quantile sketches of the flows
+
+	param: the list of the feature columns (None -> the default ones) and
+	the rank error of the sketches (see sketches.get_sketch_size)
+
+	return: (int) the size k, None if no quantile column is selected
+	"""
+
+	sketched = set(column for name in SKETCHES for column in qs.get_quantile_columns(name))
+	if columns is None or sketched.isdisjoint(columns):
+		return None
+
+	return qs.get_sketch_size(quantile_error)
+#=========================================
+
+def iter_native_packets(file, origin=None, tracker=None, protocols=('tcp',), flow_tracker=None, advance=None):
+	"""
+	Reads the packets of a capture one by one with the native reader
+
+	param: the capture file, the time origin in ns (None -> the first
+	frame of the file, like frame.time_relative), the stream tracker
+	(see pcap_reader.StreamTracker), the protocols of the flows (see
+	pcap_reader.PROTOCOLS), the flow tracker of the udp and icmp
+	flows (see pcap_reader.FlowTracker) and a function called with the
+	time of every packet before its stream lookup (e.g.
+	StreamingFlowTable.advance, so that the packets after the cut of a
+	flow get a new stream number)
+
+	return: generator of (stream, src, dst, time, length, flags, protocol)
+	tuples
+	"""
+
+	ip_protocols = pr.get_ip_protocols(protocols)
+	if tracker is None:
+		tracker = pr.StreamTracker()
+	if flow_tracker is None:
+		flow_tracker = pr.FlowTracker()
+
+	for buf, ts, orig_len, linktype, offset, caplen in pr.iter_file_records(file):
+		if origin is None:
+			origin = ts
+
+		pkt = pr.decode_packet(buf, offset, caplen, linktype, ip_protocols)
+		if pkt is None:
+			continue
+
+		ip_src, ip_dst, src, dst, sport, dport, seq, flags, protocol = pkt
+		time = (ts - origin) / 1e9
+		if advance is not None:
+			advance(time)
+		if protocol == pr.IPPROTO_TCP:
+			stream = tracker.get_stream(src, sport, dst, dport, seq, flags)
+		else:
+			stream = flow_tracker.get_flow(protocol, src, sport, dst, dport, time)
+
+		yield (stream, (ip_src, sport), (ip_dst, dport), time, orig_len, flags, protocol)
+#=========================================
+
+def get_tshark_command(file, protocols=('tcp',)):
+	"""
+	Returns the tshark command which prints the TSHARK_FIELDS of the
+	packets of a capture (as a list of arguments, run without a shell)
+
+	param: the capture file and the protocols of the flows (see
+	pcap_reader.PROTOCOLS)
+
+	return: list of the arguments
+	"""
+
+	display_filter = ' or '.join(fe.TSHARK_FILTERS[name] for name in pr.PROTOCOLS if name in protocols)
+
+	# frame 1 is kept for the time origin even if it is not of a flow
+	command = ['tshark', '-r', file, '-Y', display_filter + ' or frame.number == 1', '-T', 'fields',
+		'-E', 'separator=,', '-E', 'occurrence=f']
+	for field in TSHARK_FIELDS:
+		command += ['-e', field]
+
+	return command
+#=========================================
+
+def iter_tshark_packets(file, origin=None, protocols=('tcp',), flow_tracker=None):
+	"""
+	Reads the packets of a capture one by one from the stdout pipe of
+	tshark, without waiting for tshark to finish
+
+	param: the capture file, the time origin in ns (None -> the first
+	frame of the file, like frame.time_relative), the protocols of the
+	flows and the flow tracker of the udp and icmp flows (see
+	iter_native_packets)
+
+	return: generator of (stream, src, dst, time, length, flags, protocol)
+	tuples
+	"""
+
+	command = get_tshark_command(file, protocols)
+
+	# a pipe of the stderr could fill up and block tshark, a file cannot
+	with tempfile.TemporaryFile() as stderr:
+		proc = sp.Popen(command, stdout=sp.PIPE, stderr=stderr, universal_newlines=True, bufsize=1024 * 1024)
+
+		try:
+			for packet in parse_tshark_lines(proc.stdout, origin, protocols, flow_tracker):
+				yield packet
+			proc.wait()
+		finally:
+			proc.stdout.close()
+			# killed when the packets are not read to the end
+			if proc.returncode is None:
+				proc.kill()
+				proc.wait()
+
+		check_tshark(proc.returncode, command, stderr)
+#=========================================
+
+class TsharkError(sp.CalledProcessError):
+	"""
+	tshark exited with an error, the end of its stderr is in the message
+	"""
+
+	def __str__(self):
+		return '{}\n{}'.format(super().__str__(), self.stderr.rstrip())
+#=========================================
+
+def check_tshark(returncode, command, stderr):
+	"""
+	Raises a TsharkError if tshark exited with an error
+
+	param: the exit status and the command of tshark, and the file of its
+	stderr (opened in binary mode)
+	"""
+
+	if returncode == 0:
+		return
+
+	stderr.seek(0, 2)
+	stderr.seek(max(0, stderr.tell() - STDERR_TAIL))
+
+	raise TsharkError(returncode, command, stderr=stderr.read().decode(errors='replace'))
+#=========================================
+
+def parse_epoch(epoch):
+	"""
+	Parses the frame.time_epoch field as integer ns, so that the relative
+	times are the same as frame.time_relative
+
+	param: (str) the epoch time in seconds
+
+	return: (int) the epoch time in ns
+	"""
+
+	seconds, _, fraction = epoch.partition('.')
+
+	return int(seconds) * 10**9 + int((fraction + '000000000')[:9])
+#=========================================
+
+def parse_tshark_lines(lines, origin=None, protocols=('tcp',), flow_tracker=None):
+	"""
+	Parses the lines of the TSHARK_FIELDS printed by tshark
+
+	param: the iterable of the lines, the time origin in ns (None -> the
+	first line), the protocols of the flows and the flow tracker of the
+	udp and icmp flows (see iter_native_packets)
+
+	return: generator of (stream, src, dst, time, length, flags, protocol)
+	tuples
+	"""
+
+	ip_protocols = pr.get_ip_protocols(protocols)
+	if flow_tracker is None:
+		flow_tracker = pr.FlowTracker()
+
+	for line in lines:
+		(stream, ip_src, ip_dst, ipv6_src, ipv6_dst, epoch, length, flags, sport, dport,
+			udp_sport, udp_dport, icmp_type, icmpv6_type) = line.rstrip('\n').split(',')
+
+		ts = parse_epoch(epoch)
+		if origin is None:
+			origin = ts
+		protocol = fe.get_tshark_protocol(stream, udp_sport, icmp_type, icmpv6_type)
+		if protocol not in ip_protocols:
+			continue
+
+		if ip_src == '':
+			ip_src, ip_dst = ipv6_src, ipv6_dst
+		time = (ts - origin) / 1e9
+
+		if protocol == pr.IPPROTO_TCP:
+			yield (int(stream), (ip_src, int(sport)), (ip_dst, int(dport)), time, int(length), int(flags, 16), protocol)
+			continue
+
+		if protocol == pr.IPPROTO_UDP:
+			sport, dport = int(udp_sport), int(udp_dport)
+		else:
+			sport = dport = 0
+		stream = flow_tracker.get_flow(protocol, ip_src, sport, ip_dst, dport, time)
+
+		yield (stream, (ip_src, sport), (ip_dst, dport), time, int(length), 0, protocol)
+#=========================================
+
+def iter_flow_features(packets, flow_table):
+	"""
+	Feeds the packets to the flow table and yields the features of the
+	flows as soon as they are finished
+
+	param: the packet generator (see iter_native_packets) and the
+	StreamingFlowTable
+
+	return: generator of ((protocol, stream), features dict) tuples
+	"""
+
+	count = 0
+	for packet in packets:
+		count += 1
+		for stream, flow in flow_table.add_packet(*packet):
+			yield ((flow.protocol, stream), flow.get_features())
+
+	for stream, flow in flow_table.flush():
+		yield ((flow.protocol, stream), flow.get_features())
+
+	im.count('packets', count)
+#=========================================
+
+def get_feature_table(file, backend='tshark', flow_timeout=FLOW_TIMEOUT, close_linger=CLOSE_LINGER,
+		clump_timeout=st.CLUMP_TIMEOUT, active_timeout=st.ACTIVE_TIMEOUT, columns=None, protocols=('tcp',),
+		quantile_error=qs.ERROR):
+	"""
+	Computes the features of all the flows of a capture in the streaming
+	mode, see flow_engine.get_feature_table for the batch mode
+
+	param: the capture file, the backend ('tshark' or 'native'), the
+	flow timeout (also the one of pcap_reader.FlowTracker) and the linger
+	of the closed flows, the two timeouts of the active and idle times,
+	the list of the feature columns to keep (None -> all), the
+	protocols of the flows (see pcap_reader.PROTOCOLS) and the rank error
+	of the quantile sketches
+
+	return: dict of 'stream', 'protocol' and the feature columns -> array
+	with one entry per flow, sorted by the protocol and the stream number
+	"""
+
+	if backend not in ('native', 'tshark'):
+		raise ValueError('unknown backend {}'.format(backend))
+
+	flow_tracker = pr.FlowTracker(flow_timeout)
+	tracker = pr.StreamTracker()
+	flow_table = StreamingFlowTable(flow_timeout, close_linger, clump_timeout, active_timeout,
+		tracker.forget_stream if backend == 'native' else None, get_sketch_size(columns, quantile_error))
+
+	if backend == 'native':
+		packets = iter_native_packets(file, tracker=tracker, protocols=protocols, flow_tracker=flow_tracker,
+			advance=flow_table.advance)
+	else:
+		packets = iter_tshark_packets(file, protocols=protocols, flow_tracker=flow_tracker)
+
+	with im.timed('stream'):
+		return make_feature_table(iter_flow_features(packets, flow_table), columns)
+#=========================================
+
+class FlowChain(object):
+	"""
+	The open flows of a chain of rotated captures (the files which one
+	capture writes one after the other, see watch.py) -> the flow table,
+	the stream trackers and the time origin of the first capture are
+	carried from a file to the next one, so a flow which goes on across
+	a rotation is one flow, and the stream numbers go on counting.
+
+	>Only the native reader can carry the streams over, tshark numbers
+	the streams of every file from 0. A FlowChain is pickled between
+	two files (e.g. to the state file of watch.py).
+	"""
+
+	def __init__(self, flow_timeout=FLOW_TIMEOUT, close_linger=CLOSE_LINGER,
+			clump_timeout=st.CLUMP_TIMEOUT, active_timeout=st.ACTIVE_TIMEOUT, protocols=('tcp',), sketch_size=None):
+		"""
+		param: the timeouts, see StreamingFlowTable, the protocols of
+		the flows (see pcap_reader.PROTOCOLS) and the size of the quantile
+		sketches (None -> no sketches)
+		"""
+
+		self.protocols = protocols
+		self.origin = None
+		self.tracker = pr.StreamTracker()
+		self.flow_tracker = pr.FlowTracker(flow_timeout)
+		self.flow_table = StreamingFlowTable(flow_timeout, close_linger, clump_timeout, active_timeout,
+			self.tracker.forget_stream, sketch_size)
+
+	def __len__(self):
+		return len(self.flow_table)
+
+	def add_file(self, file):
+		"""
+		Reads the next capture of the chain, leaving its flows which are
+		still open in the flow table
+
+		param: the capture file
+
+		return: list of ((protocol, stream), features dict) of the flows
+		finished in this file
+		"""
+
+		if self.origin is None:
+			# the times are relative to the first packet of the chain
+			self.origin = pr.get_first_time(file)
+
+		rows = []
+		count = 0
+		for packet in iter_native_packets(file, self.origin, self.tracker, self.protocols, self.flow_tracker,
+				self.flow_table.advance):
+			count += 1
+			for stream, flow in self.flow_table.add_packet(*packet):
+				rows.append(((flow.protocol, stream), flow.get_features()))
+
+		im.count('packets', count)
+
+		return rows
+
+	def flush(self):
+		"""
+		Finishes all the open flows, at the end of the chain
+
+		return: list of ((protocol, stream), features dict) of the flows
+		"""
+
+		return [((flow.protocol, stream), flow.get_features()) for stream, flow in self.flow_table.flush()]
+#=========================================
+
+def make_feature_table(rows, columns=None):
+	"""
+	Makes the feature table of the finished flows
+
+	param: iterable of the ((protocol, stream), features dict) of the
+	flows and the list of the feature columns to keep (None -> all)
+
+	return: dict of 'stream', 'protocol' and the feature columns -> array
+	with one entry per flow, sorted by the protocol and the stream number
+	"""
+
+	rows = sorted(rows, key=lambda row: row[0])
+
+	if columns is None:
+		columns = fs.FEATURE_COLUMNS
+
+	im.count('flows', len(rows))
+
+	feature_table = {
+		'stream': np.array([row[0][1] for row in rows], dtype=np.int64),
+		'protocol': np.array([row[0][0] for row in rows], dtype=np.int64),
+	}
+	for column in columns:
+		feature_table[column] = np.array([row[1][column] for row in rows], dtype=np.float64)
+
+	return feature_table
+#=========================================
@@ -0,0 +1,563 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The watch mode, for the directories where a capture box writes
+rotated pcap files (e.g. tcpdump -G 300, a new file every five
+minutes). The directories are polled every few seconds and only the
+new or changed captures are read, their features being appended to the
+output dataset (csv, parquet, arrow or memmap, see sinks.py).
+
+>A capture is read once it is complete -> its size and mtime did not
+change since the previous poll and it was not written for the settle
+time. The state file (<output>.watch.json) keeps the path, size, mtime
+and hash (of the first HASH_BYTES) of every capture read, so a run
+which is stopped goes on where it was, a capture which is renamed is
+not read again and a capture which changed is read again.
+
+>Every directory is one chain of rotated captures -> the flows still
+open at the end of a capture are carried to the next capture of the
+directory (see streaming.FlowChain), so a flow which goes on across a
+rotation is one row, emitted with the capture where it finished. The
+open flows are pickled next to the state file (<state>.chains) and the
+state is saved with the rows, at every checkpoint (see manifest.py), so
+no row is written twice nor lost when the run is stopped. A changed
+capture, or one older than the last capture of its chain, is read on
+its own, with its flows finished at its end.
+
+>The directories are read on a pool of worker processes, one task per
+capture and the captures of a directory in the order of their mtime.
+The captures are read with the native reader, since tshark numbers the
+streams of every file from 0. The directories are polled, inotify is
+not in the standard library.
+
+	netflowmeter-watch /captures/box1/ /captures/box2/ --label /captures/=VPN --output features.csv
+	netflowmeter-watch /captures/box1/ --once --flush
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import os
+import sys
+import time
+import pickle
+import hashlib
+import argparse
+import traceback
+import multiprocessing as mp
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from . import statistics as st
+from . import pcap_reader as pr
+from . import streaming as sm
+from . import sketches as qs
+from . import features as fs
+from . import batch
+from . import manifest as mf
+from . import sinks as sk
+from . import get_files_streamcount as gfs
+from . import instrument as im
+from . import main_driver as md
+#=========================================
+#=========================================
+
+##========================================
+#=============--CONSTANTS--===============
+# seconds between two polls of the directories
+POLL_INTERVAL = 10.0
+# seconds a capture must not have been written for before it is read
+SETTLE_TIME = 30.0
+# the bytes of the start of a capture which are hashed
+HASH_BYTES = 1024 * 1024
+STATE_SUFFIX = '.watch.json'
+CHAINS_SUFFIX = '.chains'
+CHAINS_VERSION = 1
+##========================================
+
+def get_file_hash(file, size=HASH_BYTES):
+	"""
+	Returns the hash of the start of a capture, which tells a renamed
+	capture from a new one
+
+	param: the capture file and the bytes hashed
+
+	return: (str) the hex digest
+	"""
+
+	digest = hashlib.blake2b(digest_size=16)
+	with open(file, 'rb') as f:
+		digest.update(f.read(size))
+
+	return digest.hexdigest()
+#=========================================
+
+def run_watch_task(task):
+	"""
+	Reads a capture of a chain (on a worker process)
+
+	param: tuple of (the capture file (None -> only finish the chain),
+	the pickled streaming.FlowChain of its directory (None -> a new
+	chain), the mode
+	('chain' -> the flows still open are carried over, 'single' -> the
+	capture is read on its own, 'flush' -> the open flows of the chain
+	are finished) and the dict of the options, see Watcher)
+
+	return: tuple of (the feature table of the flows finished, or a
+	batch.TaskError, the pickled FlowChain to carry over (None if the
+	chain ends), and the timers and counters of the task, see
+	instrument.take_stats)
+	"""
+
+	file, chain_state, mode, options = task
+
+	try:
+		with im.timed('stream'):
+			if chain_state is None or mode == 'single':
+				chain = sm.FlowChain(options['flow_timeout'], options['close_linger'], options['clump_timeout'],
+					options['active_timeout'], options['protocols'],
+					sm.get_sketch_size(options['columns'], options.get('quantile_error', qs.ERROR)))
+			else:
+				chain = pickle.loads(chain_state)
+
+			rows = chain.add_file(file) if file is not None else []
+			if mode != 'chain':
+				rows += chain.flush()
+			result = sm.make_feature_table(rows, options['columns'])
+
+			chain_state = pickle.dumps(chain, pickle.HIGHEST_PROTOCOL) if mode == 'chain' else None
+	except Exception:
+		result = batch.TaskError(traceback.format_exc())
+		im.count('failed_tasks')
+	im.count('tasks')
+
+	return (result, chain_state, im.take_stats())
+#=========================================
+
+class WatchState(mf.RunManifest):
+	"""
+	The state file of a watch run -> the run manifest (see manifest.py)
+	with the captures read ('files', path -> size and mtime 'stamp',
+	'hash', 'chain' directory and 'rows'), the last capture of every
+	chain ('chains') and the open flows of the chains, pickled next to it
+	"""
+
+	def __init__(self, output, state_file=None, settings=None, position=0):
+		"""
+		param: the output of the run, the state file (None ->
+		<output>.watch.json), the settings which change the rows and the
+		position of the sink (see sinks.py) at the start
+		"""
+
+		super(WatchState, self).__init__(output, settings, position)
+		self.file = state_file or output + STATE_SUFFIX
+		self.chains_file = self.file + CHAINS_SUFFIX
+		self.data['chains'] = {}
+		self.data['generation'] = 0
+		# directory -> the pickled streaming.FlowChain
+		self.chains = {}
+		# path -> (stamp, hash, directory) of the captures being read
+		self.ready = {}
+
+	def load(self, retry_quarantined=False):
+		"""
+		Loads the state of an earlier run, see RunManifest.load
+
+		return: (bool) False if there is no state file (a new run)
+		"""
+
+		if not super(WatchState, self).load(retry_quarantined):
+			return False
+
+		try:
+			with open(self.chains_file, 'rb') as f:
+				data = pickle.load(f)
+			if data['version'] != CHAINS_VERSION or data['generation'] != self.data['generation']:
+				raise ValueError('it is not of the same checkpoint as {}'.format(self.file))
+			self.chains = data['chains']
+		except Exception as e:
+			if self.data['chains']:
+				print('cannot load the open flows of {} ({}), the flows open across the last rotation are split'.format(
+					self.chains_file, e), file=sys.stderr)
+			self.chains = {}
+
+		return True
+
+	def save(self):
+		"""
+		Saves the open flows of the chains, then the state file (both
+		written to a temporary file and renamed), with the same generation
+		"""
+
+		self.data['generation'] += 1
+
+		temp_file = self.chains_file + '.{}.tmp'.format(os.getpid())
+		with open(temp_file, 'wb') as f:
+			pickle.dump({'version': CHAINS_VERSION, 'generation': self.data['generation'], 'chains': self.chains}, f,
+				pickle.HIGHEST_PROTOCOL)
+			f.flush()
+			os.fsync(f.fileno())
+		os.replace(temp_file, self.chains_file)
+
+		super(WatchState, self).save()
+
+	def get_status(self, file, stamp):
+		"""
+		Returns what is known of a capture
+
+		param: the capture file and its stamp (see manifest.get_file_stamp)
+
+		return: (str) 'done' (read, unchanged), 'changed' (read, changed
+		since), 'quarantined' (failed, unchanged) or 'new'
+		"""
+
+		path = os.path.abspath(file)
+		entry = self.data['files'].get(path)
+		if entry is not None:
+			return 'done' if entry['stamp'] == stamp else 'changed'
+		if any(entry['file'] == path and entry.get('stamp') == stamp for entry in self.data['quarantine']):
+			return 'quarantined'
+
+		return 'new'
+
+	def find_renamed(self, size, digest):
+		"""
+		Returns the capture read before under another path, if any
+
+		param: the size and the hash of a new capture
+
+		return: the path of the capture read, None if there is none
+		"""
+
+		for path, entry in self.data['files'].items():
+			if entry['stamp'][0] == size and entry['hash'] == digest and not os.path.exists(path):
+				return path
+
+		return None
+
+	def add_renamed(self, file, stamp, renamed):
+		"""
+		Records a renamed capture as read, without its rows
+
+		param: the new path, its stamp and the path it was read under
+		"""
+
+		entry = dict(self.data['files'][renamed])
+		entry.update(stamp=stamp, rows=0, renamed_from=renamed)
+		self.data['files'][os.path.abspath(file)] = entry
+
+	def add_done(self, file, streams, rows):
+		"""
+		Records the rows of a capture, once they are in the output (see
+		manifest.Checkpoint)
+
+		param: the capture file, None (all its streams) and the number of
+		rows written
+		"""
+
+		path = os.path.abspath(file)
+		if path in self.ready:
+			stamp, digest, chain = self.ready.pop(path)
+			self.data['files'][path] = {'stamp': stamp, 'hash': digest, 'chain': chain, 'rows': 0, 'time': time.time()}
+
+		self.data['files'][path]['rows'] += rows
+		self.data['rows'] += rows
+
+	def quarantine(self, file, streams, error):
+		"""
+		Sets a failed capture aside, until it changes
+
+		param: the capture file, None (all its streams) and the error
+		"""
+
+		super(WatchState, self).quarantine(file, streams, error)
+
+		ready = self.ready.pop(os.path.abspath(file), None)
+		if ready is not None:
+			self.data['quarantine'][-1]['stamp'] = ready[0]
+#=========================================
+
+class Watcher(object):
+	"""
+	Polls directories of rotated captures and appends the features of
+	their new captures to an output, see the module docstring
+	"""
+
+	def __init__(self, directories, output, extension='pcap', state_file=None, format='csv', dtype=None, labels=None,
+			default_label=batch.DEFAULT_LABEL, options=None, workers=1, interval=POLL_INTERVAL, settle=SETTLE_TIME,
+			flush_rows=mf.FLUSH_ROWS, logger=None):
+		"""
+		param: the list of the directories (one chain of captures each),
+		the output, the extension of the captures, the state file (None ->
+		<output>.watch.json), the format and dtype of the output (see
+		sinks.get_sink), the dict of path -> class label and the label of
+		the other captures (see batch.get_label), the dict of the options
+		('protocols', 'flow_timeout', 'close_linger', 'clump_timeout',
+		'active_timeout', 'columns' and the 'quantile_error' of the quantile
+		columns), the number of worker processes,
+		the seconds between two polls, the settle time of the captures,
+		the rows between two checkpoints and the
+		instrument.ThroughputLogger (None -> no throughput lines)
+		"""
+
+		self.directories = [os.path.abspath(directory) for directory in directories]
+		self.extension = extension
+		self.labels = labels or {}
+		self.default_label = default_label
+		self.options = options
+		self.workers = workers
+		self.interval = interval
+		self.settle = settle
+		self.logger = logger
+		self.pool = None
+		# path -> stamp of the captures at the previous poll
+		self.seen = {}
+
+		settings = {key: value for key, value in options.items()}
+		settings.update(labels=self.labels, default_label=default_label, format=format, dtype=dtype)
+		self.sink = sk.get_sink(output, format, options['columns'], dtype)
+		self.state = WatchState(output, state_file, settings, self.sink.get_position())
+		if self.state.load():
+			self.sink.restore(self.state.data['position'])
+		self.state.save()
+		self.checkpoint = mf.Checkpoint(self.state, self.sink, flush_rows)
+
+	def scan(self):
+		"""
+		Lists the captures to read
+
+		return: list of (directory, capture file, mode) in the order they
+		are read, see run_watch_task for the modes
+		"""
+
+		now = time.time()
+		seen = {}
+		tasks = []
+
+		for directory in self.directories:
+			ready = []
+			for file in gfs.get_all_files_within_dir(os.path.join(directory, ''), self.extension):
+				try:
+					stamp = mf.get_file_stamp(file)
+					previous = self.seen.get(file)
+					seen[file] = stamp
+					status = self.state.get_status(file, stamp)
+					if status in ('done', 'quarantined'):
+						continue
+					# still being written
+					if (previous is not None and previous != stamp) or now - stamp[1] / 1e9 < self.settle:
+						continue
+
+					digest = get_file_hash(file)
+				except OSError:
+					# deleted since the listing
+					continue
+
+				renamed = self.state.find_renamed(stamp[0], digest) if status == 'new' else None
+				if renamed is not None:
+					self.state.add_renamed(file, stamp, renamed)
+					continue
+
+				ready.append((stamp[1], file, stamp, digest, status))
+
+			chain = self.state.data['chains'].get(directory, {})
+			last_mtime = chain.get('last_mtime')
+			for mtime, file, stamp, digest, status in sorted(ready):
+				if status == 'changed' or (last_mtime is not None and mtime < last_mtime):
+					print('{} {}, read on its own'.format(file, 'changed since it was read' if status == 'changed'
+						else 'is older than the last capture of its directory'), file=sys.stderr)
+					mode = 'single'
+				else:
+					mode = 'chain'
+					last_mtime = mtime
+
+				self.state.ready[os.path.abspath(file)] = (stamp, digest, directory)
+				tasks.append((directory, file, mode))
+
+		self.seen = seen
+
+		return tasks
+
+	def iter_results(self, jobs):
+		"""
+		Runs the tasks (see run_watch_task) on the pool of workers
+
+		return: iterator of the results of the tasks, in their order
+		"""
+
+		if self.pool is not None and len(jobs) > 1:
+			return self.pool.imap(run_watch_task, jobs, chunksize=1)
+
+		return map(run_watch_task, jobs)
+
+	def process(self, tasks):
+		"""
+		Reads the captures and writes their rows, with a checkpoint at
+		the end -> the captures of every directory are read one after the
+		other (its chain goes from one to the next), the directories in
+		parallel
+
+		param: list of (directory, capture file, mode), see scan
+		"""
+
+		queues = OrderedDict()
+		for directory, file, mode in tasks:
+			queues.setdefault(directory, deque()).append((file, mode))
+
+		while queues:
+			step = [(directory, queue.popleft()) for directory, queue in queues.items()]
+			jobs = [(file, self.state.chains.get(directory), mode, self.options) for directory, (file, mode) in step]
+
+			for (directory, (file, mode)), (result, chain_state, stats) in zip(step, self.iter_results(jobs)):
+				im.merge_stats(stats)
+				if isinstance(result, batch.TaskError):
+					self.checkpoint.fail(file, None, result.error)
+					continue
+
+				# the chain is set before the rows are added, as a
+				# checkpoint saves both
+				if mode == 'chain':
+					self.state.chains[directory] = chain_state
+					self.state.data['chains'][directory] = {'last_file': os.path.abspath(file),
+						'last_mtime': self.state.ready[os.path.abspath(file)][0][1]}
+				self.add_rows(file, result)
+
+			queues = OrderedDict((directory, queue) for directory, queue in queues.items() if queue)
+
+		self.checkpoint.flush()
+
+	def add_rows(self, file, feature_table):
+		"""
+		Adds the rows of a capture to the next checkpoint
+
+		param: the capture file and its feature table
+		"""
+
+		count = len(feature_table['stream'])
+		feature_table['file'] = np.full(count, file, dtype=object)
+		feature_table['class'] = np.full(count, batch.get_label(file, self.labels, self.default_label), dtype=object)
+		self.checkpoint.add(file, None, feature_table)
+
+		if self.logger is not None:
+			self.logger.tick()
+
+	def flush_chains(self):
+		"""
+		Finishes the open flows of all the chains, their rows going with
+		the last capture of their directory (the next capture of a
+		directory starts a new chain, its streams counted from 0)
+		"""
+
+		directories = [directory for directory in self.directories if self.state.chains.get(directory) is not None]
+		jobs = [(None, self.state.chains[directory], 'flush', self.options) for directory in directories]
+
+		for directory, (result, chain_state, stats) in zip(directories, self.iter_results(jobs)):
+			im.merge_stats(stats)
+			if isinstance(result, batch.TaskError):
+				print('cannot finish the open flows of {}: {}'.format(directory, result.error.strip().splitlines()[-1]),
+					file=sys.stderr)
+				continue
+
+			self.state.chains.pop(directory)
+			self.add_rows(self.state.data['chains'][directory]['last_file'], result)
+
+		self.checkpoint.flush()
+
+	def run(self, once=False, flush=False):
+		"""
+		Polls the directories until it is stopped (Ctrl-C)
+
+		param: whether to stop after the first poll and whether to finish
+		the open flows when stopping (else they are kept in the state for
+		the next run)
+		"""
+
+		if self.workers > 1 and len(self.directories) > 1:
+			self.pool = mp.Pool(min(self.workers, len(self.directories)))
+
+		try:
+			while True:
+				tasks = self.scan()
+				if tasks:
+					self.process(tasks)
+				if once:
+					break
+				time.sleep(self.interval)
+		except KeyboardInterrupt:
+			print('stopped, the open flows are kept in {}'.format(self.state.chains_file) if not flush else 'stopped',
+				file=sys.stderr)
+		finally:
+			if self.pool is not None:
+				self.pool.terminate()
+				self.pool = None
+			self.checkpoint.flush()
+			# the captures being read when it was stopped are read again
+			self.state.ready.clear()
+			if flush:
+				self.flush_chains()
+			self.sink.close()
+#=========================================
+
+def main():
+	parser = argparse.ArgumentParser(description='Append the flow features of the new rotated captures of directories.')
+	parser.add_argument('directory', nargs='+', help='the directories where the captures are written (one chain each)')
+	parser.add_argument('--extension', default='pcap', help='the extension(s) of the capture files, separated by commas, or glob patterns '
+		'of their names, e.g. pcap,pcapng,pcap.gz or \'*.pcap*\' (default pcap)')
+	parser.add_argument('--output', default='watch.csv',
+		help='the csv file to append the features to (a directory for parquet and arrow)')
+	parser.add_argument('--format', default='csv', choices=sk.FORMATS, help='the format of the output (see sinks.py)')
+	parser.add_argument('--dtype', default=None, choices=sk.DTYPES,
+		help='the dtype of the features (default float32 for memmap, float64 otherwise)')
+	parser.add_argument('--state', default=None, help='the state file (default <output>{})'.format(STATE_SUFFIX))
+	parser.add_argument('--interval', type=float, default=POLL_INTERVAL, help='seconds between two polls of the directories')
+	parser.add_argument('--settle', type=float, default=SETTLE_TIME,
+		help='seconds a capture must not have been written for before it is read')
+	parser.add_argument('--once', action='store_true', help='read the complete captures and stop')
+	parser.add_argument('--flush', action='store_true',
+		help='finish the open flows when stopping (else they are carried to the next run)')
+	parser.add_argument('--workers', type=int, default=None, help='the number of worker processes (default all the cpus)')
+	parser.add_argument('--label', action='append', default=[], metavar='PATH=CLASS',
+		help='the class of the streams of a file or directory, can be repeated')
+	parser.add_argument('--default-label', default=batch.DEFAULT_LABEL, help='the class of the files without a --label')
+	parser.add_argument('--protocols', nargs='+', default=['tcp'], choices=list(pr.PROTOCOLS),
+		help='the protocols of the flows (default tcp)')
+	parser.add_argument('--clump-timeout', type=float, default=st.CLUMP_TIMEOUT, help='the CLUMP_TIMEOUT of the active/idle times')
+	parser.add_argument('--active-timeout', type=float, default=st.ACTIVE_TIMEOUT, help='the ACTIVE_TIMEOUT of the active/idle times')
+	parser.add_argument('--flow-timeout', type=float, default=sm.FLOW_TIMEOUT,
+		help='finish the flows inactive for this many seconds (0 -> at the --flush only)')
+	parser.add_argument('--close-linger', type=float, default=sm.CLOSE_LINGER,
+		help='seconds a closed (FIN/RST) flow waits for its last packets')
+	parser.add_argument('--features', nargs='+', default=None, metavar='FEATURE',
+		help='the features (or groups of features, see features.py) to compute (default all, add quantiles for the '
+		'p50/p90/p99 columns)')
+	parser.add_argument('--quantile-error', type=float, default=qs.ERROR, help='the rank error of the quantile sketches')
+	parser.add_argument('--flush-rows', type=int, default=mf.FLUSH_ROWS, help='write the rows and save the state every this many rows')
+	parser.add_argument('--log-interval', type=float, default=im.LOG_INTERVAL,
+		help='print the throughput every this many seconds (0 -> never)')
+	args = parser.parse_args()
+
+	options = {
+		'protocols': tuple(name for name in pr.PROTOCOLS if name in args.protocols),
+		'flow_timeout': args.flow_timeout or None,
+		'close_linger': args.close_linger,
+		'clump_timeout': args.clump_timeout,
+		'active_timeout': args.active_timeout,
+		'columns': fs.select_columns(args.features),
+	}
+	# only a setting of the runs with quantile columns
+	if sm.get_sketch_size(options['columns'], args.quantile_error) is not None:
+		options['quantile_error'] = args.quantile_error
+	logger = im.ThroughputLogger(args.log_interval) if args.log_interval > 0 else None
+
+	watcher = Watcher(args.directory, args.output, args.extension, args.state, args.format, args.dtype,
+		md.get_labels(args.label), args.default_label, options, args.workers or os.cpu_count() or 1, args.interval,
+		args.settle, args.flush_rows, logger)
+	watcher.run(args.once, args.flush)
+#=========================================
+
+if __name__ == '__main__':
+	main()
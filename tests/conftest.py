@@ -0,0 +1,186 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The fixtures of the parity tests -> the synthetic captures of
+benchmark.generate_capture, with the features every stream must have,
+and small captures written packet by packet for the flows which are
+cut in the streaming mode.
+
+>The captures of other protocols (udp, icmp) and of IPv6 are written
+frame by frame with make_frame and write_frames.
+
+>The tests which run tshark are skipped when it is not installed.
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import socket
+import shutil
+import struct
+
+import numpy as np
+import pytest
+
+from netflowmeter import benchmark as bm
+#=========================================
+#=========================================
+
+##========================================
+#=============--CONSTANTS--===============
+CLIENT = '10.0.0.1'
+SERVER = '10.0.0.2'
+CLIENT6 = 'fd00::1'
+SERVER6 = 'fd00::2'
+# the ip protocol numbers of make_frame
+PROTOCOLS = {'tcp': 6, 'udp': 17, 'icmp': 1, 'icmpv6': 58}
+##========================================
+
+requires_tshark = pytest.mark.skipif(shutil.which('tshark') is None, reason='tshark is not installed')
+
+def make_frame(src, dst, sport=0, dport=0, flags=0, payload=0, protocol='tcp', seq=0):
+	"""
+	Builds an Ethernet frame of a tcp, udp or icmp packet, over IPv6 if
+	the addresses are IPv6 ones
+
+	param: the src and dst ip addresses and ports (the icmp type and
+	code), the tcp flags, the payload size, the protocol (see PROTOCOLS)
+	and the tcp sequence number
+
+	return: (bytes) the frame
+	"""
+
+	if protocol == 'tcp':
+		segment = struct.pack('!HHIIBBHHH', sport, dport, seq, 0, 5 << 4, flags, 65535, 0, 0)
+	elif protocol == 'udp':
+		segment = struct.pack('!HHHH', sport, dport, 8 + payload, 0)
+	else:
+		segment = struct.pack('!BBHI', sport, dport, 0, 0)
+	segment += b'\0' * payload
+
+	if ':' in src:
+		ip = struct.pack('!IHBB16s16s', 6 << 28, len(segment), PROTOCOLS[protocol], 64,
+			socket.inet_pton(socket.AF_INET6, src), socket.inet_pton(socket.AF_INET6, dst))
+		return b'\0' * 12 + struct.pack('!H', 0x86DD) + ip + segment
+
+	ip = struct.pack('!BBHHHBBH4s4s', 0x45, 0, 20 + len(segment), 0, 0, 64, PROTOCOLS[protocol], 0,
+		socket.inet_aton(src), socket.inet_aton(dst))
+	return b'\0' * 12 + struct.pack('!H', 0x0800) + ip + segment
+#=========================================
+
+def write_frames(file, frames):
+	"""
+	Writes a pcap file of Ethernet frames
+
+	param: the file to write and the list of (time in seconds, frame)
+	in the capture order
+	"""
+
+	with open(file, 'wb') as f:
+		f.write(struct.pack('<IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, 65535, 1))
+		for time, frame in frames:
+			seconds, us = divmod(int(round(time * 10**6)), 10**6)
+			f.write(struct.pack('<IIII', seconds, us, len(frame), len(frame)))
+			f.write(frame)
+#=========================================
+
+def write_capture(file, packets):
+	"""
+	Writes a pcap file of tcp packets
+
+	param: the file to write and the list of (time in seconds, src, dst,
+	sport, dport, tcp flags, payload size) of the packets, in the
+	capture order
+	"""
+
+	write_frames(file, [(time, bm.make_packet(src, dst, sport, dport, seq, flags, payload))
+		for seq, (time, src, dst, sport, dport, flags, payload) in enumerate(packets)])
+#=========================================
+
+def assert_same_features(table, expected, columns=None, rtol=bm.CHECK_TOLERANCE):
+	"""
+	Checks that two feature tables have the same streams and the same
+	values (nan where the other one has nan)
+	"""
+
+	np.testing.assert_array_equal(table['stream'], expected['stream'])
+	for column in columns or [column for column in expected if column not in ('stream', 'protocol', 'packets')]:
+		np.testing.assert_allclose(table[column], expected[column], rtol=rtol, atol=0, equal_nan=True, err_msg=column)
+#=========================================
+
+@pytest.fixture(scope='session')
+def capture(tmp_path_factory):
+	"""
+	A generated capture and the expected features of its streams
+	"""
+
+	file = str(tmp_path_factory.mktemp('capture') / 'flows.pcap')
+	expected = bm.generate_capture(file, flows=40, packets=60, seed=7)
+
+	return file, expected
+#=========================================
+
+@pytest.fixture(scope='session')
+def idle_capture(tmp_path_factory):
+	"""
+	A generated capture whose flows have many idle gaps of several
+	seconds (to be cut by a short flow timeout)
+	"""
+
+	file = str(tmp_path_factory.mktemp('idle') / 'idle.pcap')
+	bm.generate_capture(file, flows=20, packets=40, idle_ratio=0.1, idle_gap=4.0, seed=3)
+
+	return file
+#=========================================
+
+@pytest.fixture(scope='session')
+def cut_capture(tmp_path_factory):
+	"""
+	A capture of two streams, the first one having packets after the
+	linger of its FINs and after a gap of about 30 seconds, so a flow
+	timeout under that cuts it into three flows, the second stream
+	starting between the last two parts
+
+	return: the file and the list of the files of the parts of the first
+	stream and of the second stream, in the order of their first packet
+	"""
+
+	directory = tmp_path_factory.mktemp('cut')
+	first = [
+		(100.0, CLIENT, SERVER, 1000, 80, 0x02, 0),
+		(100.1, SERVER, CLIENT, 80, 1000, 0x12, 0),
+		(100.2, CLIENT, SERVER, 1000, 80, 0x10, 300),
+		(100.5, SERVER, CLIENT, 80, 1000, 0x11, 20),
+		(100.6, CLIENT, SERVER, 1000, 80, 0x11, 0),
+	]
+	# after the close linger
+	second = [
+		(110.0, CLIENT, SERVER, 1000, 80, 0x10, 50),
+		(110.3, SERVER, CLIENT, 80, 1000, 0x10, 70),
+		(110.4, CLIENT, SERVER, 1000, 80, 0x10, 10),
+	]
+	other = [
+		(110.8, CLIENT, SERVER, 2000, 80, 0x02, 0),
+		(111.0, SERVER, CLIENT, 80, 2000, 0x12, 0),
+		(111.1, CLIENT, SERVER, 2000, 80, 0x10, 90),
+	]
+	# after the flow timeout
+	third = [
+		(140.0, CLIENT, SERVER, 1000, 80, 0x10, 40),
+		(140.2, SERVER, CLIENT, 80, 1000, 0x10, 60),
+	]
+
+	file = str(directory / 'cut.pcap')
+	write_capture(file, sorted(first + second + other + third))
+
+	parts = []
+	for index, packets in enumerate((first, second, other, third)):
+		part = str(directory / 'part{}.pcap'.format(index))
+		write_capture(part, packets)
+		parts.append(part)
+
+	return file, parts
+#=========================================
@@ -0,0 +1,104 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The asyncio runner (async_runner.py), with a stand-in tshark which
+prints the lines of a text file after a delay, so the order in which
+the files are done is known.
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import os
+import sys
+import time
+
+import pytest
+
+from netflowmeter import async_runner as ar
+from netflowmeter import streaming as sm
+#=========================================
+#=========================================
+
+##========================================
+#=============--CONSTANTS--===============
+# the stand-in tshark -> the first line of the '-r' file is the delay
+# in seconds (and the exit status), the other lines are printed
+TSHARK = '''#!{}
+import sys, time
+lines = open(sys.argv[sys.argv.index('-r') + 1]).read().splitlines()
+delay, status = lines[0].split()
+time.sleep(float(delay))
+sys.stdout.write(''.join(line + '\\n' for line in lines[1:]))
+sys.stderr.write('exit {{}}\\n'.format(status))
+sys.exit(int(status))
+'''
+# the TSHARK_FIELDS of the packets of a flow
+PACKETS = [
+	'0,10.0.0.1,10.0.0.2,,,1600000000.000000,60,0x0002,1000,80,,,,',
+	'0,10.0.0.2,10.0.0.1,,,1600000000.100000,60,0x0012,80,1000,,,,',
+	'0,10.0.0.1,10.0.0.2,,,1600000000.300000,90,0x0010,1000,80,,,,',
+]
+##========================================
+
+@pytest.fixture
+def fake_tshark(tmp_path, monkeypatch):
+	"""
+	Puts the stand-in tshark first on the PATH
+
+	return: function which writes a 'capture' of it, from its delay and
+	exit status
+	"""
+
+	bin_dir = tmp_path / 'bin'
+	bin_dir.mkdir()
+	tshark = bin_dir / 'tshark'
+	tshark.write_text(TSHARK.format(sys.executable))
+	tshark.chmod(0o755)
+	monkeypatch.setenv('PATH', '{}{}{}'.format(bin_dir, os.pathsep, os.environ['PATH']))
+
+	def make_capture(name, delay, status=0):
+		path = tmp_path / name
+		path.write_text('{} {}\n'.format(delay, status) + '\n'.join(PACKETS) + '\n')
+		return str(path)
+
+	return make_capture
+#=========================================
+
+def test_results_come_as_files_finish(fake_tshark):
+	files = [fake_tshark('fast.pcap', 0), fake_tshark('slow.pcap', 3)]
+
+	started = time.monotonic()
+	arrivals = []
+	for result in ar.iter_files(files, 2):
+		arrivals.append(time.monotonic() - started)
+		assert list(result['stream']) == [0]
+
+	# the fast file is yielded while the slow one still runs
+	assert len(arrivals) == 2
+	assert arrivals[0] < 2 < arrivals[1]
+#=========================================
+
+def test_results_keep_the_order_of_the_files(fake_tshark):
+	files = [fake_tshark('slow.pcap', 1), fake_tshark('fast.pcap', 0), fake_tshark('bad.pcap', 0, 2)]
+
+	results = list(ar.iter_files(files, 3))
+
+	assert [type(result) for result in results[:2]] == [dict, dict]
+	assert isinstance(results[2], sm.TsharkError)
+	assert 'exit 2' in str(results[2])
+#=========================================
+
+def test_closing_cancels_the_files_left(fake_tshark):
+	files = [fake_tshark('fast.pcap', 0), fake_tshark('slow.pcap', 30)]
+
+	started = time.monotonic()
+	results = ar.iter_files(files, 2)
+	next(results)
+	results.close()
+
+	assert time.monotonic() - started < 10
+#=========================================
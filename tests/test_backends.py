@@ -0,0 +1,51 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The native reader against tshark, in the batch and the streaming
+modes (skipped when tshark is not installed).
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+from netflowmeter import flow_engine as fe
+from netflowmeter import streaming as sm
+from netflowmeter import benchmark as bm
+
+from conftest import requires_tshark, assert_same_features
+#=========================================
+#=========================================
+
+@requires_tshark
+def test_tshark_matches_statistics(capture):
+	file, expected = capture
+
+	assert bm.check_features(fe.get_feature_table(file, 'tshark'), expected) == []
+#=========================================
+
+@requires_tshark
+def test_native_matches_tshark(capture):
+	file, expected = capture
+
+	assert_same_features(fe.get_feature_table(file, 'native'), fe.get_feature_table(file, 'tshark'))
+#=========================================
+
+@requires_tshark
+def test_native_matches_tshark_ranges(capture):
+	file, expected = capture
+
+	for streams in ((0, 10), (10, 25), (25, None)):
+		assert_same_features(fe.get_feature_table(file, 'native', streams), fe.get_feature_table(file, 'tshark', streams))
+#=========================================
+
+@requires_tshark
+def test_streaming_native_matches_tshark(idle_capture, cut_capture):
+	# with flows cut by the flow timeout and the close linger, numbered
+	# the same way by both readers
+	for file, flow_timeout in ((idle_capture, 1.0), (cut_capture[0], 20.0)):
+		assert_same_features(sm.get_feature_table(file, 'native', flow_timeout=flow_timeout),
+			sm.get_feature_table(file, 'tshark', flow_timeout=flow_timeout))
+#=========================================
@@ -0,0 +1,89 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The commands of the package (pyproject.toml) -> they start from their
+main functions, python -m netflowmeter is the netflowmeter command, and
+the help of a command does not import the heavy dependencies of the
+backends and the output formats.
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import os
+import sys
+import importlib
+import subprocess as sp
+
+import pytest
+
+import netflowmeter
+#=========================================
+#=========================================
+
+##========================================
+#=============--CONSTANTS--===============
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the modules only imported by the runs which need them
+DEFERRED = ('pandas', 'pyarrow', 'netflowmeter.async_runner')
+##========================================
+
+def run_python(*args):
+	"""
+	Runs python in a new process, with the package importable
+
+	return: the subprocess.CompletedProcess
+	"""
+
+	env = dict(os.environ, PYTHONPATH=ROOT)
+
+	return sp.run([sys.executable] + list(args), cwd=ROOT, env=env, stdout=sp.PIPE, stderr=sp.PIPE, universal_newlines=True)
+#=========================================
+
+def test_entry_points():
+	tomllib = pytest.importorskip('tomllib')
+	with open(os.path.join(ROOT, 'pyproject.toml'), 'rb') as f:
+		scripts = tomllib.load(f)['project']['scripts']
+
+	assert 'netflowmeter' in scripts
+	for name, target in scripts.items():
+		module, function = target.split(':')
+		assert callable(getattr(importlib.import_module(module), function)), name
+#=========================================
+
+def test_module_version():
+	result = run_python('-m', 'netflowmeter', '--version')
+
+	assert result.returncode == 0
+	assert netflowmeter.__version__ in result.stdout
+#=========================================
+
+def test_help_defers_the_heavy_imports():
+	script = ('import sys\n'
+		'sys.argv = ["netflowmeter", "--help"]\n'
+		'from netflowmeter import main_driver\n'
+		'try:\n'
+		'	main_driver.main()\n'
+		'except SystemExit:\n'
+		'	pass\n'
+		'print(",".join(name for name in {} if name in sys.modules))\n').format(DEFERRED)
+	result = run_python('-c', script)
+
+	assert result.returncode == 0, result.stderr
+	assert '--resume' in result.stdout
+	assert result.stdout.splitlines()[-1] == ''
+#=========================================
+
+def test_usage_errors(tmp_path):
+	output = tmp_path / 'features.csv'
+	output.write_text('')
+
+	for args, message in ((['--resume', '--overwrite'], 'cannot be used together'), ([], 'use --resume')):
+		result = run_python('-m', 'netflowmeter', str(tmp_path), '--output', str(output), *args)
+		assert result.returncode == 2
+		assert message in result.stderr
+		assert 'Traceback' not in result.stderr
+#=========================================
@@ -0,0 +1,55 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The compressed captures read by the native reader (pcap_reader.py),
+and the listing of the captures of a directory with several extensions
+or glob patterns (get_files_streamcount.py).
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import os
+import bz2
+import gzip
+import lzma
+
+import pytest
+
+from netflowmeter import flow_engine as fe
+from netflowmeter import streaming as sm
+from netflowmeter import stream_index as si
+from netflowmeter import get_files_streamcount as gfs
+
+from conftest import assert_same_features
+#=========================================
+#=========================================
+
+@pytest.mark.parametrize('suffix, module', [('gz', gzip), ('bz2', bz2), ('xz', lzma)])
+def test_compressed_matches_plain(capture, tmp_path, suffix, module):
+	file, expected = capture
+	compressed = str(tmp_path / 'flows.pcap.{}'.format(suffix))
+	with open(file, 'rb') as f, module.open(compressed, 'wb') as out:
+		out.write(f.read())
+
+	assert_same_features(fe.get_feature_table(compressed, 'native'), expected)
+	assert_same_features(sm.get_feature_table(compressed, 'native'), sm.get_feature_table(file, 'native'))
+#=========================================
+
+def test_listing_skips_indexes_and_temporary_files(tmp_path):
+	names = ['a.pcap', 'b.pcap.gz', 'c.pcapng', 'd.txt', 'a.pcap' + si.INDEX_SUFFIX,
+		'a.pcap{}.123.tmp'.format(si.INDEX_SUFFIX), 'b.pcap.gz.456.tmp']
+	for name in names:
+		(tmp_path / name).write_bytes(b'')
+	directory = os.path.join(str(tmp_path), '')
+
+	def listed(extension):
+		return [os.path.basename(file) for file in gfs.get_all_files_within_dir(directory, extension)]
+
+	assert listed('*.pcap*') == ['a.pcap', 'b.pcap.gz', 'c.pcapng']
+	assert listed('pcap,pcap.gz') == ['a.pcap', 'b.pcap.gz']
+	assert listed(['pcapng', ' ', '*.txt']) == ['c.pcapng', 'd.txt']
+#=========================================
@@ -0,0 +1,91 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The direction of the packets (forward -> the src endpoint of the first
+packet of the flow, ip and port) for the flows between two ports of one
+host and the IPv6 flows, in the batch and the streaming modes and in
+the Flow of segregate.get_flow.
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import numpy as np
+import pytest
+
+from netflowmeter import statistics as st
+from netflowmeter import flow_engine as fe
+from netflowmeter import features as fs
+from netflowmeter import streaming as sm
+from netflowmeter import segregate as seg
+
+from conftest import CLIENT, SERVER, CLIENT6, SERVER6, make_frame, write_frames, assert_same_features
+#=========================================
+#=========================================
+
+##========================================
+#=============--CONSTANTS--===============
+# (time, forward, tcp flags, payload) of the packets of one flow
+PACKETS = [
+	(100.0, True, 0x02, 0),
+	(100.1, False, 0x12, 0),
+	(100.15, True, 0x10, 200),
+	(100.4, True, 0x10, 40),
+	(100.45, False, 0x10, 900),
+	(103.5, False, 0x10, 10),
+	(103.6, True, 0x11, 0),
+]
+##========================================
+
+def write_flow(file, client, server):
+	"""
+	Writes the PACKETS as a flow of the client port 40000 and the server
+	port 443
+
+	return: tuple of (the expected features, the fwd times, the rev
+	times), the times relative to the first packet
+	"""
+
+	frames = []
+	for seq, (time, forward, flags, payload) in enumerate(PACKETS):
+		if forward:
+			frames.append((time, make_frame(client, server, 40000, 443, flags, payload, seq=seq)))
+		else:
+			frames.append((time, make_frame(server, client, 443, 40000, flags, payload, seq=seq)))
+	write_frames(file, frames)
+
+	times = [time - PACKETS[0][0] for time, forward, flags, payload in PACKETS]
+	fwd = [time for time, packet in zip(times, PACKETS) if packet[1]]
+	rev = [time for time, packet in zip(times, PACKETS) if not packet[1]]
+	size = sum(len(frame) for time, frame in frames)
+	duration = times[-1]
+
+	values = [duration]
+	for info in st.get_iat_info_from_times(fwd, rev):
+		values += info
+	values += st.get_active_info_from_times(times)
+	values += st.get_idle_info_from_times(times)
+	values += [size / duration, len(times) / duration]
+
+	expected = {column: np.array([value]) for column, value in zip(fs.FEATURE_COLUMNS, values)}
+	expected['stream'] = np.array([0])
+
+	return expected, fwd, rev
+#=========================================
+
+@pytest.mark.parametrize('client, server', [(CLIENT, SERVER), (CLIENT, CLIENT), (CLIENT6, SERVER6), (CLIENT6, CLIENT6)],
+	ids=['ipv4', 'ipv4-same-host', 'ipv6', 'ipv6-same-host'])
+def test_direction(tmp_path, client, server):
+	file = str(tmp_path / 'flow.pcap')
+	expected, fwd, rev = write_flow(file, client, server)
+
+	assert_same_features(fe.get_feature_table(file, 'native'), expected)
+	assert_same_features(sm.get_feature_table(file, 'native'), expected)
+
+	flow = seg.get_flow(file, 0)
+	np.testing.assert_allclose(flow.fwd_time, fwd)
+	np.testing.assert_allclose(flow.rev_time, rev)
+#=========================================
@@ -0,0 +1,105 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The distributed mode (distributed.py) -> a run cut into units and
+merged gives the rows of one pass over the files, the unit of a worker
+whose lease ran out is done again by another one, and the units which
+fail go to failed after MAX_ATTEMPTS attempts.
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import os
+import time
+import shutil
+
+import numpy as np
+import pytest
+
+from netflowmeter import flow_engine as fe
+from netflowmeter import features as fs
+from netflowmeter import sinks as sk
+from netflowmeter import distributed as dt
+#=========================================
+#=========================================
+
+def merge_rows(run_dir, output):
+	"""
+	Merges a run to a memmap output
+
+	return: the matrix of its rows
+	"""
+
+	dt.merge_run(run_dir, output, 'memmap', 'float64')
+	matrix, labels, columns, classes = sk.load_memmap(output)
+
+	return np.asarray(matrix)
+#=========================================
+
+def test_units_merged_in_order(capture, tmp_path):
+	file, expected = capture
+	other = str(tmp_path / 'other.pcap')
+	shutil.copyfile(file, other)
+	run_dir = str(tmp_path / 'run')
+
+	# the files cut into ranges of streams, the last one left open
+	units = dt.plan_run(run_dir, [file, other], 'native', {'columns': fs.FEATURE_COLUMNS}, unit_size=os.path.getsize(file) // 4)
+	ranges = [unit['streams'] for unit in units if unit['file'] == file]
+	assert len(ranges) > 2 and ranges[0][0] == 0 and ranges[-1][1] is None
+	assert all(first[1] == second[0] for first, second in zip(ranges, ranges[1:]))
+	with pytest.raises(ValueError):
+		dt.plan_run(run_dir, [file], 'native')
+
+	assert dt.run_worker(run_dir, 'node-a', poll_interval=0) == len(units)
+	assert dt.UnitQueue(run_dir).get_status() == {'todo': 0, 'running': 0, 'done': len(units), 'failed': 0}
+
+	table = fe.get_feature_table(file, 'native')
+	rows = np.column_stack([table[column] for column in fs.FEATURE_COLUMNS])
+	np.testing.assert_allclose(merge_rows(run_dir, str(tmp_path / 'features.bin')), np.concatenate([rows, rows]),
+		rtol=1e-12, equal_nan=True)
+#=========================================
+
+def test_expired_lease_is_done_again(capture, tmp_path):
+	file, expected = capture
+	run_dir = str(tmp_path / 'run')
+	dt.plan_run(run_dir, [file], 'native', {'columns': fs.FEATURE_COLUMNS})
+
+	# a worker claims the unit, then its node dies
+	dead = dt.UnitQueue(run_dir, 'node-dead', lease_time=60)
+	unit = dead.claim()
+	running = dead.get_path('running', '{}@node-dead'.format(unit))
+	os.utime(running, (time.time() - 120, time.time() - 120))
+
+	assert dt.run_worker(run_dir, 'node-a', lease_time=60, poll_interval=0) == 1
+	# the dead worker comes back, its unit is not its own any more
+	assert not dead.complete(unit)
+	assert dead.read_attempts(dead.get_path('done', unit))['attempts'] == 1
+	assert len(merge_rows(run_dir, str(tmp_path / 'features.bin'))) == len(expected['stream'])
+#=========================================
+
+def test_failed_units(capture, tmp_path, capsys):
+	file, expected = capture
+	broken = str(tmp_path / 'broken.pcap')
+	with open(broken, 'wb') as f:
+		f.write(b'not a capture' * 10)
+	run_dir = str(tmp_path / 'run')
+	dt.plan_run(run_dir, [broken], 'native', {'columns': fs.FEATURE_COLUMNS})
+	queue = dt.UnitQueue(run_dir)
+
+	assert dt.run_worker(run_dir, 'node-a', poll_interval=0) == 0
+	assert queue.get_status()['failed'] == 1
+	assert queue.read_attempts(queue.get_path('failed', '000000'))['attempts'] == dt.MAX_ATTEMPTS
+	assert '3 of 3 attempts' in capsys.readouterr().err
+	with pytest.raises(ValueError):
+		dt.merge_run(run_dir, str(tmp_path / 'features.csv'))
+
+	# fixed, then retried
+	shutil.copyfile(file, broken)
+	assert queue.retry_failed() == 1
+	assert dt.run_worker(run_dir, 'node-a', poll_interval=0) == 1
+	assert len(merge_rows(run_dir, str(tmp_path / 'features.bin'))) == len(expected['stream'])
+#=========================================
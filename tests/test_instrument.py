@@ -0,0 +1,101 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The instrumentation (instrument.py) -> the timers and the counters,
+added up across the threads and the worker processes of a run, and the
+report of --profile.
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import io
+import sys
+import json
+import threading
+import subprocess as sp
+
+import pytest
+
+from netflowmeter import instrument as im
+from netflowmeter import main_driver as md
+#=========================================
+#=========================================
+
+@pytest.fixture(autouse=True)
+def clean_stats():
+	"""
+	Starts every test with no timers and counters
+	"""
+
+	im.reset()
+	yield
+	im.reset()
+#=========================================
+
+def test_timers_and_counters():
+	with im.timed('decode'):
+		im.count('packets', 10)
+	with im.timed('decode'):
+		im.count('packets', 5)
+	im.count('flows')
+
+	stats = im.take_stats()
+	assert stats['stages']['decode'][1] == 2
+	assert stats['counters'] == {'packets': 15, 'flows': 1}
+	assert im.get_stats() == {'stages': {}, 'counters': {}}
+
+	# the stats of a worker process are added to the ones of the run
+	im.count('packets', 1)
+	im.merge_stats(stats)
+	im.merge_stats(stats)
+	assert im.get_stats()['counters'] == {'packets': 31, 'flows': 2}
+	assert im.get_stats()['stages']['decode'][1] == 4
+#=========================================
+
+def test_threads_and_spawns():
+	def add():
+		for index in range(20000):
+			im.count('rows')
+	threads = [threading.Thread(target=add) for index in range(8)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	sp.run([sys.executable, '-c', 'pass'], check=True)
+
+	counters = im.get_stats()['counters']
+	assert counters['rows'] == 8 * 20000
+	assert counters['spawns'] == 1
+#=========================================
+
+def test_throughput_logger():
+	output = io.StringIO()
+	logger = im.ThroughputLogger(0, output)
+	im.count('packets', 100)
+	logger.tick()
+
+	assert 'pkts' in output.getvalue()
+	assert len(output.getvalue().splitlines()) == 1
+#=========================================
+
+def test_profile_report(capture, tmp_path, monkeypatch, capsys):
+	file, expected = capture
+	report_file = str(tmp_path / 'report.json')
+	monkeypatch.setattr(sys, 'argv', ['netflowmeter', file, '--backend', 'native', '--workers', '1', '--log-interval', '0',
+		'--output', str(tmp_path / 'features.csv'), '--profile', report_file])
+	md.main()
+
+	with open(report_file) as f:
+		report = json.load(f)
+	assert report['version'] == im.REPORT_VERSION
+	assert report['counters']['packets'] == expected['packets'].sum()
+	assert report['counters']['flows'] == report['counters']['rows'] == len(expected['stream'])
+	assert report['counters']['tasks'] == 1
+	assert {'decode', 'group', 'features', 'output'} <= set(report['stages'])
+	assert report['settings']['backend'] == 'native'
+	assert '{} flows'.format(len(expected['stream'])) in capsys.readouterr().err
+#=========================================
@@ -0,0 +1,98 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The vectorized kernels (kernels.py, through the planner of
+features.py) against the functions of the statistics.py file, on the
+generated captures whose features are known.
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import numpy as np
+
+from netflowmeter import flow_engine as fe
+from netflowmeter import kernels as kn
+from netflowmeter import features as fs
+from netflowmeter import sketches as qs
+from netflowmeter import benchmark as bm
+
+from conftest import CLIENT, SERVER, write_capture, assert_same_features
+#=========================================
+#=========================================
+
+def test_kernels_match_statistics(capture):
+	file, expected = capture
+
+	assert bm.check_features(fe.get_feature_table(file, 'native'), expected) == []
+#=========================================
+
+def test_kernels_match_stream_getters(capture):
+	file, expected = capture
+
+	# the per stream getters of statistics.py, one stream at a time
+	legacy = bm.get_legacy_features(file, 8)
+	feature_table = fe.get_feature_table(file, 'native', (0, 8))
+
+	assert_same_features(feature_table, legacy, fs.FEATURE_COLUMNS)
+#=========================================
+
+def test_segment_stats_match_numpy():
+	rand = np.random.RandomState(0)
+	segments = np.sort(rand.randint(0, 6, 200))
+	values = rand.exponential(1.0, 200)
+
+	minimum, maximum, mean, std = kn.segment_stats(values, segments, 7)
+
+	for segment in range(7):
+		part = values[segments == segment]
+		if len(part) == 0:
+			assert (minimum[segment], maximum[segment], mean[segment], std[segment]) == (0, 0, 0, 0)
+			continue
+		np.testing.assert_allclose([minimum[segment], maximum[segment], mean[segment], std[segment]],
+			[part.min(), part.max(), part.mean(), part.std()], rtol=1e-12)
+#=========================================
+
+def test_segment_quantiles_match_ranks():
+	rand = np.random.RandomState(1)
+	segments = np.sort(rand.randint(0, 5, 300))
+	values = rand.exponential(1.0, 300)
+
+	results = kn.segment_quantiles(values, segments, 5, qs.QUANTILES)
+
+	for (suffix, quantile), result in zip(qs.QUANTILES, results):
+		for segment in range(5):
+			part = np.sort(values[segments == segment])
+			# the value of rank ceil(q * n), see sketches.py
+			assert result[segment] == part[int(np.ceil(quantile * len(part))) - 1]
+#=========================================
+
+def test_feature_columns_follow_the_registry():
+	# the default columns are the ones of the registered features
+	assert fs.FEATURE_COLUMNS == fs.get_columns() == fs.select_columns(None)
+	assert len(fs.FEATURE_COLUMNS) == 23
+	assert not hasattr(kn, 'FEATURE_COLUMNS')
+#=========================================
+
+def test_zero_duration_rates_match_kernels(tmp_path):
+	# a single SYN and two packets at the same time -> a zero duration
+	file = str(tmp_path / 'short.pcap')
+	write_capture(file, [
+		(100.0, CLIENT, SERVER, 1000, 80, 0x02, 0),
+		(100.5, CLIENT, SERVER, 2000, 80, 0x02, 0),
+		(100.5, SERVER, CLIENT, 80, 2000, 0x12, 0),
+	])
+
+	feature_table = fe.get_feature_table(file, 'native')
+	stream_features = fe.get_file_features(file, 'native')
+
+	assert list(stream_features) == list(feature_table['stream'])
+	for index, stream in enumerate(feature_table['stream']):
+		flow_info_list, duration, flow_bytes_psec, flow_packets_psec, active_info, idle_info = stream_features[stream]
+		assert duration == feature_table['duration'][index] == 0
+		assert flow_bytes_psec == feature_table['flow_bytes_psec'][index] == np.inf
+		assert flow_packets_psec == feature_table['flow_packets_psec'][index] == np.inf
+#=========================================
@@ -0,0 +1,72 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The live mode (live.py) on a replayed capture against the streaming
+mode, with flows which go on after the flow timeout.
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import time
+import threading
+
+import numpy as np
+
+from netflowmeter import live
+from netflowmeter import pcap_reader as pr
+from netflowmeter import streaming as sm
+from netflowmeter import features as fs
+
+from conftest import CLIENT, SERVER, write_capture
+#=========================================
+#=========================================
+
+def run_replay(file, flow_timeout, speed=1.0):
+	"""
+	Replays a capture through a LiveMeter
+
+	return: the feature table of the flows, like
+	streaming.get_feature_table
+	"""
+
+	stop = threading.Event()
+	started = time.monotonic()
+	rows = []
+
+	meter = live.LiveMeter(live.iter_replay(file, stop, started, speed), lambda: (time.monotonic() - started) * speed,
+		lambda stream, features: rows.append(((pr.IPPROTO_TCP, stream), features)), flow_timeout=flow_timeout,
+		tracker=pr.StreamTracker(), block=True, stats_interval=None, stop=stop)
+	meter.run()
+
+	return sm.make_feature_table(rows)
+#=========================================
+
+def assert_same_flows(table, expected):
+	np.testing.assert_array_equal(table['stream'], expected['stream'])
+	for column in fs.get_columns():
+		np.testing.assert_allclose(table[column], expected[column], rtol=1e-9, equal_nan=True, err_msg=column)
+#=========================================
+
+def test_live_matches_streaming_after_timeout(tmp_path):
+	# the flow goes on just after the timeout -> two flows, not a flow
+	# of one packet and a new one
+	file = str(tmp_path / 'gap.pcap')
+	write_capture(file, [(100 + offset, CLIENT, SERVER, 1000, 80, 0x10, 10) for offset in (0, 0.1, 0.65, 0.7, 0.75)])
+
+	table = run_replay(file, 0.5)
+
+	assert len(table['stream']) == 2
+	assert_same_flows(table, sm.get_feature_table(file, 'native', flow_timeout=0.5))
+#=========================================
+
+def test_live_matches_streaming(cut_capture):
+	# cut by the close linger and by the flow timeout, replayed 20 times
+	# as fast
+	file, parts = cut_capture
+
+	assert_same_flows(run_replay(file, 20.0, speed=20.0), sm.get_feature_table(file, 'native', flow_timeout=20.0))
+#=========================================
@@ -0,0 +1,95 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The netflowmeter command (main_driver.py) -> a run which crashes and
+is resumed writes the same output as a run which does not, and the
+runs which cannot be resumed stop with a usage error.
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import sys
+
+import pytest
+
+from netflowmeter import main_driver as md
+from netflowmeter import manifest as mf
+from netflowmeter import sinks as sk
+from netflowmeter import benchmark as bm
+#=========================================
+#=========================================
+
+@pytest.fixture(scope='module')
+def captures(tmp_path_factory):
+	"""
+	A directory of three generated captures
+	"""
+
+	directory = tmp_path_factory.mktemp('captures')
+	for seed in range(3):
+		bm.generate_capture(str(directory / 'flows{}.pcap'.format(seed)), flows=10, packets=20, seed=seed)
+
+	return str(directory)
+#=========================================
+
+def run_main(monkeypatch, *args):
+	"""
+	Runs the netflowmeter command with these arguments
+	"""
+
+	monkeypatch.setattr(sys, 'argv', ['netflowmeter'] + [str(arg) for arg in args])
+	md.main()
+#=========================================
+
+def get_args(captures, output):
+	return [captures, '--backend', 'native', '--workers', 1, '--flush-rows', 1, '--log-interval', 0, '--output', output]
+#=========================================
+
+@pytest.mark.parametrize('format', ['csv', 'memmap'])
+def test_resume_after_crash(monkeypatch, captures, tmp_path, format):
+	expected = str(tmp_path / 'expected')
+	run_main(monkeypatch, *get_args(captures, expected) + ['--format', format])
+
+	# the run dies after the checkpoint of its second file, with a partial
+	# batch written after it
+	output = str(tmp_path / 'output')
+	add = mf.Checkpoint.add
+	added = []
+	def crash(self, *args):
+		add(self, *args)
+		added.append(args[0])
+		if len(added) == 2:
+			raise RuntimeError('crash')
+	with monkeypatch.context() as patch:
+		patch.setattr(mf.Checkpoint, 'add', crash)
+		with pytest.raises(RuntimeError):
+			run_main(patch, *get_args(captures, output) + ['--format', format])
+	with open(output, 'ab') as f:
+		f.write(b'VPN,1.0,2.0')
+
+	run_main(monkeypatch, *get_args(captures, output) + ['--format', format, '--resume'])
+
+	expected_files = sk.get_output_files(expected, format)
+	output_files = sk.get_output_files(output, format)
+	assert len(output_files) == len(expected_files) > 0
+	for output_file, expected_file in zip(output_files, expected_files):
+		with open(output_file, 'rb') as f, open(expected_file, 'rb') as expected_f:
+			assert f.read() == expected_f.read(), output_file
+#=========================================
+
+def test_resume_guards(monkeypatch, captures, tmp_path, capsys):
+	output = tmp_path / 'output.csv'
+	run_main(monkeypatch, *get_args(captures, output))
+
+	# an existing output without --resume or --overwrite, other settings
+	for extra, message in (([], 'use --resume'), (['--resume', '--clump-timeout', 2], 'settings of the run changed'),
+			(['--resume', '--overwrite'], 'cannot be used together')):
+		with pytest.raises(SystemExit) as exit:
+			run_main(monkeypatch, *get_args(captures, output) + extra)
+		assert exit.value.code == 2
+		assert message in capsys.readouterr().err
+#=========================================
@@ -0,0 +1,89 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The on-disk cache of the flow tables (packet_cache.py) -> the later
+runs skip the parsing, the keys follow the file and the settings which
+change the table, and the cache is trimmed to its size limit.
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import os
+import shutil
+
+import numpy as np
+
+from netflowmeter import flow_engine as fe
+from netflowmeter import packet_cache as pc
+
+from conftest import assert_same_features
+#=========================================
+#=========================================
+
+def get_entries(cache_dir):
+	return sorted(name for name in os.listdir(cache_dir) if name.endswith(pc.CACHE_SUFFIX))
+#=========================================
+
+def test_cached_runs_skip_the_parsing(capture, tmp_path, monkeypatch):
+	file, expected = capture
+	cache_dir = str(tmp_path / 'cache')
+
+	assert_same_features(fe.get_feature_table(file, 'native', cache_dir=cache_dir), expected)
+	assert len(get_entries(cache_dir)) == 1
+
+	def no_parsing(*args, **kwargs):
+		raise AssertionError('the file was parsed again')
+	monkeypatch.setattr(fe, 'get_packet_table', no_parsing)
+
+	assert_same_features(fe.get_feature_table(file, 'native', cache_dir=cache_dir), expected)
+	# a range of streams is selected from the cached table of the file
+	feature_table = fe.get_feature_table(file, 'native', (5, 12), cache_dir=cache_dir)
+	np.testing.assert_array_equal(feature_table['stream'], np.arange(5, 12))
+	np.testing.assert_allclose(feature_table['duration'], expected['duration'][5:12])
+#=========================================
+
+def test_cache_keys(capture, tmp_path):
+	file, expected = capture
+	copied = str(tmp_path / 'copy.pcap')
+	shutil.copyfile(file, copied)
+
+	stat_key = pc.get_cache_key(copied, 'native')
+	hash_key = pc.get_cache_key(copied, 'native', 'hash')
+	assert len({stat_key, hash_key, pc.get_cache_key(copied, 'tshark'),
+		pc.get_cache_key(copied, 'native', protocols=('tcp', 'udp'), flow_timeout=60),
+		pc.get_cache_key(copied, 'native', protocols=('tcp', 'udp'), flow_timeout=30)}) == 5
+
+	# a touched file -> a new stat key, the same content hash
+	stat = os.stat(copied)
+	os.utime(copied, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+	assert pc.get_cache_key(copied, 'native') != stat_key
+	assert pc.get_cache_key(copied, 'native', 'hash') == hash_key
+#=========================================
+
+def test_trim_removes_the_least_recently_used(tmp_path):
+	cache_dir = str(tmp_path)
+	table = {'time': np.zeros(1000)}
+	for age, name in enumerate(('c', 'b', 'a')):
+		pc.save_table(cache_dir, name, table)
+		path = os.path.join(cache_dir, name + pc.CACHE_SUFFIX)
+		os.utime(path, (1000 + age, 1000 + age))
+	size = os.path.getsize(os.path.join(cache_dir, 'a' + pc.CACHE_SUFFIX))
+
+	# loading 'c' makes it the most recently used
+	assert pc.load_table(cache_dir, 'c')['time'].shape == (1000,)
+	pc.trim_cache(cache_dir, 2 * size)
+
+	assert get_entries(cache_dir) == ['a' + pc.CACHE_SUFFIX, 'c' + pc.CACHE_SUFFIX]
+	assert not pc.has_table(cache_dir, 'b')
+#=========================================
+
+def test_damaged_entry_is_a_miss(tmp_path):
+	with open(os.path.join(str(tmp_path), 'key' + pc.CACHE_SUFFIX), 'wb') as f:
+		f.write(b'not a table')
+
+	assert pc.load_table(str(tmp_path), 'key') is None
+#=========================================
@@ -0,0 +1,95 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The udp and icmp flows (pcap_reader.FlowTracker) -> numbered per
+protocol in the order of their first packet, cut by the flow timeout,
+the same in the batch and the streaming modes.
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import numpy as np
+import pytest
+
+from netflowmeter import flow_engine as fe
+from netflowmeter import streaming as sm
+from netflowmeter import pcap_reader as pr
+
+from conftest import CLIENT, SERVER, CLIENT6, SERVER6, make_frame, write_frames, assert_same_features
+#=========================================
+#=========================================
+
+##========================================
+#=============--CONSTANTS--===============
+ALL = ('tcp', 'udp', 'icmp')
+FLOW_TIMEOUT = 5.0
+##========================================
+
+@pytest.fixture
+def mixed_capture(tmp_path):
+	"""
+	A capture of a tcp stream, two udp conversations (the first one
+	coming back after more than FLOW_TIMEOUT), an icmp echo and an
+	icmpv6 echo over IPv6
+	"""
+
+	file = str(tmp_path / 'mixed.pcap')
+	write_frames(file, [
+		(100.0, make_frame(CLIENT, SERVER, 1000, 80, 0x02)),
+		(100.05, make_frame(CLIENT, SERVER, 5000, 53, payload=30, protocol='udp')),
+		(100.1, make_frame(SERVER, CLIENT, 53, 5000, payload=90, protocol='udp')),
+		(100.1, make_frame(SERVER, CLIENT, 80, 1000, 0x12)),
+		(100.2, make_frame(CLIENT, SERVER, 1000, 80, 0x10, 100)),
+		(100.3, make_frame(CLIENT, SERVER, 8, 0, payload=56, protocol='icmp')),
+		(100.35, make_frame(SERVER, CLIENT, 0, 0, payload=56, protocol='icmp')),
+		(100.5, make_frame(CLIENT6, SERVER6, 128, 0, payload=56, protocol='icmpv6')),
+		(100.6, make_frame(CLIENT, SERVER, 6000, 53, payload=30, protocol='udp')),
+		(110.0, make_frame(CLIENT, SERVER, 5000, 53, payload=30, protocol='udp')),
+		(110.2, make_frame(SERVER, CLIENT, 53, 5000, payload=90, protocol='udp')),
+	])
+
+	return file
+#=========================================
+
+def test_flows_of_every_protocol(mixed_capture):
+	table = fe.get_feature_table(mixed_capture, 'native', protocols=ALL, flow_timeout=FLOW_TIMEOUT)
+
+	assert table['protocol'].tolist() == [1, 6, 17, 17, 17, 58]
+	assert table['stream'].tolist() == [0, 0, 0, 1, 2, 0]
+	np.testing.assert_allclose(table['duration'], [0.05, 0.2, 0.05, 0, 0.2, 0], atol=1e-9)
+	# a single packet flow has inf rates, like a single packet tcp stream
+	assert np.isinf(table['flow_packets_psec'][[3, 5]]).all()
+
+	# the tcp stream alone by default
+	tcp = fe.get_feature_table(mixed_capture, 'native')
+	assert tcp['protocol'].tolist() == [6]
+	np.testing.assert_allclose(tcp['duration'], table['duration'][[1]])
+#=========================================
+
+def test_streaming_matches_batch(mixed_capture):
+	table = fe.get_feature_table(mixed_capture, 'native', protocols=ALL, flow_timeout=FLOW_TIMEOUT)
+	streaming = sm.get_feature_table(mixed_capture, 'native', flow_timeout=FLOW_TIMEOUT, protocols=ALL)
+
+	np.testing.assert_array_equal(streaming['protocol'], table['protocol'])
+	assert_same_features(streaming, table)
+#=========================================
+
+def test_flow_tracker():
+	tracker = pr.FlowTracker(timeout=1.0)
+
+	# both directions of a conversation, per protocol numbering
+	assert tracker.get_flow(17, b'a', 1, b'b', 2, 0.0) == 0
+	assert tracker.get_flow(17, b'b', 2, b'a', 1, 0.5) == 0
+	assert tracker.get_flow(1, b'a', 0, b'b', 0, 0.6) == 0
+	assert tracker.get_flow(17, b'a', 3, b'b', 2, 0.7) == 1
+	# more than the timeout after its last packet -> a new flow
+	assert tracker.get_flow(17, b'a', 1, b'b', 2, 1.6) == 2
+	assert tracker.get_flow(17, b'a', 3, b'b', 2, 1.7) == 1
+
+	never = pr.FlowTracker(timeout=None)
+	assert never.get_flow(17, b'a', 1, b'b', 2, 0.0) == never.get_flow(17, b'a', 1, b'b', 2, 10**6) == 0
+#=========================================
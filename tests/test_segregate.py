@@ -0,0 +1,37 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The segregation of the packets of a stream into the forward and the
+backward direction (segregate.py), as a Flow and as the old lists.
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+from netflowmeter import segregate as seg
+
+from conftest import CLIENT, SERVER, write_capture
+#=========================================
+#=========================================
+
+def test_flow_and_lists(tmp_path):
+	file = str(tmp_path / 'stream.pcap')
+	write_capture(file, [
+		(100.0, CLIENT, SERVER, 1000, 80, 0x02, 0),
+		(100.25, SERVER, CLIENT, 80, 1000, 0x12, 0),
+		(100.5, CLIENT, SERVER, 1000, 80, 0x10, 10),
+	])
+
+	flow = seg.get_flow(file, 0)
+	assert flow.fwd_time.tolist() == [0.0, 0.5]
+	assert flow.rev_time.tolist() == [0.25]
+
+	# the old return shape -> [fwd, rev] lists of 'src,dst,time' strings
+	assert seg.seg_flow_pkts(file, 0) == [
+		['10.0.0.1,10.0.0.2,0.000000000', '10.0.0.1,10.0.0.2,0.500000000'],
+		['10.0.0.2,10.0.0.1,0.250000000'],
+	]
+#=========================================
@@ -0,0 +1,55 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The shards of a capture (sharding.py), decoded one by one and
+stitched, against the whole file read at once.
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import os
+
+import numpy as np
+
+from netflowmeter import flow_engine as fe
+from netflowmeter import sharding as sh
+
+from conftest import assert_same_features
+#=========================================
+#=========================================
+
+def get_shards(file, count):
+	"""
+	Cuts a file into byte ranges, whatever sharding.MIN_SHARD_SIZE
+	"""
+
+	size = os.path.getsize(file)
+	bounds = [size * index // count for index in range(count)]
+
+	return [(start, bounds[index + 1] if index + 1 < count else None) for index, start in enumerate(bounds)]
+#=========================================
+
+def test_shards_match_whole_file(capture):
+	file, expected = capture
+	whole = fe.get_feature_table(file, 'native')
+
+	for count in (2, 3, 7):
+		shards = get_shards(file, count)
+		partials = [sh.read_shard(file, start, end) for start, end in shards]
+		assert_same_features(sh.get_feature_table(file, shards, partials), whole)
+#=========================================
+
+def test_shards_match_packet_table(capture):
+	file, expected = capture
+	whole = fe.get_packet_table(file, 'native')
+
+	shards = get_shards(file, 5)
+	table = sh.stitch_shards(file, shards, [sh.read_shard(file, start, end) for start, end in shards])
+
+	for column in ('stream', 'sport', 'dport', 'time', 'length'):
+		np.testing.assert_array_equal(table[column], whole[column], err_msg=column)
+#=========================================
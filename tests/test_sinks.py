@@ -0,0 +1,128 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The output sinks (sinks.py) -> the rows written in batches are read
+back the same, and a sink restored to a checkpoint drops the rows
+written after it (the parquet and arrow sinks are skipped when pyarrow
+is not installed).
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import os
+
+import numpy as np
+import pytest
+
+from netflowmeter import sinks as sk
+#=========================================
+#=========================================
+
+##========================================
+#=============--CONSTANTS--===============
+COLUMNS = ['duration', 'fwd_mean', 'flow_bytes_psec']
+##========================================
+
+def make_table(rows, start=0, label='VPN'):
+	"""
+	A feature table of rows with the extra columns of batch.py
+	"""
+
+	values = np.arange(start, start + rows, dtype=np.float64)
+
+	return {
+		'class': np.array([label] * rows, dtype=object),
+		'file': np.array(['flows.pcap'] * rows, dtype=object),
+		'stream': np.arange(start, start + rows),
+		'protocol': np.full(rows, 6, dtype=np.uint8),
+		'duration': values,
+		'fwd_mean': values / 4,
+		'flow_bytes_psec': np.where(values == 0, np.inf, values * 2),
+	}
+#=========================================
+
+def test_memmap_round_trip_and_restore(tmp_path):
+	output = str(tmp_path / 'features.bin')
+	sink = sk.get_sink(output, 'memmap', COLUMNS, batch_rows=3)
+	sink.write(make_table(5))
+	assert sink.sync() == 5
+	sink.write(make_table(4, 5, 'NonVPN'))
+	sink.sync()
+
+	matrix, labels, columns, classes = sk.load_memmap(output)
+	assert matrix.dtype == np.float32 and matrix.shape == (9, 3)
+	np.testing.assert_array_equal(matrix[:, 0], np.arange(9))
+	assert labels.tolist() == [0] * 5 + [1] * 4
+	assert (columns, classes) == (COLUMNS, ['VPN', 'NonVPN'])
+	del matrix, labels
+
+	# back to the first checkpoint
+	sink.restore(5)
+	matrix, labels, columns, classes = sk.load_memmap(output)
+	assert matrix.shape == (5, 3) and labels.tolist() == [0] * 5
+#=========================================
+
+def test_memmap_drops_the_rows_after_its_header(tmp_path):
+	output = str(tmp_path / 'features.bin')
+	sink = sk.get_sink(output, 'memmap', COLUMNS)
+	sink.write(make_table(3))
+	sink.sync()
+	# written, never synced
+	sink.write(make_table(2, 3))
+
+	assert sk.get_sink(output, 'memmap', COLUMNS).get_position() == 3
+	assert os.path.getsize(output) == 3 * len(COLUMNS) * 4
+	with pytest.raises(ValueError):
+		sk.get_sink(output, 'memmap', COLUMNS[:2])
+#=========================================
+
+def test_csv_round_trip_and_restore(tmp_path):
+	pd = pytest.importorskip('pandas')
+	output = str(tmp_path / 'features.csv')
+	sink = sk.get_sink(output, 'csv', COLUMNS, batch_rows=2)
+	sink.write(make_table(3))
+	position = sink.sync()
+	sink.write(make_table(2, 3))
+
+	frame = pd.read_csv(output, header=None)
+	assert frame.shape == (5, 4)
+	assert frame[0].tolist() == ['VPN'] * 5
+	np.testing.assert_array_equal(frame[1], np.arange(5))
+
+	sink.restore(position)
+	assert pd.read_csv(output, header=None).shape == (3, 4)
+	with pytest.raises(ValueError):
+		sink.restore(position + 1)
+#=========================================
+
+@pytest.mark.parametrize('format', ['parquet', 'arrow'])
+def test_part_round_trip_and_restore(tmp_path, format):
+	pytest.importorskip('pyarrow')
+	import pyarrow.dataset as ds
+
+	output = str(tmp_path / 'features')
+	sink = sk.get_sink(output, format, COLUMNS, batch_rows=2)
+	sink.write(make_table(3))
+	position = sink.sync()
+	sink.write(make_table(2, 3))
+	sink.close()
+
+	table = ds.dataset(output, format='parquet' if format == 'parquet' else 'arrow').to_table()
+	assert table.num_rows == 5
+	assert sorted(table.column('stream').to_pylist()) == list(range(5))
+	assert len(sk.get_output_files(output, format)) == 3
+
+	sink.restore(position)
+	assert len(sk.get_output_files(output, format)) == position
+	sk.remove_output(output, format)
+	assert sk.get_output_files(output, format) == []
+#=========================================
+
+def test_unknown_format(tmp_path):
+	with pytest.raises(ValueError):
+		sk.get_sink(str(tmp_path / 'features'), 'hdf5')
+#=========================================
@@ -0,0 +1,127 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The stream index saved next to a capture (stream_index.py) -> the
+counts of the streams, the per stream getters of the statistics.py file
+which seek to the packets of one stream, and when the saved index is
+reused, rebuilt or not usable.
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import os
+import gzip
+import shutil
+import struct
+
+import numpy as np
+import pytest
+
+from netflowmeter import statistics as st
+from netflowmeter import stream_index as si
+from netflowmeter import flow as fl
+
+from conftest import requires_tshark
+#=========================================
+#=========================================
+
+@pytest.fixture
+def copy(capture, tmp_path):
+	"""
+	A copy of the generated capture (without a saved index) and its
+	expected features
+	"""
+
+	file, expected = capture
+	copied = str(tmp_path / 'flows.pcap')
+	shutil.copyfile(file, copied)
+
+	return copied, expected
+#=========================================
+
+def test_index_counts(copy):
+	file, expected = copy
+
+	index = si.get_stream_index(file)
+
+	assert os.path.exists(file + si.INDEX_SUFFIX)
+	np.testing.assert_array_equal(index['stream'], expected['stream'])
+	np.testing.assert_array_equal(index['packets'], expected['packets'])
+	assert st.get_total_flows(file) == len(expected['stream'])
+	assert index['first_offset'].tolist() == sorted(index['first_offset'].tolist())
+#=========================================
+
+def test_stream_getters_seek_the_index(copy, monkeypatch):
+	file, expected = copy
+
+	# no tshark pass over the file
+	def no_tshark(*args, **kwargs):
+		raise AssertionError('tshark was run')
+	monkeypatch.setattr(st.sp, 'run', no_tshark)
+
+	for stream in (0, 7, len(expected['stream']) - 1):
+		fwd, rev, flow = st.get_fwd_rev_flow_iat(file, stream)
+		values = list(fwd) + list(rev) + list(flow) + [st.get_flow_duration(file, stream)]
+		columns = ['{}_{}'.format(name, value) for name in ('fwd', 'rev', 'flow') for value in ('min', 'max', 'mean', 'std')]
+		np.testing.assert_allclose(values, [expected[column][stream] for column in columns + ['duration']], rtol=1e-9,
+			equal_nan=True)
+		assert st.get_flow_packets(file, stream) == expected['packets'][stream]
+#=========================================
+
+def test_saved_index_reused_until_the_file_changes(copy, monkeypatch):
+	file, expected = copy
+	index = si.get_stream_index(file)
+
+	built = []
+	build_stream_index = si.build_stream_index
+	def count_builds(file):
+		built.append(file)
+		return build_stream_index(file)
+	monkeypatch.setattr(si, 'build_stream_index', count_builds)
+
+	np.testing.assert_array_equal(si.get_stream_index(file)['packet_offset'], index['packet_offset'])
+	assert built == []
+
+	# another mtime, then a damaged index -> built again
+	stat = os.stat(file)
+	os.utime(file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+	si.get_stream_index(file)
+	with open(file + si.INDEX_SUFFIX, 'wb') as f:
+		f.write(b'not an index')
+	np.testing.assert_array_equal(si.get_stream_index(file)['stream'], expected['stream'])
+	assert built == [file, file]
+	assert [name for name in os.listdir(os.path.dirname(file)) if name.endswith('.tmp')] == []
+#=========================================
+
+def test_compressed_file_is_not_seekable(copy):
+	file, expected = copy
+	compressed = file + '.gz'
+	with open(file, 'rb') as f, gzip.open(compressed, 'wb') as out:
+		out.write(f.read())
+
+	index = si.get_stream_index(compressed)
+
+	assert index['packet_offset'] is None
+	np.testing.assert_array_equal(index['packets'], expected['packets'])
+	assert si.get_stream_packets(compressed, 0) is None
+	assert si.get_stream_lines(compressed, 0, ['frame.len']) is None
+#=========================================
+
+@requires_tshark
+def test_unreadable_offsets_fall_back_to_tshark(copy, monkeypatch):
+	file, expected = copy
+	flow = fl.read_flow(file, 3)
+
+	def broken(file, stream_no):
+		raise struct.error('unpack requires a buffer of 16 bytes')
+	monkeypatch.setattr(si, 'get_stream_packets', broken)
+
+	fallback = fl.read_flow(file, 3)
+	np.testing.assert_allclose(fallback.fwd_time, flow.fwd_time)
+	np.testing.assert_allclose(fallback.rev_time, flow.rev_time)
+	np.testing.assert_array_equal(fallback.fwd_length, flow.fwd_length)
+#=========================================
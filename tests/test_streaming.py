@@ -0,0 +1,90 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The streaming mode against the batch mode -> the same features while
+no flow is cut, and for the flows cut by the close linger or the flow
+timeout, the batch features of the parts of their streams, with new
+stream numbers.
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import numpy as np
+
+from netflowmeter import flow_engine as fe
+from netflowmeter import streaming as sm
+from netflowmeter import features as fs
+from netflowmeter import benchmark as bm
+
+from conftest import assert_same_features
+#=========================================
+#=========================================
+
+##========================================
+#=============--CONSTANTS--===============
+# the flow timeout of the cut capture (its longest gap is about 30 s)
+CUT_TIMEOUT = 20.0
+##========================================
+
+def test_streaming_matches_statistics(capture):
+	file, expected = capture
+
+	assert bm.check_features(sm.get_feature_table(file, 'native'), expected) == []
+#=========================================
+
+def test_streaming_matches_batch(capture, idle_capture):
+	for file in (capture[0], idle_capture):
+		assert_same_features(sm.get_feature_table(file, 'native', flow_timeout=None, close_linger=None),
+			fe.get_feature_table(file, 'native'))
+#=========================================
+
+def test_streaming_quantiles_match_batch(capture):
+	file, expected = capture
+	columns = fs.select_columns(['all', 'quantiles'])
+
+	# the series of the flows are shorter than the sketches, so exact
+	assert_same_features(sm.get_feature_table(file, 'native', columns=columns),
+		fe.get_feature_table(file, 'native', columns=columns))
+#=========================================
+
+def test_linger_and_timeout_cuts(cut_capture):
+	file, parts = cut_capture
+
+	feature_table = sm.get_feature_table(file, 'native', flow_timeout=CUT_TIMEOUT)
+	assert list(feature_table['stream']) == [0, 1, 2, 3]
+	assert len(fe.get_feature_table(file, 'native')['stream']) == 2
+
+	# every flow is a part of a stream, numbered in the order of its first
+	# packet
+	for index, part in enumerate(parts):
+		expected = fe.get_feature_table(part, 'native')
+		for column in fs.get_columns():
+			np.testing.assert_allclose(feature_table[column][index], expected[column][0], rtol=bm.CHECK_TOLERANCE,
+				equal_nan=True, err_msg='{} of flow {}'.format(column, index))
+#=========================================
+
+def test_timeout_cuts(idle_capture):
+	flow_table = fe.get_flow_table(idle_capture, 'native')
+	starts = fe.get_flow_starts(flow_table)
+
+	# a stream is cut at every gap longer than the timeout
+	gaps = np.diff(flow_table['time']) > 1.0
+	gaps[starts[1:] - 1] = False
+	feature_table = sm.get_feature_table(idle_capture, 'native', flow_timeout=1.0)
+
+	assert len(feature_table['stream']) == len(starts) + gaps.sum()
+	assert list(feature_table['stream']) == list(range(len(feature_table['stream'])))
+#=========================================
+
+def test_flow_chain_matches_one_file(cut_capture):
+	file, parts = cut_capture
+	chain = sm.FlowChain(CUT_TIMEOUT)
+
+	rows = chain.add_file(file) + chain.flush()
+
+	assert_same_features(sm.make_feature_table(rows), sm.get_feature_table(file, 'native', flow_timeout=CUT_TIMEOUT))
+#=========================================
@@ -0,0 +1,140 @@
+"""
+-=========================================================
+Copyright© Centre for Artificial Intelligence and Robotics
+Jatin Aggarwal
+June 2022
+
+>The watch mode (watch.py) -> a capture cut by a rotation gives the
+rows of the whole capture, also when the run is stopped between the
+two files, and the captures read, renamed or still being written are
+not read again.
+
+<-> Dataset used -> /CICDataset/ISCX-VPN-NonVPN-2016/Dataset
+VPN datasets only.
+-=========================================================
+"""
+import os
+import time
+
+import numpy as np
+import pytest
+
+from netflowmeter import statistics as st
+from netflowmeter import streaming as sm
+from netflowmeter import features as fs
+from netflowmeter import sinks as sk
+from netflowmeter import watch
+
+from conftest import CLIENT, SERVER, write_capture
+#=========================================
+#=========================================
+
+##========================================
+#=============--CONSTANTS--===============
+OPTIONS = {
+	'protocols': ('tcp',),
+	'flow_timeout': 20.0,
+	'close_linger': sm.CLOSE_LINGER,
+	'clump_timeout': st.CLUMP_TIMEOUT,
+	'active_timeout': st.ACTIVE_TIMEOUT,
+	'columns': fs.FEATURE_COLUMNS,
+}
+# the first stream goes on across the rotation at 110.5
+PACKETS = [
+	(100.0, CLIENT, SERVER, 1000, 80, 0x02, 0),
+	(100.1, SERVER, CLIENT, 80, 1000, 0x12, 0),
+	(100.2, CLIENT, SERVER, 1000, 80, 0x10, 300),
+	(105.0, SERVER, CLIENT, 80, 1000, 0x10, 700),
+	(110.0, CLIENT, SERVER, 2000, 80, 0x02, 0),
+	(110.1, SERVER, CLIENT, 80, 2000, 0x12, 0),
+	(111.0, CLIENT, SERVER, 1000, 80, 0x10, 40),
+	(111.2, SERVER, CLIENT, 80, 1000, 0x11, 60),
+	(111.3, CLIENT, SERVER, 1000, 80, 0x11, 0),
+	(112.0, CLIENT, SERVER, 2000, 80, 0x10, 90),
+]
+ROTATION = 110.5
+##========================================
+
+@pytest.fixture
+def rotated(tmp_path):
+	"""
+	The PACKETS as one capture and as two rotated captures of a
+	directory (written a minute ago, one after the other)
+
+	return: the whole capture, the directory and its two captures
+	"""
+
+	whole = str(tmp_path / 'whole.pcap')
+	write_capture(whole, PACKETS)
+
+	directory = tmp_path / 'box'
+	directory.mkdir()
+	files = []
+	for index, packets in enumerate(([packet for packet in PACKETS if packet[0] < ROTATION],
+			[packet for packet in PACKETS if packet[0] >= ROTATION])):
+		file = str(directory / 'capture{}.pcap'.format(index))
+		write_capture(file, packets)
+		mtime = time.time() - 60 + index
+		os.utime(file, (mtime, mtime))
+		files.append(file)
+
+	return whole, str(directory), files
+#=========================================
+
+def run_watch(directory, output, flush=True, settle=0):
+	"""
+	Polls the directory once
+
+	return: the rows of the output, sorted
+	"""
+
+	watcher = watch.Watcher([directory], output, format='memmap', dtype='float64', options=OPTIONS, settle=settle)
+	watcher.run(once=True, flush=flush)
+
+	matrix, labels, columns, classes = sk.load_memmap(output)
+	return np.array(sorted(map(tuple, np.asarray(matrix))))
+#=========================================
+
+def get_expected(whole):
+	table = sm.get_feature_table(whole, 'native', flow_timeout=OPTIONS['flow_timeout'])
+
+	return np.array(sorted(zip(*[table[column] for column in fs.FEATURE_COLUMNS])))
+#=========================================
+
+def test_flow_across_the_rotation(rotated, tmp_path):
+	whole, directory, files = rotated
+
+	rows = run_watch(directory, str(tmp_path / 'features.bin'))
+
+	assert len(rows) == 2
+	np.testing.assert_allclose(rows, get_expected(whole), rtol=1e-9)
+#=========================================
+
+def test_stopped_between_the_files(rotated, tmp_path):
+	whole, directory, files = rotated
+	output = str(tmp_path / 'features.bin')
+	os.rename(files[1], files[1] + '.part')
+
+	# the open flows are kept in the state for the next run
+	assert len(run_watch(directory, output, flush=False)) == 0
+	os.rename(files[1] + '.part', files[1])
+	rows = run_watch(directory, output)
+
+	np.testing.assert_allclose(rows, get_expected(whole), rtol=1e-9)
+#=========================================
+
+def test_captures_not_read_again(rotated, tmp_path):
+	whole, directory, files = rotated
+	output = str(tmp_path / 'features.bin')
+	rows = run_watch(directory, output)
+
+	# read, renamed, then a capture still being written
+	os.rename(files[0], os.path.join(directory, 'renamed.pcap'))
+	write_capture(os.path.join(directory, 'capture2.pcap'), [(200.0, CLIENT, SERVER, 3000, 80, 0x02, 0)])
+	np.testing.assert_array_equal(run_watch(directory, output, settle=30), rows)
+
+	# a capture which changed is read again, on its own
+	write_capture(files[1], PACKETS[:3])
+	os.utime(files[1], (time.time() - 60, time.time() - 60))
+	assert len(run_watch(directory, output, settle=30)) == len(rows) + 1
+#=========================================